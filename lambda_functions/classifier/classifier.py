@@ -1,14 +1,29 @@
 import os
 import json
 import logging
+import math
+import time
 import boto3
-from openai import OpenAI
+from openai import OpenAI, RateLimitError
 from pydantic import BaseModel
 import re
-import tldextract
-from botocore.exceptions import ClientError
-from email.utils import parseaddr
+from functools import cached_property
 from typing import Literal
+from shared.domain_rules import (
+    EXECUTABLE_ATTACHMENT_PATTERN, RULE_STAGES, RuleFeatures,
+    extract_sender_domain, is_public_email_domain
+)
+from shared.canonical import canonical_fields
+from shared.authentication import alignment, authentication_summary
+from shared.links import link_summary, compact_urls, registrable_domain
+from shared.suppression import suppression_cache, admission_is_fresh
+from shared.verdict_email import send_verdict_email
+from shared.metrics import MetricsLogger, emit
+from shared.tracing import new_trace, stamp, emit_trace_metrics
+from shared.profiling import profiled
+from quota import QuotaGovernor, DynamoCounterStore, QuotaExceeded, estimate_tokens
+from pipeline import DecisionPipeline, Stage
+from reputation import ReputationStore
 
 # Set up logging
 log = logging.getLogger()
@@ -21,145 +36,54 @@ sqs = boto3.client("sqs")
 dynamodb = boto3.resource('dynamodb')
 suppression_table = dynamodb.Table('ScamVanguardEmailSuppression')
 
-# Cache for secrets to avoid repeated API calls
-_openai_key_cache = None
+# Requeue target for work deferred by the OpenAI quota governor
+QUEUE_URL = os.environ.get("PROCESSING_QUEUE_URL")
+MAX_QUOTA_DEFERRALS = 3
+SQS_MAX_MESSAGE_BYTES = 262_144
 
-# Public email domains that companies should NEVER use
-PUBLIC_EMAIL_DOMAINS = {
-    'gmail.com', 'outlook.com', 'hotmail.com', 'yahoo.com', 'icloud.com',
-    'aol.com', 'protonmail.com', 'gmx.com', 'mail.com', 'usa.com',
-    'yandex.com', 'mail.ru', 'qq.com', '163.com', '126.com', 'sina.com',
-    'yahoo.co.uk', 'yahoo.ca', 'yahoo.de', 'yahoo.fr', 'yahoo.es',
-    'outlook.de', 'outlook.fr', 'outlook.es', 'live.com', 'msn.com',
-    'me.com', 'mac.com', 'googlemail.com', 'pm.me', 'proton.me',
-    'tutanota.com', 'fastmail.com', 'hushmail.com', 'gmx.de', 'web.de'
-}
+# Model cascade, cheapest first. Later tiers handle escalations and absorb
+# overflow when an earlier tier is out of quota.
+MODEL_TIERS = ["gpt-5-nano", "gpt-5-mini"]
 
-# Known legitimate company domains (expandable)
-LEGITIMATE_COMPANY_DOMAINS = {
-    # Banks
-    'bankofamerica.com', 'chase.com', 'wellsfargo.com', 'citibank.com',
-    'usbank.com', 'pnc.com', 'capitalone.com', 'tdbank.com', 'keybank.com',
-    'regions.com', 'fifththird.com', 'huntington.com', 'suntrust.com',
-    # Major tech companies
-    'amazon.com', 'apple.com', 'microsoft.com', 'google.com', 'meta.com',
-    'netflix.com', 'adobe.com', 'salesforce.com', 'oracle.com', 'ibm.com',
-    # Payment services
-    'paypal.com', 'venmo.com', 'cashapp.com', 'zelle.com', 'stripe.com',
-    # E-commerce
-    'ebay.com', 'etsy.com', 'shopify.com', 'walmart.com', 'target.com',
-    'bestbuy.com', 'homedepot.com', 'lowes.com', 'costco.com',
-    # Services
-    'uber.com', 'lyft.com', 'doordash.com', 'grubhub.com', 'airbnb.com',
-    'spotify.com', 'dropbox.com', 'slack.com', 'zoom.us', 'linkedin.com',
-    'twitter.com', 'instagram.com', 'facebook.com', 'tiktok.com',
-    # Utilities & Telecom
-    'att.com', 'verizon.com', 'tmobile.com', 'comcast.com', 'spectrum.com',
-    # Airlines
-    'aa.com', 'delta.com', 'united.com', 'southwest.com', 'jetblue.com',
-    # Automotive
-    'grammarly.com', 'cars.com', 'carvana.com', 'carmax.com', 'email-carmax.com',
-    'autotrader.com', 'carvana.com', 'vroom.com', 'shift.com', 'accu-trade.com'
-    # Other services
-    'indeed.com', 'glassdoor.com', 'zillow.com', 'redfin.com', 'apartments.com'
-}
+# Cheap-tier verdicts below this confidence are re-checked by the next tier
+CASCADE_CONFIDENCE_THRESHOLD = float(os.environ.get("CASCADE_CONFIDENCE_THRESHOLD", "0.8"))
 
-LEGITIMATE_ESP_DOMAINS = {
-    'convertkit.com', 'sendgrid.net', 'mailgun.org', 'rsgsv.net',
-    'mailchimp.com', 'constantcontact.com', 'klaviyo.com', 
-    'braze.com', 'salesforce.com', 'exacttarget.com',
-    'mailjet.com', 'sendinblue.com', 'getresponse.com'
-}
+# Per-tier counters for this container (calls, escalations, latency, tokens)
+TIER_STATS = {}
 
-# Common email marketing domain patterns used by legitimate companies
-LEGITIMATE_EMAIL_PATTERNS = [
-    r'email[.-].*\.com$',  # email-company.com, email.company.com
-    r'mail[.-].*\.com$',   # mail-company.com, mail.company.com
-    r'.*\.mailer\..*',     # company.mailer.com
-    r'.*\.mailgun\..*',    # via mailgun
-    r'.*\.sendgrid\..*',   # via sendgrid
-    r'.*\.amazonses\.com$', # Amazon SES
-    r'.*\.messagebus\.com$' # MessageBus
-]
+# Shared OpenAI RPM/TPM/daily budget counters (stored in the suppression table)
+quota_governor = QuotaGovernor(DynamoCounterStore(suppression_table))
 
-no_cache_extract = tldextract.TLDExtract(cache_dir='/tmp')
+# Learned sender-domain reputation (also in the suppression table), cached per container
+reputation_store = ReputationStore(suppression_table)
+
+# Stages whose verdicts are analysis rather than lookups; only these feed the reputation store.
+# link_analysis is left out: its display-text rules are the likeliest to misfire on legitimate mail
+REPUTATION_SOURCES = {"local_model", "llm"}
+
+# Where authentication results must come from to earn or use reputation: the
+# original's own headers. Text pasted into a forward is the forwarder's to edit
+REPUTATION_AUTH_SOURCES = ("attachment", "headers")
+
+# Cache for secrets to avoid repeated API calls
+_openai_key_cache = None
+
+# First record handled by this container pays the cold start
+_cold_start = True
 
 # Structured output schema
 class EmailClassification(BaseModel):
     label: Literal["SAFE", "SCAM", "UNSURE"]  # Enum constraint
     reason: str  # Brief explanation
     detailed_reason: str  # Detailed analysis
+    confidence: float  # 0.0-1.0, drives escalation in the model cascade
 
-def is_email_suppressed(email):
+def is_email_suppressed(email, metrics=None):
     """
-    Check if email is in our suppression list
+    Check if email is in our suppression list (cached per container)
     """
-    try:
-        response = suppression_table.get_item(
-            Key={'email': email.lower()}
-        )
-        return 'Item' in response
-    except Exception:
-        # If we can't check, err on the side of caution and don't send
-        return True
-
-def extract_sender_domain(raw_from):
-    """
-    Extract the registrable domain from a From: header.
-    Handles names like 'Chipotle <chipotle@email.chipotle.com>'.
-    """
-    addr = parseaddr(raw_from)[1]              # chipotle@email.chipotle.com
-    if not addr or '@' not in addr:
-        return None
-    full_domain = addr.split('@')[1].lower()   # email.chipotle.com
-    # Use the configured extractor instead of the default
-    ext = no_cache_extract(full_domain)    
-    if not ext.domain or not ext.suffix:
-        return full_domain                     # fallback
-    return f"{ext.domain}.{ext.suffix}"        # chipotle.com
-
-def is_public_email_domain(domain):
-    """True only for *exact* public providers like gmail.com, yahoo.com, etc."""
-    if not domain:
-        return False
-    return domain in PUBLIC_EMAIL_DOMAINS   # no sub-domain match
-
-def check_domain_legitimacy(domain):
-    """Check if a domain appears to be from a legitimate company."""
-    if not domain:
-        return False
-    
-        # Exact match for known ESPs (they send on behalf of many companies)
-    if domain in LEGITIMATE_ESP_DOMAINS:
-        return True
-    
-    # Check against known legitimate domains first
-    if domain in LEGITIMATE_COMPANY_DOMAINS:
-        return True
-    
-    # Check if it's a subdomain of a legitimate company
-    parts = domain.split('.')
-    if len(parts) >= 2:
-        base_domain = '.'.join(parts[-2:])
-        if base_domain in LEGITIMATE_COMPANY_DOMAINS:
-            return True
-        
-        if len(parts) >= 3:
-            base_domain_extended = '.'.join(parts[-3:])
-            if base_domain_extended in LEGITIMATE_COMPANY_DOMAINS:
-                return True
-
-    # Check common email marketing patterns
-    for pattern in LEGITIMATE_EMAIL_PATTERNS:
-        if re.match(pattern, domain):
-            # Additional check: ensure the base company name is recognizable
-            for company in ['carmax', 'uber', 'amazon', 'apple', 'paypal', 'ebay', 
-                          'netflix', 'spotify', 'target', 'walmart', 'bestbuy',
-                          'bankofamerica', 'chase', 'wellsfargo', 'citibank']:
-                if company in domain.lower().replace('-', '').replace('_', ''):
-                    return True
-    
-    return False
+    # If we can't check, err on the side of caution and don't send
+    return suppression_cache.is_suppressed(suppression_table, email, on_error=True, metrics=metrics)
 
 def extract_urls_from_text(text):
     """Extract all URLs from the text."""
@@ -169,11 +93,12 @@ def extract_urls_from_text(text):
 
 def analyze_email_content(message):
     """Analyze email content for suspicious patterns."""
-    text = message.get("text", "").lower()
-    subject = message.get("subject", "").lower()
+    # Lowercased, NFKC-normalized, lookalike-free text shipped by the parser
+    subject, canonical_text = canonical_fields(message)
+    text = message.get("text", "")
     
     # Combine subject and text for analysis
-    full_content = f"{subject} {text}"
+    full_content = f"{subject} {canonical_text}"
     
     # Check for legitimate indicators first
     has_specific_account_info = bool(re.search(r'\b\d{4}\b|\$\d+\.\d{2}|account ending in', full_content))
@@ -192,7 +117,8 @@ def analyze_email_content(message):
                     full_content)
         ),
         'poor_grammar': len(re.findall(r'[A-Z]{8,}', text)) > 5,
-        'suspicious_attachment': bool(re.search(r'attachment.*(\.exe|\.scr|\.vbs|\.pif|\.cmd|\.bat|\.jar|\.zip|\.rar)', full_content))
+        # Anchored to each line's first "attachment" so repeated mentions stay linear
+        'suspicious_attachment': bool(re.search(r'^(?:(?!attachment).)*attachment.*(\.exe|\.scr|\.vbs|\.pif|\.cmd|\.bat|\.jar|\.zip|\.rar)', full_content, re.MULTILINE))
     }
     
     return suspicious_indicators
@@ -214,56 +140,162 @@ def get_openai_key():
         log.error(f"Failed to retrieve OpenAI API key: {str(e)}")
         raise
 
-def classify(message):
-    """Classify text as SAFE, SCAM, or UNSURE using OpenAI GPT-5."""
-    try:
-        # Extract sender information
-        sender = message.get("sender", "")
-        sender_domain = extract_sender_domain(sender)
-        is_public_domain = is_public_email_domain(sender_domain)
-        is_known_company = check_domain_legitimacy(sender_domain)
-        
-        # ---------- EARLY EXIT ----------
-        # Legit-looking company domain → SAFE,
-        # unless an executable attachment is present.
-        if is_known_company and not is_public_domain:
-            if not re.search(r'\.(exe|scr|vbs|pif|cmd|bat|jar|zip|rar)$',
-                             message.get("attachments", "")):  # adapt if you store attachment names differently
-                return {
-                    "label": "SAFE",
-                    "reason": "Legitimate company domain",
-                    "detailed_reason": f"{sender_domain} is a recognised company domain; no red-flag attachments detected."
-                }
-
-        if sender_domain in LEGITIMATE_ESP_DOMAINS:
-            return {
-                "label": "SAFE",
-                "reason": "Recognised ESP domain",
-                "detailed_reason": f"{sender_domain} is a verified email-service provider domain used for newsletters/receipts."
-            }
-
-        # Extract URLs and analyze content
-        text = message.get("text", "")
-        urls = extract_urls_from_text(text)
-        suspicious_indicators = analyze_email_content(message)
-        
-        # Claims to be from a company but uses public email = INSTANT SCAM
-        company_claim_pattern = r'\b(bank|paypal|amazon|apple|microsoft|google|netflix|ebay|fedex|ups|irs|government|support team|customer service|security team|account team)\b'
-        claims_to_be_company = bool(re.search(company_claim_pattern, text.lower()))
+def call_model(client, system_prompt, email_context, tiers=MODEL_TIERS):
+    """
+    Run the structured classification call on the first tier with quota left.
+    A 429 from OpenAI saturates that tier for the minute and moves on to the
+    next one; any other error gives the reservation back and is raised.
+    Returns (classification, tier, tokens); raises QuotaExceeded when every
+    tier is out of capacity.
+    """
+    estimated = estimate_tokens(system_prompt, email_context)
+    remaining = list(tiers)
+    
+    while remaining:
+        grant = quota_governor.acquire(remaining, estimated)
+        try:
+            started = time.perf_counter()
+            response = client.responses.parse(
+                model=grant.tier,
+                input=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": email_context}
+                ],
+                text_format=EmailClassification,
+            )
+        except RateLimitError as e:
+            log.warning(f"OpenAI rate limited {grant.tier}: {str(e)}")
+            quota_governor.release(grant)
+            quota_governor.saturate(grant.tier)
+            remaining = remaining[remaining.index(grant.tier) + 1:]
+            continue
+        except Exception:
+            # Timeouts, connection and 5xx errors: the tokens were never used
+            quota_governor.release(grant)
+            raise
         
-        #if is_public_domain and claims_to_be_company:
-        if is_public_domain and not is_known_company and claims_to_be_company:
-            log.info(f"Instant scam detection: Public domain {sender_domain} claiming to be a company")
-            return {
-                "label": "SCAM",
-                "reason": "Fraudulent sender using public email",
-                "detailed_reason": f"This email claims to be from a legitimate company but is sent from {sender_domain}, a public email domain. Real companies NEVER use Gmail, Yahoo, Outlook, etc."
-            }
+        latency_ms = (time.perf_counter() - started) * 1000
+        tokens = quota_governor.record_usage(grant, getattr(response, "usage", None))
+        log.info(f"OpenAI call on {grant.tier} took {latency_ms:.0f}ms, used {tokens} tokens (estimated {estimated})")
+        return response.output_parsed, grant.tier, tokens
+    
+    raise QuotaExceeded(60, "OpenAI rate limited on every tier")
+
+def needs_escalation(classification):
+    """True when a cheap-tier verdict is not trustworthy enough to send."""
+    return classification.label == "UNSURE" or classification.confidence < CASCADE_CONFIDENCE_THRESHOLD
+
+def record_tier_call(tier, latency_ms, tokens, escalated):
+    """Update the per-tier cascade counters and publish the call as EMF metrics."""
+    stats = TIER_STATS.setdefault(tier, {"calls": 0, "escalations": 0, "latency_ms": 0.0, "tokens": 0})
+    stats["calls"] += 1
+    stats["escalations"] += int(escalated)
+    stats["latency_ms"] += latency_ms
+    stats["tokens"] += tokens or 0
+    
+    emit(
+        {
+            "LLMLatency": (round(latency_ms, 2), "Milliseconds"),
+            "LLMTokens": (tokens or 0, "Count"),
+            "LLMEscalations": (int(escalated), "Count"),
+        },
+        {"Tier": tier},
+        {"escalation_rate": round(stats["escalations"] / stats["calls"], 3)}
+    )
+
+def run_cascade(client, system_prompt, email_context):
+    """
+    Classify with the cheapest tier first and only escalate UNSURE or
+    low-confidence verdicts to the next tier. Returns (classification, tier).
+    """
+    tiers = MODEL_TIERS
+    classification, tier = None, None
+    
+    while tiers:
+        try:
+            started = time.perf_counter()
+            candidate, candidate_tier, tokens = call_model(client, system_prompt, email_context, tiers)
+        except QuotaExceeded:
+            if classification is None:
+                raise
+            # No room to escalate; a low-confidence answer beats a deferral
+            log.warning(f"No quota to escalate beyond {tier}, keeping its verdict")
+            break
         
-        # Prepare enhanced prompt for AI
-        api_key = get_openai_key()
+        classification, tier = candidate, candidate_tier
+        remaining = MODEL_TIERS[MODEL_TIERS.index(tier) + 1:]
+        escalate = bool(remaining) and needs_escalation(classification)
+        record_tier_call(tier, (time.perf_counter() - started) * 1000, tokens, escalate)
         
-        system_prompt = """You are an expert email security analyst specializing in scam detection. Analyze emails with these critical rules:
+        if not escalate:
+            break
+        log.info(f"Escalating {classification.label} ({classification.confidence:.2f}) from {tier}")
+        tiers = remaining
+    
+    return classification, tier
+
+def defer_message(message, retry_after):
+    """
+    Put a quota-throttled job back on the processing queue with a delay.
+    Returns False when the job cannot be deferred any further.
+    """
+    deferrals = int(message.get("quota_deferrals", 0))
+    if not QUEUE_URL or deferrals >= MAX_QUOTA_DEFERRALS:
+        return False
+    
+    if "trace" in message:
+        # The deferral delay still counts towards the end-to-end total
+        stamp(message["trace"], "sqs_enqueued")
+    
+    body = json.dumps({**message, "quota_deferrals": deferrals + 1})
+    if len(body.encode("utf-8")) > SQS_MAX_MESSAGE_BYTES:
+        # Canonical fields added here to a job queued before the parser shipped
+        # them; drop them and let the next attempt recompute
+        body = json.dumps({**{k: v for k, v in message.items() if not k.startswith("canonical_")},
+                           "quota_deferrals": deferrals + 1})
+    
+    try:
+        sqs.send_message(
+            QueueUrl=QUEUE_URL,
+            MessageBody=body,
+            DelaySeconds=min(900, max(1, int(retry_after)))  # SQS caps delays at 15 minutes
+        )
+    except Exception as e:
+        log.error(f"Failed to defer message {message.get('message_id')}: {str(e)}")
+        return False
+    
+    log.info(f"Deferred {message.get('message_id')} by {retry_after}s (deferral #{deferrals + 1})")
+    return True
+
+# ---------- DECISION PIPELINE ----------
+
+# Weights for the local indicator model; bias keeps clean emails well below threshold
+LOCAL_MODEL_BIAS = -4.0
+LOCAL_MODEL_WEIGHTS = {
+    'public_domain': 1.5,
+    'claims_to_be_company': 1.0,
+    'urgency': 0.8,
+    'account_threats': 0.9,
+    'verify_account': 1.4,
+    'money_request': 1.6,
+    'prizes': 1.2,
+    'tax_refund': 1.3,
+    'click_link': 0.6,
+    'personal_info_request': 2.0,
+    'poor_grammar': 0.4,
+    'suspicious_attachment': 1.8,
+    'link_display_mismatch': 2.0,
+    'link_brand_mismatch': 1.5,
+    'ip_link': 1.5,
+    'punycode_link': 1.0,
+    'url_credentials': 1.5,
+    'shortened_link': 0.5,
+    'script_link': 1.0,
+    'authentication_failed': 2.0,
+}
+MODEL_THRESHOLD = float(os.environ.get("MODEL_THRESHOLD", "0.95"))
+
+SYSTEM_PROMPT = """You are an expert email security analyst specializing in scam detection. Analyze emails with these critical rules:
 
             FUNDAMENTAL RULE: Real companies NEVER send official communications from public email domains (@gmail.com, @yahoo.com, @outlook.com, @hotmail.com, etc.). Any email claiming to be from a bank, PayPal, Amazon, or any company but sent from a public email domain is 100% a SCAM.
 
@@ -387,62 +419,192 @@ def classify(message):
             (or its sub-domains) for viewing receipts, rewards, or tracking orders are
             STANDARD practice and **do not** count as requests for sensitive info.
 
-            Return JSON: {"label":"SAFE|SCAM|UNSURE", "reason":"brief explanation under 120 chars","detailed_reason":"1-2 sentences explaining the specific factors"}"""
-            
-        # Build context for the AI
-        suspicious_count = sum(suspicious_indicators.values())
-        #suspicious_items = [k.replace('_', ' ') for k, v in suspicious_indicators.items() if v]
-        suspicious_items = [k.replace('_', ' ') for k, v in suspicious_indicators.items() if v][:5]  # cap at 5
+            CONFIDENCE: Rate how certain you are of the label from 0.0 to 1.0. Use values below 0.8 whenever the domain or content leaves real doubt.
+
+            Return JSON: {"label":"SAFE|SCAM|UNSURE", "reason":"brief explanation under 120 chars","detailed_reason":"1-2 sentences explaining the specific factors","confidence":0.0-1.0}"""
+
+class MessageFeatures(RuleFeatures):
+    """
+    Features of a queued message, each computed on first use so that stages
+    which decide early never pay for URL extraction or keyword scans.
+    """
+    
+    @cached_property
+    def suspicious_indicators(self):
+        return analyze_email_content(self.message)
+
+def sender_authenticated(auth, domain):
+    """The From: domain passed authentication in headers read from the original itself."""
+    return bool(auth) and auth.get("source") in REPUTATION_AUTH_SOURCES and alignment(auth, domain) == "pass"
+
+def reputation_stage(features):
+    """Sender domain with a long, consistent verdict history → that verdict."""
+    domain = features.sender_domain
+    if not domain or features.is_public_domain:
+        return None
+    try:
+        reputation = reputation_store.lookup(domain)
+    except Exception as e:
+        log.error(f"Error reading reputation for {domain}: {str(e)}")
+        return None
+    
+    label = reputation.consensus()
+    # Anyone can put a trusted domain in From:; only an authenticated one earns its history
+    if label == "SAFE" and not sender_authenticated(features.authentication, domain):
+        return None
+    if label == "SAFE" and re.search(EXECUTABLE_ATTACHMENT_PATTERN, features.message.get("attachments", "") or "",
+                                     re.MULTILINE | re.IGNORECASE):
+        return None
+    if label == "SAFE":
+        return {
+            "label": "SAFE",
+            "reason": "Sender domain with a clean history",
+            "detailed_reason": f"{domain} has sent {round(reputation.total)} recently checked emails reported by {reputation.reporters} different people, and they were consistently safe."
+        }
+    if label == "SCAM":
+        return {
+            "label": "SCAM",
+            "reason": "Sender domain with a history of scams",
+            "detailed_reason": f"{domain} has sent {round(reputation.total)} recently checked emails reported by {reputation.reporters} different people, and they were consistently scams."
+        }
+    return None
 
-        email_context = f"""
+def record_reputation(message, result, reporter, metrics=None):
+    """
+    Add an analysed verdict to the sender domain's reputation (fails open).
+    Only messages whose From: domain passed authentication in the original's
+    own headers count, so forged senders can't build or spoil another
+    domain's history.
+    """
+    if result.get("stage") not in REPUTATION_SOURCES or result.get("label") not in ("SAFE", "SCAM"):
+        return
+    if result.get("confidence", 1) < CASCADE_CONFIDENCE_THRESHOLD:
+        return
+    domain = extract_sender_domain(message.get("sender", ""))
+    if not domain or is_public_email_domain(domain) or not registrable_domain(domain):
+        return
+    if not sender_authenticated(message.get("authentication"), domain):
+        return
+    try:
+        reputation_store.record(domain, result["label"], reporter)
+        if metrics is not None:
+            metrics.count("ReputationUpdates")
+    except Exception as e:
+        log.error(f"Error recording reputation for {domain}: {str(e)}")
+
+def local_model_signals(features):
+    """Content indicators plus sender and link features, by LOCAL_MODEL_WEIGHTS name."""
+    report = features.link_report
+    signals = dict(features.suspicious_indicators)
+    signals['public_domain'] = features.is_public_domain
+    signals['claims_to_be_company'] = features.claims_to_be_company
+    signals['link_display_mismatch'] = bool(report['display_mismatch'])
+    signals['link_brand_mismatch'] = bool(report['brand_mismatch'])
+    signals['ip_link'] = bool(report['ip_hosts'])
+    signals['punycode_link'] = bool(report['punycode_hosts'])
+    signals['url_credentials'] = bool(report['userinfo'])
+    signals['shortened_link'] = bool(report['shorteners'])
+    signals['script_link'] = bool(report['script_links'])
+    signals['authentication_failed'] = alignment(features.authentication, features.sender_domain) == "fail"
+    return signals
+
+def local_model_score(features):
+    """Logistic score over the cheap indicators; probability the email is a scam."""
+    signals = local_model_signals(features)
+    
+    z = LOCAL_MODEL_BIAS + sum(
+        weight for name, weight in LOCAL_MODEL_WEIGHTS.items() if signals.get(name)
+    )
+    return 1 / (1 + math.exp(-z))
+
+def local_model_stage(features):
+    """Overwhelming indicator score → SCAM without an LLM call."""
+    score = local_model_score(features)
+    if score < MODEL_THRESHOLD:
+        return None
+    
+    flagged = [k.replace('_', ' ') for k, v in local_model_signals(features).items()
+               if v and k in LOCAL_MODEL_WEIGHTS][:5]
+    return {
+        "label": "SCAM",
+        "reason": "Multiple strong scam indicators",
+        "detailed_reason": f"This email shows several classic scam patterns ({', '.join(flagged)}) from {features.sender_domain}.",
+        "confidence": round(score, 3)
+    }
+
+def llm_stage(features):
+    """Full analysis with the OpenAI model cascade."""
+    # Prepare enhanced prompt for AI
+    api_key = get_openai_key()
+    
+    # Build context for the AI
+    suspicious_indicators = features.suspicious_indicators
+    suspicious_count = sum(suspicious_indicators.values())
+    suspicious_items = [k.replace('_', ' ') for k, v in suspicious_indicators.items() if v][:5]  # cap at 5
+    
+    email_context = f"""
         Email Analysis:
-        - Sender email: {sender}
-        - Sender domain: {sender_domain}
-        - Is public email domain: {is_public_domain}
-        - Claims to be from company: {claims_to_be_company}
-        - Number of URLs in email: {len(urls)}
+        - Sender email: {features.sender}
+        - Sender domain: {features.sender_domain}
+        - Is public email domain: {features.is_public_domain}
+        - Claims to be from company: {features.claims_to_be_company}
+        - {link_summary(features.link_report)}
+        - {authentication_summary(features.authentication)}
         - Suspicious indicators found: {suspicious_count} ({', '.join(suspicious_items) if suspicious_items else 'none'})
 
-        Email subject: {message.get('subject', 'No subject')}
+        Email subject: {features.message.get('subject', 'No subject')}
 
         Email content:
-        {text[:4000]}
+        {compact_urls(features.text)[:4000]}
         """
+    
+    # Make API request using OpenAI Responses API
+    client = OpenAI(api_key=api_key)
+    
+    try:
+        classification, tier = run_cascade(client, SYSTEM_PROMPT, email_context)
         
-        # Make API request using OpenAI Responses API
-        client = OpenAI(api_key=api_key)
+        # Convert to dict format expected by rest of code
+        result = {
+            "label": classification.label,
+            "reason": classification.reason,
+            "detailed_reason": classification.detailed_reason,
+            "confidence": classification.confidence,
+            "tier": tier
+        }
         
-        try:
-            response = client.responses.parse(
-                model="gpt-5-mini",  # or gpt-5-nano for lower cost
-                input=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": email_context}
-                ],
-                text_format=EmailClassification,
-            )
+        log.info(f"AI Classification ({tier}): {result['label']} for {features.sender_domain}")
+        return result
+        
+    except QuotaExceeded:
+        raise
+    except Exception as e:
+        log.error(f"OpenAI API error: {str(e)}")
+        return {
+            "label": "UNSURE",
+            "reason": "Analysis service temporarily unavailable",
+            "detailed_reason": "Could not complete analysis. When in doubt, don't click links or share personal information."
+        }
 
-            # Extract the parsed structured output
-            classification = response.output_parsed
-            
-            # Convert to dict format expected by rest of code
-            result = {
-                "label": classification.label,
-                "reason": classification.reason,
-                "detailed_reason": classification.detailed_reason
-            }
-            
-            log.info(f"AI Classification: {result['label']} for {sender_domain}")
-            return result
-            
-        except Exception as e:
-            log.error(f"OpenAI API error: {str(e)}")
-            return {
-                "label": "UNSURE",
-                "reason": "Analysis service temporarily unavailable",
-                "detailed_reason": "Could not complete analysis. When in doubt, don't click links or share personal information."
-            }
+# Stages run cheapest first; register() more to extend the pipeline. The rule
+# stages are the same list the parser runs before queueing
+DECISION_PIPELINE = DecisionPipeline([Stage(name, cost, decide) for name, cost, decide in RULE_STAGES] + [
+    Stage("reputation", 30, reputation_stage),
+    Stage("local_model", 50, local_model_stage),
+    Stage("llm", 1000, llm_stage),
+])
+
+def classify(message):
+    """Classify text as SAFE, SCAM, or UNSURE using the cost-ordered decision pipeline."""
+    try:
+        result = DECISION_PIPELINE.run(MessageFeatures(message))
+        if result is None:
+            raise RuntimeError("No pipeline stage produced a verdict")
+        return result
         
+    except QuotaExceeded:
+        # Let the handler defer the message instead of answering UNSURE
+        raise
     except Exception as e:
         log.error(f"Classification error: {str(e)}")
         return {
@@ -451,247 +613,54 @@ def classify(message):
             "detailed_reason": "Analysis service encountered an error. Please exercise caution with this message."
         }
 
-def get_emoji(label):
-    """Return appropriate emoji for the label."""
-    emoji_map = {
-        "SAFE": "✅",
-        "SCAM": "🚨",
-        "UNSURE": "⚠️"
-    }
-    return emoji_map.get(label, "❓")
-
-def get_result_class(label):
-    """Return CSS class for the label."""
-    class_map = {
-        "SAFE": "safe",
-        "SCAM": "scam",
-        "UNSURE": "unsure"
-    }
-    return class_map.get(label, "unsure")
-
-def generate_html_email(result, sender_email=None):
-    """Generate HTML email content based on classification result."""
-    emoji = get_emoji(result["label"])
-    css_class = get_result_class(result["label"])
-    
-    # Add sender info if available
-    sender_info = ""
-    if sender_email:
-        sender_info = f"""
-        <div style="background-color: #f8f9fa; padding: 10px; margin: 15px 0; border-radius: 4px;">
-            <strong>Analyzed Email From:</strong> {sender_email}
-        </div>
-        """
-
-    # Different tips based on result
-    if result["label"] == "SAFE":
-        tips_section = """
-        <div class="tips">
-            <h3>✅ This appears to be legitimate, but always stay vigilant:</h3>
-            <ul>
-                <li>Verify the sender's email address matches official domains</li>
-                <li>Check that any links go to the correct website</li>
-                <li>Be cautious of any unexpected requests, even from known contacts</li>
-                <li>Keep your security software up to date</li>
-            </ul>
-        </div>
-        """
-    else:
-        tips_section = """
-        <div class="tips">
-            <h3>🔍 How to Spot Scams - Key Warning Signs:</h3>
-            <ul>
-                <li><strong>Check the sender's address:</strong> Is it from an official domain? Scammers often use fake or suspicious email addresses</li>
-                <li><strong>Urgency and pressure:</strong> Legitimate companies rarely demand immediate action or threaten consequences</li>
-                <li><strong>Requests for sensitive info:</strong> Never share passwords, Social Security numbers, or banking details via email or text</li>
-                <li><strong>Too good to be true:</strong> Unexpected winnings, inheritance, or get-rich-quick schemes are almost always scams</li>
-                <li><strong>Poor spelling/grammar:</strong> Many scams contain obvious errors or awkward language</li>
-                <li><strong>Suspicious links:</strong> Hover over links to see where they really go before clicking</li>
-                <li><strong>Unexpected attachments:</strong> Don't open attachments from unknown senders</li>
-            </ul>
-        </div>
-        """
-    
-    html_content = f"""<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>ScamVanguard Analysis Result</title>
-    <style>
-        body {{
-            font-family: Arial, sans-serif;
-            font-size: 16px;
-            line-height: 1.6;
-            color: #333;
-            max-width: 600px;
-            margin: 0 auto;
-            padding: 20px;
-            background-color: #f9f9f9;
-        }}
-        .container {{
-            background-color: white;
-            padding: 25px;
-            border-radius: 8px;
-            box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        }}
-        .header {{
-            text-align: center;
-            border-bottom: 2px solid #e0e0e0;
-            padding-bottom: 15px;
-            margin-bottom: 20px;
-        }}
-        .logo {{
-            font-size: 24px;
-            font-weight: bold;
-            color: #2c5aa0;
-        }}
-        .result {{
-            font-size: 20px;
-            font-weight: bold;
-            text-align: center;
-            padding: 15px;
-            border-radius: 5px;
-            margin: 20px 0;
-        }}
-        .safe {{ background-color: #d4edda; color: #155724; }}
-        .scam {{ background-color: #f8d7da; color: #721c24; }}
-        .unsure {{ background-color: #fff3cd; color: #856404; }}
-        .explanation {{
-            background-color: #f8f9fa;
-            padding: 15px;
-            border-left: 4px solid #2c5aa0;
-            margin: 15px 0;
-        }}
-        .tips {{
-            margin-top: 25px;
-            padding: 20px;
-            background-color: #f0f8ff;
-            border-radius: 5px;
-            border: 1px solid #b3d9ff;
-        }}
-        .tips h3 {{
-            color: #2c5aa0;
-            margin-top: 0;
-            font-size: 18px;
-        }}
-        .tips ul {{
-            margin: 10px 0;
-            padding-left: 20px;
-        }}
-        .tips li {{
-            margin-bottom: 8px;
-        }}
-        .footer {{
-            margin-top: 30px;
-            padding-top: 20px;
-            border-top: 1px solid #e0e0e0;
-            font-size: 14px;
-            color: #666;
-            text-align: center;
-        }}
-        .support-link {{
-            color: #2c5aa0;
-            text-decoration: none;
-            font-weight: bold;
-        }}
-        .warning {{
-            background-color: #fff3cd;
-            border: 1px solid #ffeaa7;
-            border-radius: 4px;
-            padding: 10px;
-            margin: 15px 0;
-            font-size: 14px;
-        }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <div class="logo">🛡️ ScamVanguard</div>
-            <p>Automated Scam Analysis</p>
-        </div>
-
-        <div class="result {css_class}">
-            {emoji} {result['label']}: {result['reason']}
-        </div>
-
-        <div class="explanation">
-            <strong>Why this was flagged:</strong> {result.get('detailed_reason', result['reason'])}
-        </div>
-
-        {sender_info}
-
-        {tips_section}
-
-        <div class="warning">
-            <strong>⚠️ When in doubt, don't click links or share personal information.</strong> Contact the company directly using official phone numbers or websites.
-        </div>
-
-        <div class="footer">
-            <p>This is an automated analysis. Always verify suspicious messages independently.</p>
-            <p>💙 Created by: <a href="https://www.haydencj.com/" class="support-link">haydencj.com</a></p>
-            <p style="font-size: 12px; color: #888; margin-top: 15px;">
-                This service is provided free of charge. To support our mission of protecting people from scams, 
-                consider visiting <a href="https://scamvanguard.com/donate" class="support-link">scamvanguard.com</a>
-            </p>
-            <p style="font-size: 11px; color: #999; margin-top: 10px;">
-                ScamVanguard | Automated Scam Detection | To stop receiving these emails, simply stop forwarding messages to scan@scamvanguard.com
-            </p>
-        </div>
-    </div>
-</body>
-</html>"""
-    
-    return html_content
-
-def generate_text_email(result, sender_email=None):
-    """Generate plain text fallback for email clients that don't support HTML."""
-    emoji = get_emoji(result["label"])
-
-    sender_info = f"Analyzed Email From: {sender_email}\n\n" if sender_email else ""
-
-    text_content = f"""{emoji} {result['label']}: {result['reason']}
-
-Analysis Details: {result.get('detailed_reason', result['reason'])}
-
-{sender_info}
-
-⚠️ When in doubt, don't click links or share personal information.
-
-Safety Tips:
-• Verify sender addresses
-• Be wary of urgent requests
-• Never share sensitive information via email
-• If it seems too good to be true, it probably is
-
----
-This is an automated analysis from ScamVanguard.
-Created by: haydencj.com
-Support our mission: scamvanguard.com/donate
-
-To stop receiving these emails, simply stop forwarding messages to scan@scamvanguard.com"""
-    
-    return text_content
+def stage_metric_name(stage):
+    """domain_index → DomainIndexStageLatency"""
+    return ''.join(part.title() for part in stage.split('_')) + "StageLatency"
 
+@profiled("classifier")
 def handler(event, context):
     """Process messages from SQS queue and send classification results via SES."""
+    global _cold_start
     
     # Get domain name from environment
     domain_name = os.environ.get("DOMAIN_NAME", "scamvanguard.com")
     
     for record in event["Records"]:
+        # One EMF record per SQS message
+        metrics = MetricsLogger("classifier")
+        cold_start = _cold_start
+        if _cold_start:
+            metrics.count("ColdStarts")
+            _cold_start = False
+        dequeued_at = int(time.time() * 1000)
+        
+        # Time spent waiting in the queue (SentTimestamp is epoch millis)
+        sent_timestamp = record.get("attributes", {}).get("SentTimestamp")
+        if sent_timestamp:
+            metrics.put("QueueWaitLatency", max(0, time.time() * 1000 - int(sent_timestamp)))
+        
         try:
             # Parse the SQS message
             message = json.loads(record["body"])
+            metrics.set_property("message_id", message.get("message_id"))
+            
+            # Continue the parser's SLA trace (jobs queued before tracing get a fresh one)
+            trace = message.get("trace") or new_trace(message.get("message_id"), message.get("timestamp"))
+            message["trace"] = trace
+            stamp(trace, "classifier_dequeued", dequeued_at)
+            metrics.set_property("correlation_id", trace["correlation_id"])
             
             # Get the user who forwarded the email (to send response back to them)
             response_email = message.get('forwarding_user', message.get('sender', 'unknown'))
             original_sender = message.get('sender', 'unknown')
             
-            # Check suppression list first
-            if is_email_suppressed(response_email):
+            # Check suppression list first, unless the parser just did
+            admitted = admission_is_fresh(message.get("admission")) and response_email == message.get("forwarding_user")
+            metrics.count("SuppressionChecksSkipped", int(admitted))
+            if not admitted and is_email_suppressed(response_email, metrics):
                 print(f"Email {response_email} is suppressed, not sending response")
+                metrics.count("EmailsSuppressed")
+                metrics.flush()
                 return {
                     'statusCode': 200,
                     'body': json.dumps('Email suppressed, no response sent')
@@ -702,58 +671,47 @@ def handler(event, context):
             
             
             # Classify the content with full message context
-            result = classify(message)
+            try:
+                with metrics.timer("ClassificationLatency"):
+                    result = classify(message)
+            except QuotaExceeded as e:
+                if defer_message(message, e.retry_after):
+                    metrics.count("QuotaDeferrals")
+                    metrics.flush()
+                    continue
+                result = {
+                    "label": "UNSURE",
+                    "reason": "Analysis service is under heavy load",
+                    "detailed_reason": "We could not analyze this message in time due to high demand. When in doubt, don't click links or share personal information."
+                }
             
+            stamp(trace, "classified")
             log.info(f"Classification result: {result}")
+            record_reputation(message, result, response_email, metrics)
+            for stage, elapsed_ms in DECISION_PIPELINE.last_timings.items():
+                metrics.put(stage_metric_name(stage), elapsed_ms)
             
-            # Get the appropriate emoji
-            emoji = get_emoji(result["label"])
+            # Send the verdict back to the user
+            with metrics.timer("SESSendLatency"):
+                trace["ses_message_id"] = send_verdict_email(ses, response_email, result, original_sender, domain_name)
+            stamp(trace, "verdict_sent")
+            emit_trace_metrics(trace, {
+                "Service": "classifier",
+                "Verdict": result["label"],
+                "Stage": result.get("stage"),
+                "ColdStart": cold_start
+            })
             
-            # Generate email content
-            html_body = generate_html_email(result, original_sender)
-            text_body = generate_text_email(result, original_sender)
-            
-            # Try to send email response
-            try:
-                response = ses.send_email(
-                    Source=f"ScamVanguard <noreply@{domain_name}>",
-                    Destination={
-                        'ToAddresses': [response_email]
-                    },
-                    Message={
-                        'Subject': {
-                            'Data': f"ScamVanguard Analysis: {emoji} {result['label']}",
-                            'Charset': 'UTF-8'
-                        },
-                        'Body': {
-                            'Text': {
-                                'Data': text_body,
-                                'Charset': 'UTF-8'
-                            },
-                            'Html': {
-                                'Data': html_body,
-                                'Charset': 'UTF-8'
-                            }
-                        }
-                    }
-                )
-                
-                log.info(f"Email sent to {response_email}, MessageId: {response['MessageId']}")
-                
-            except ClientError as e:
-                error_code = e.response['Error']['Code']
-                error_message = e.response['Error']['Message']
-                
-                if error_code == 'MessageRejected':
-                    log.error(f"SES MessageRejected: {error_message}")
-                    log.error(f"Make sure {response_email} is verified in SES (sandbox mode) or move SES out of sandbox mode")
-                    # Don't re-raise for email sending errors in sandbox mode
-                    # Just log and continue
-                else:
-                    raise
+            metrics.count("EmailsClassified")
+            metrics.set_dimension("Verdict", result["label"])
+            metrics.set_dimension("Stage", result.get("stage"))
+            metrics.set_dimension("Tier", result.get("tier"))
+            metrics.flush()
             
         except Exception as e:
             log.error(f"Error processing record: {str(e)}")
+            metrics.count("ClassificationErrors")
+            metrics.flush()
             # Re-raise to let Lambda retry (respecting the DLQ settings)
             raise
     
@@ -0,0 +1,89 @@
+import json
+import logging
+import threading
+import time
+
+log = logging.getLogger()
+
+
+class Stage:
+    """
+    One step of the decision pipeline.
+
+    `decide` receives the lazily computed features for a message and returns a
+    verdict dict to short-circuit the pipeline, or None to pass the message on
+    to the next (more expensive) stage. `cost` is a relative figure used only
+    for ordering.
+    """
+
+    def __init__(self, name, cost, decide):
+        self.name = name
+        self.cost = cost
+        self.decide = decide
+
+
+class DecisionPipeline:
+    """
+    Runs stages cheapest first until one returns a verdict, keeping per-stage
+    hit counts and timings for this container.
+    """
+
+    def __init__(self, stages=None):
+        self.stages = []
+        self.stats = {}
+        # Per thread, so concurrent runs (e.g. the local load test) don't mix timings
+        self._local = threading.local()
+        for stage in stages or []:
+            self.register(stage)
+
+    @property
+    def last_timings(self):
+        """Per-stage milliseconds of the most recent run on this thread."""
+        return getattr(self._local, "timings", {})
+
+    def register(self, stage):
+        """Add a stage, keeping the list ordered by cost."""
+        self.stages = sorted(
+            [s for s in self.stages if s.name != stage.name] + [stage],
+            key=lambda s: s.cost
+        )
+        self.stats.setdefault(stage.name, {"runs": 0, "hits": 0, "total_ms": 0.0})
+
+    def run(self, features):
+        """
+        Return the first verdict produced, tagged with the stage that made it.
+        Returns None when no stage decides.
+        """
+        timings = self._local.timings = {}
+        for stage in self.stages:
+            started = time.perf_counter()
+            try:
+                verdict = stage.decide(features)
+            finally:
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                timings[stage.name] = round(elapsed_ms, 2)
+                stats = self.stats[stage.name]
+                stats["runs"] += 1
+                stats["total_ms"] += elapsed_ms
+
+            if verdict is not None:
+                self.stats[stage.name]["hits"] += 1
+                self._log(stage.name, timings)
+                return {**verdict, "stage": stage.name}
+
+        self._log(None, timings)
+        return None
+
+    def hit_rates(self):
+        """Share of messages reaching each stage that it decided."""
+        return {
+            name: round(stats["hits"] / stats["runs"], 3) if stats["runs"] else 0.0
+            for name, stats in self.stats.items()
+        }
+
+    def _log(self, decided_by, timings):
+        log.info("Pipeline metrics: " + json.dumps({
+            "decided_by": decided_by,
+            "stage_ms": timings,
+            "hit_rates": self.hit_rates(),
+        }))
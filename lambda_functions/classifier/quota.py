@@ -0,0 +1,320 @@
+import json
+import logging
+import math
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from botocore.exceptions import ClientError
+
+log = logging.getLogger()
+
+# Per-tier limits come from the OPENAI_QUOTA_LIMITS environment variable,
+# which Terraform sets from var.openai_quota_limits to match the account's tier
+TIER_METERS = ("rpm", "tpm", "daily_tokens")
+
+# Counter items live in the suppression table next to the rate_limit# entries
+QUOTA_KEY_PREFIX = "quota#"
+MINUTE_COUNTER_TTL_SECONDS = 120
+DAY_COUNTER_TTL_SECONDS = 2 * 86400
+
+
+class QuotaExceeded(Exception):
+    """Raised when no model tier has capacity left for a request."""
+
+    def __init__(self, retry_after, reason="OpenAI quota exhausted"):
+        super().__init__(reason)
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class Grant:
+    """
+    Capacity reserved on one tier for a single model call; `parent` is the
+    grant from the enclosing governor, if any.
+    """
+
+    def __init__(self, tier, estimated_tokens, minute, day, parent=None):
+        self.tier = tier
+        self.estimated_tokens = estimated_tokens
+        self.minute = minute
+        self.day = day
+        self.parent = parent
+
+
+class LocalCounterStore:
+    """
+    In-memory counter store with the same semantics as DynamoCounterStore.
+    Used by tests and local runs; one instance per process.
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def increment(self, key, amount, limit=None, ttl=None):
+        """
+        Atomically add amount to key. Returns the new value, or None when the
+        increment would push the counter past limit (nothing is written).
+        """
+        with self.lock:
+            value, expires = self.counters.get(key, (0, None))
+            if expires is not None and expires <= self.clock():
+                value = 0
+            if limit is not None and value + amount > limit:
+                return None
+            self.counters[key] = (value + amount, ttl if ttl is not None else expires)
+            return value + amount
+
+    def get(self, key):
+        with self.lock:
+            value, expires = self.counters.get(key, (0, None))
+            if expires is not None and expires <= self.clock():
+                return 0
+            return value
+
+
+class DynamoCounterStore:
+    """
+    Counter store backed by atomic DynamoDB ADD updates, shared by every
+    classifier container. Limits are enforced with a condition expression so
+    concurrent increments can never overshoot.
+    """
+
+    def __init__(self, table):
+        self.table = table
+
+    def increment(self, key, amount, limit=None, ttl=None):
+        params = {
+            "Key": {"email": f"{QUOTA_KEY_PREFIX}{key}"},
+            "UpdateExpression": "ADD #count :amount SET #type = :type",
+            "ExpressionAttributeNames": {"#count": "count", "#type": "type"},
+            "ExpressionAttributeValues": {":amount": amount, ":type": "quota_counter"},
+            "ReturnValues": "UPDATED_NEW",
+        }
+        if ttl is not None:
+            params["UpdateExpression"] += ", #ttl = :ttl"
+            params["ExpressionAttributeNames"]["#ttl"] = "ttl"
+            params["ExpressionAttributeValues"][":ttl"] = int(ttl)
+        if limit is not None:
+            params["ConditionExpression"] = "attribute_not_exists(#count) OR #count <= :max"
+            params["ExpressionAttributeValues"][":max"] = limit - amount
+
+        try:
+            response = self.table.update_item(**params)
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                return None
+            raise
+        return int(response["Attributes"]["count"])
+
+    def get(self, key):
+        response = self.table.get_item(Key={"email": f"{QUOTA_KEY_PREFIX}{key}"})
+        return int(response.get("Item", {}).get("count", 0))
+
+
+def load_tier_limits(variable="OPENAI_QUOTA_LIMITS"):
+    """
+    Per-tier limits from the JSON in the `variable` environment variable.
+    Raises when it is missing or malformed: guessed limits would either
+    overrun the OpenAI account or throttle it for nothing.
+    """
+    try:
+        limits = json.loads(os.environ[variable])
+    except KeyError:
+        raise RuntimeError(f"{variable} is not set; it carries the OpenAI limits per model tier") from None
+    except ValueError as e:
+        raise RuntimeError(f"{variable} is not valid JSON: {str(e)}") from None
+
+    if not isinstance(limits, dict) or not limits:
+        raise RuntimeError(f"{variable} must map model tiers to their limits")
+    for tier, values in limits.items():
+        if not isinstance(values, dict) or not all(
+                isinstance(values.get(meter), (int, float)) and values[meter] >= 1 for meter in TIER_METERS):
+            raise RuntimeError(f"{variable} needs positive {', '.join(TIER_METERS)} for {tier}")
+        limits[tier] = {meter: int(value) for meter, value in values.items()}
+    return limits
+
+
+class QuotaGovernor:
+    """
+    Shared token-bucket governor for OpenAI calls.
+
+    Each tier is metered on requests per minute, tokens per minute and a daily
+    token budget. acquire() reserves an estimate up front on the first tier
+    in preference order with room; record_usage() reconciles the estimate with
+    the usage OpenAI actually reports.
+
+    A governor with a `namespace` keeps its own counters (keys prefixed
+    "<namespace>#") and, given a `parent`, must also be admitted by it: its
+    limits are then a cap inside the parent's budget, so one caller (the
+    classification API) can't use up what the others need.
+    """
+
+    def __init__(self, store, limits=None, clock=time.time, namespace=None, parent=None):
+        self.store = store
+        self.limits = limits if limits is not None else load_tier_limits()
+        self.clock = clock
+        self.namespace = namespace
+        self.parent = parent
+
+    def _key(self, tier, meter, window):
+        prefix = f"{self.namespace}#" if self.namespace else ""
+        return f"{prefix}{tier}#{meter}#{window}"
+
+    def _windows(self):
+        now = self.clock()
+        minute = int(now // 60)
+        day = datetime.fromtimestamp(now, tz=timezone.utc).strftime("%Y-%m-%d")
+        return now, minute, day
+
+    def _seconds_to_next_minute(self, now):
+        return max(1, math.ceil(60 - (now % 60)))
+
+    def _seconds_to_next_day(self, now):
+        return max(1, math.ceil(86400 - (now % 86400)))
+
+    def acquire(self, tiers, estimated_tokens):
+        """
+        Reserve capacity on the first tier in `tiers` that can take the call.
+        Returns a Grant, or raises QuotaExceeded with the shortest wait after
+        which any of the tiers could admit the request again.
+        """
+        now, minute, day = self._windows()
+        retry_after = None
+
+        for tier in tiers:
+            limits = self.limits.get(tier)
+            tokens, wait, reserved = self._clamp(limits, estimated_tokens), None, False
+            if limits:
+                try:
+                    wait = self._try_reserve(tier, limits, tokens, now, minute, day)
+                    reserved = wait is None
+                except Exception as e:
+                    # Fail open like the sender rate limiter: a broken counter
+                    # must not stop classification
+                    log.error(f"Quota store error for {tier}, allowing call: {str(e)}")
+
+            if wait is None and self.parent is not None:
+                try:
+                    return Grant(tier, tokens, minute, day, self.parent.acquire([tier], estimated_tokens))
+                except QuotaExceeded as e:
+                    if reserved:
+                        self._unreserve(tier, tokens, minute, day)
+                    wait = e.retry_after
+
+            if wait is None:
+                return Grant(tier, tokens, minute, day)
+
+            scope = f"{self.namespace} share of {tier}" if self.namespace else tier
+            log.warning(f"OpenAI quota reached for {scope}, retry in {wait}s")
+            retry_after = wait if retry_after is None else min(retry_after, wait)
+
+        raise QuotaExceeded(retry_after or self._seconds_to_next_minute(now))
+
+    def _clamp(self, limits, estimated_tokens):
+        """
+        The reservation for an estimate: never more than a whole minute's (or
+        day's) tokens, or an oversized request would wait on an empty tier
+        forever. record_usage() still books what the call really used.
+        """
+        caps = [limits[meter] for meter in ("tpm", "daily_tokens") if limits and limits.get(meter)]
+        return min([estimated_tokens] + caps)
+
+    def _try_reserve(self, tier, limits, estimated_tokens, now, minute, day):
+        """Reserve on all three meters for one tier. Returns None or seconds to wait."""
+        minute_ttl = now + MINUTE_COUNTER_TTL_SECONDS
+        day_ttl = now + DAY_COUNTER_TTL_SECONDS
+        reserved = []
+
+        meters = [
+            (self._key(tier, "rpm", minute), 1, limits.get("rpm"), minute_ttl, self._seconds_to_next_minute(now)),
+            (self._key(tier, "tpm", minute), estimated_tokens, limits.get("tpm"), minute_ttl,
+             self._seconds_to_next_minute(now)),
+            (self._key(tier, "day", day), estimated_tokens, limits.get("daily_tokens"), day_ttl,
+             self._seconds_to_next_day(now)),
+        ]
+
+        for key, amount, limit, ttl, wait in meters:
+            if self.store.increment(key, amount, limit, ttl) is None:
+                # Give back whatever this attempt already took
+                for reserved_key, reserved_amount in reserved:
+                    self.store.increment(reserved_key, -reserved_amount)
+                return wait
+            reserved.append((key, amount))
+
+        return None
+
+    def _unreserve(self, tier, estimated_tokens, minute, day):
+        """Undo a reservation the parent governor then refused."""
+        try:
+            self.store.increment(self._key(tier, "rpm", minute), -1)
+            self.store.increment(self._key(tier, "tpm", minute), -estimated_tokens)
+            self.store.increment(self._key(tier, "day", day), -estimated_tokens)
+        except Exception as e:
+            log.error(f"Failed to undo OpenAI quota reservation for {tier}: {str(e)}")
+
+    def record_usage(self, grant, usage):
+        """
+        Reconcile a grant with the usage block from an OpenAI response.
+        Returns the actual total token count.
+        """
+        if usage is not None and grant.parent is not None:
+            self.parent.record_usage(grant.parent, usage)
+        if usage is None or grant.tier not in self.limits:
+            return None
+
+        if isinstance(usage, dict):
+            total = usage.get("total_tokens") or usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+        else:
+            total = getattr(usage, "total_tokens", None) or (
+                getattr(usage, "input_tokens", 0) + getattr(usage, "output_tokens", 0)
+            )
+
+        delta = int(total) - grant.estimated_tokens
+        if delta:
+            try:
+                self.store.increment(self._key(grant.tier, "tpm", grant.minute), delta)
+                self.store.increment(self._key(grant.tier, "day", grant.day), delta)
+            except Exception as e:
+                log.error(f"Failed to record OpenAI usage for {grant.tier}: {str(e)}")
+        return int(total)
+
+    def release(self, grant):
+        """Return the tokens of a grant whose call never reached the model."""
+        if grant.parent is not None:
+            self.parent.release(grant.parent)
+        if grant.tier not in self.limits:
+            return
+        try:
+            self.store.increment(self._key(grant.tier, "tpm", grant.minute), -grant.estimated_tokens)
+            self.store.increment(self._key(grant.tier, "day", grant.day), -grant.estimated_tokens)
+        except Exception as e:
+            log.error(f"Failed to release OpenAI quota for {grant.tier}: {str(e)}")
+
+    def saturate(self, tier):
+        """
+        Mark a tier as full for the rest of the current minute, e.g. after
+        OpenAI answered 429, so other containers stop hitting it. A 429 means
+        the shared account is full, so the parent is saturated too.
+        """
+        if self.parent is not None:
+            self.parent.saturate(tier)
+        limits = self.limits.get(tier)
+        if not limits or not limits.get("rpm"):
+            return
+        now, minute, _ = self._windows()
+        key = self._key(tier, "rpm", minute)
+        try:
+            current = self.store.get(key)
+            if current < limits["rpm"]:
+                self.store.increment(key, limits["rpm"] - current, None, now + MINUTE_COUNTER_TTL_SECONDS)
+        except Exception as e:
+            log.error(f"Failed to saturate OpenAI quota for {tier}: {str(e)}")
+
+
+def estimate_tokens(*texts, expected_output_tokens=400):
+    """Rough token estimate (~4 characters per token) used for reservations."""
+    return sum(len(text) for text in texts) // 4 + expected_output_tokens
@@ -0,0 +1,157 @@
+"""
+Learned reputation of sender domains.
+
+Every verdict the classifier reaches by analysis (local model or LLM) on a
+message whose From: domain passed SPF/DKIM/DMARC is added to a per-domain
+item in the suppression table, keyed `reputation#<registrable domain>`.
+Counts decay with a half-life of REPUTATION_HALF_LIFE_DAYS using forward
+decay: an update at time t adds 2^((t - EPOCH) / half_life) with an atomic
+ADD, and readers divide by the same factor for "now". Concurrent containers
+never read-modify-write, and an old verdict weighs half as much after every
+half-life.
+
+A domain is trusted (or distrusted) once its decayed history is long enough,
+old enough, seen by enough distinct reporters and nearly unanimous; the
+`reputation` pipeline stage then answers without calling a model, SAFE only
+for a message that authenticates as that domain. Reads go through a small
+TTL LRU per container.
+"""
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from decimal import Decimal
+
+log = logging.getLogger()
+
+# Reputation items live in the suppression table next to the rate_limit# entries
+REPUTATION_KEY_PREFIX = "reputation#"
+
+# Forward-decay landmark (2025-01-01 UTC). Weights double every half-life, so
+# with the default 30 days they stay far inside DynamoDB's number range for
+# decades. Changing the half-life rescales existing items; reset them instead.
+EPOCH = 1_735_689_600
+HALF_LIFE_SECONDS = float(os.environ.get("REPUTATION_HALF_LIFE_DAYS", "30")) * 86400
+
+# What it takes to answer from history alone
+MIN_VERDICTS = float(os.environ.get("REPUTATION_MIN_VERDICTS", "20"))
+MIN_REPORTERS = int(os.environ.get("REPUTATION_MIN_REPORTERS", "5"))
+MIN_AGE_SECONDS = float(os.environ.get("REPUTATION_MIN_AGE_DAYS", "14")) * 86400
+MAX_DISSENT = float(os.environ.get("REPUTATION_MAX_DISSENT", "0.02"))
+
+# Reporter hashes stop being added past this (the threshold only needs MIN_REPORTERS)
+MAX_REPORTERS = 50
+# Idle domains expire after a year
+ITEM_TTL_SECONDS = 365 * 86400
+
+CACHE_TTL_SECONDS = float(os.environ.get("REPUTATION_CACHE_TTL_SECONDS", "300"))
+CACHE_SIZE = int(os.environ.get("REPUTATION_CACHE_SIZE", "10000"))
+
+LABELS = ("SAFE", "SCAM")
+
+
+def decay_factor(at):
+    """2^((at - EPOCH) / half-life): the weight of a verdict recorded at `at`."""
+    return 2 ** ((at - EPOCH) / HALF_LIFE_SECONDS)
+
+
+def reporter_hash(email):
+    """Short digest of a forwarding user, so items never hold addresses."""
+    return hashlib.sha256(email.lower().encode("utf-8")).hexdigest()[:16]
+
+
+class Reputation:
+    """Decayed SAFE/SCAM counts for one domain as of `now`."""
+
+    def __init__(self, item, now):
+        scale = decay_factor(now)
+        self.safe = float(item.get("safe", 0)) / scale
+        self.scam = float(item.get("scam", 0)) / scale
+        self.reporters = len(item.get("reporters", ()))
+        self.first_seen = int(item.get("first_seen", now))
+        self.age = now - self.first_seen
+
+    @property
+    def total(self):
+        return self.safe + self.scam
+
+    def consensus(self):
+        """SAFE or SCAM when the history is long, old, broad and nearly unanimous, else None."""
+        if self.total < MIN_VERDICTS or self.reporters < MIN_REPORTERS or self.age < MIN_AGE_SECONDS:
+            return None
+        for label, count in (("SAFE", self.safe), ("SCAM", self.scam)):
+            if (self.total - count) / self.total <= MAX_DISSENT:
+                return label
+        return None
+
+
+class ReputationStore:
+    """
+    Reputation items in DynamoDB behind a per-container TTL LRU. The table is
+    passed in (like quota.DynamoCounterStore) so tests can use a LocalTable.
+    """
+
+    def __init__(self, table, cache_ttl=CACHE_TTL_SECONDS, max_entries=CACHE_SIZE, clock=time.time):
+        self.table = table
+        self.cache_ttl = cache_ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._cache = OrderedDict()  # domain -> (item, expires_at)
+
+    def _remember(self, domain, item):
+        self._cache[domain] = (item, self.clock() + self.cache_ttl)
+        self._cache.move_to_end(domain)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def item(self, domain):
+        """The raw item for `domain` ({} when unseen), cached per container."""
+        entry = self._cache.get(domain)
+        if entry is not None and entry[1] > self.clock():
+            self._cache.move_to_end(domain)
+            return entry[0]
+
+        response = self.table.get_item(Key={"email": f"{REPUTATION_KEY_PREFIX}{domain}"})
+        item = response.get("Item", {})
+        self._remember(domain, item)
+        return item
+
+    def lookup(self, domain):
+        """Reputation of `domain` now; lookup errors propagate to the caller."""
+        return Reputation(self.item(domain), self.clock())
+
+    def record(self, domain, label, reporter):
+        """
+        Atomically add one verdict for `domain`, weighted for the current time,
+        and note the reporter (up to MAX_REPORTERS distinct ones).
+        """
+        if label not in LABELS:
+            return None
+        now = self.clock()
+        counter = label.lower()
+        expression = "ADD #count :weight"
+        names = {"#count": counter, "#type": "type", "#ttl": "ttl", "#first": "first_seen", "#last": "last_seen"}
+        values = {
+            ":weight": Decimal(repr(decay_factor(now))),
+            ":type": "domain_reputation",
+            ":ttl": int(now + ITEM_TTL_SECONDS),
+            ":now": int(now),
+        }
+        cached = self._cache.get(domain)
+        if cached is None or len(cached[0].get("reporters", ())) < MAX_REPORTERS:
+            expression += ", #reporters :reporter"
+            names["#reporters"] = "reporters"
+            values[":reporter"] = {reporter_hash(reporter)}
+        expression += " SET #type = :type, #ttl = :ttl, #last = :now, #first = if_not_exists(#first, :now)"
+
+        response = self.table.update_item(
+            Key={"email": f"{REPUTATION_KEY_PREFIX}{domain}"},
+            UpdateExpression=expression,
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+            ReturnValues="ALL_NEW",
+        )
+        item = response.get("Attributes", {})
+        self._remember(domain, item)
+        return Reputation(item, now)
@@ -0,0 +1,72 @@
+import os
+import json
+import time
+import hmac
+import hashlib
+import logging
+import boto3
+
+# Set up logging
+log = logging.getLogger()
+log.setLevel(logging.INFO)
+
+# Initialize AWS clients
+secrets = boto3.client("secretsmanager")
+
+# Secret holding {"<client name>": "<api key>", ...}
+API_KEYS_SECRET_NAME = os.environ.get("API_KEYS_SECRET_NAME", "")
+
+# Re-read the keys this often so rotated or revoked keys take effect without a deploy
+KEYS_CACHE_SECONDS = 300
+
+# (digest → client name, loaded_at); keys are kept only as SHA-256 digests
+_keys_cache = (None, 0.0)
+
+
+def digest(key):
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def load_keys():
+    """Client name by key digest, from Secrets Manager with caching."""
+    global _keys_cache
+
+    keys, loaded_at = _keys_cache
+    if keys is not None and time.time() - loaded_at < KEYS_CACHE_SECONDS:
+        return keys
+
+    response = secrets.get_secret_value(SecretId=API_KEYS_SECRET_NAME)
+    keys = {digest(key): client for client, key in json.loads(response["SecretString"]).items() if key}
+    _keys_cache = (keys, time.time())
+    return keys
+
+
+def client_for(key):
+    """The client a presented key belongs to, or None."""
+    if not key:
+        return None
+    presented = digest(key)
+    for known, client in load_keys().items():
+        if hmac.compare_digest(presented, known):
+            return client
+    return None
+
+
+def handler(event, context):
+    """
+    HTTP API Lambda authorizer (simple responses) for POST /classify.
+    Allows requests whose x-api-key header matches a configured key and
+    passes the client name on in the request context. Fails closed: any
+    error reading the keys denies the request.
+    """
+    headers = {k.lower(): v for k, v in (event.get("headers") or {}).items()}
+    try:
+        client = client_for(headers.get("x-api-key", ""))
+    except Exception as e:
+        log.error(f"Failed to load API keys: {str(e)}")
+        client = None
+
+    if client is None:
+        log.warning(f"Rejected classify API request from {event.get('requestContext', {}).get('http', {}).get('sourceIp')}")
+        return {"isAuthorized": False}
+    return {"isAuthorized": True, "context": {"client": client}}
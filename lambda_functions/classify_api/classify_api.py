@@ -0,0 +1,253 @@
+import os
+import sys
+import json
+import base64
+import logging
+import time
+
+if __name__ == "__main__":
+    # Running from a checkout; the image copies these into the task root
+    HERE = os.path.dirname(os.path.abspath(__file__))
+    sys.path[:0] = [os.path.join(HERE, '..'), os.path.join(HERE, '..', 'email_parser'),
+                    os.path.join(HERE, '..', 'classifier')]
+
+# email_parser reads these at import; the API never touches S3 or SQS
+os.environ.setdefault("ATTACHMENT_BUCKET", "")
+os.environ.setdefault("PROCESSING_QUEUE_URL", "")
+
+import email_parser
+import classifier
+from pipeline import DecisionPipeline
+from quota import QuotaExceeded, QuotaGovernor, load_tier_limits
+from shared.canonical import canonicalize
+from shared.metrics import MetricsLogger
+from shared.profiling import profiled
+
+# Set up logging
+log = logging.getLogger()
+log.setLevel(logging.INFO)
+
+# Largest request body accepted (API Gateway itself caps payloads at 10 MB)
+MAX_BODY_BYTES = int(os.environ.get("MAX_BODY_BYTES", str(1024 * 1024)))
+
+# Stands in for the forwarding user during extraction
+API_USER = "api@scamvanguard.com"
+
+# ?mode=fast: everything but the model, so the answer never waits on OpenAI
+FAST_PIPELINE = DecisionPipeline([s for s in classifier.DECISION_PIPELINE.stages if s.name != "llm"])
+
+# First request handled by this container pays the cold start
+_cold_start = True
+
+
+def api_quota_governor(shared):
+    """
+    The email path's OpenAI governor with the API's own share (API_QUOTA_LIMITS)
+    in front of it, so API traffic can never use up the budget forwarded
+    emails need.
+    """
+    return QuotaGovernor(shared.store, load_tier_limits("API_QUOTA_LIMITS"), shared.clock,
+                         namespace="api", parent=shared)
+
+
+classifier.quota_governor = api_quota_governor(classifier.quota_governor)
+
+
+class BadRequest(Exception):
+    """A request we can't classify; carries the HTTP status to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def respond(status, body, headers=None):
+    return {
+        "statusCode": status,
+        "headers": {"Content-Type": "application/json", **(headers or {})},
+        "body": json.dumps(body)
+    }
+
+
+def header(event, name):
+    """Case-insensitive header lookup (REST APIs keep the client's casing)."""
+    for key, value in (event.get("headers") or {}).items():
+        if key.lower() == name:
+            return value or ""
+    return ""
+
+
+def pasted_fields(text, sender=None, subject=None):
+    """Job fields for a message pasted as text, headers and all."""
+    content = email_parser.extract_forwarded_content(None, text)
+    trimmed_text, trimmed = email_parser.trim_forwarded_content(content)
+    subject = subject or email_parser.extract_original_subject(content)
+    return {
+        "sender": sender or email_parser.extract_original_sender_from_forwarded(content)
+                  or "unknown-sender@unknown.domain",
+        "subject": subject,
+        "text": trimmed_text,
+        "trimmed": trimmed,
+        "canonical_subject": canonicalize(subject),
+        "canonical_text": canonicalize(trimmed_text),
+        "has_attachments": False,
+        "has_images": False
+    }
+
+
+def read_request(event, metrics):
+    """
+    Turn the request into job fields. Accepted bodies:
+      message/rfc822 (or any binary type)  raw email bytes
+      text/plain                           a pasted message
+      application/json                     {"raw": ..., "encoding": "base64"?, "forwarded": false}
+                                           or {"message": ..., "sender": ..., "subject": ...}
+    Raw emails are the suspicious message itself unless `forwarded` is set.
+    """
+    body = event.get("body") or ""
+    try:
+        data = base64.b64decode(body) if event.get("isBase64Encoded") else body.encode("utf-8")
+    except ValueError:
+        raise BadRequest("Body is not valid base64")
+    if not data:
+        raise BadRequest("Empty request body")
+    if len(data) > MAX_BODY_BYTES:
+        raise BadRequest(f"Body exceeds {MAX_BODY_BYTES} bytes", 413)
+    metrics.put("RequestBytes", len(data), "Bytes")
+
+    forwarded = (event.get("queryStringParameters") or {}).get("forwarded") == "true"
+    content_type = header(event, "content-type").split(";")[0].strip().lower()
+
+    if content_type == "application/json":
+        try:
+            payload = json.loads(data)
+        except ValueError:
+            raise BadRequest("Body is not valid JSON")
+        if not isinstance(payload, dict):
+            raise BadRequest("Expected a JSON object")
+        if isinstance(payload.get("raw"), str):
+            try:
+                raw = base64.b64decode(payload["raw"]) if payload.get("encoding") == "base64" \
+                    else payload["raw"].encode("utf-8")
+            except ValueError:
+                raise BadRequest("'raw' is not valid base64")
+            return email_parser.extract_email_fields(raw, API_USER, metrics, bool(payload.get("forwarded", forwarded)))
+        if isinstance(payload.get("message"), str):
+            return pasted_fields(payload["message"], payload.get("sender"), payload.get("subject"))
+        raise BadRequest("Expected a 'raw' or 'message' field")
+
+    if content_type.startswith("text/"):
+        return pasted_fields(data.decode("utf-8", errors="ignore"))
+
+    return email_parser.extract_email_fields(data, API_USER, metrics, forwarded)
+
+
+def classify_fast(job):
+    """The cheap pipeline stages only; undecided messages come back UNSURE."""
+    result = FAST_PIPELINE.run(classifier.MessageFeatures(job))
+    return result or {
+        "label": "UNSURE",
+        "reason": "Not decided without full analysis",
+        "detailed_reason": "No quick check was conclusive. Retry without mode=fast for a full analysis.",
+        "stage": "skipped"
+    }
+
+
+@profiled("classify_api")
+def handler(event, context):
+    """
+    Classify one email synchronously (API Gateway / function URL event) and
+    return the verdict as JSON. Deterministic verdicts never leave the
+    container; only undecided messages wait on the model cascade.
+    """
+    global _cold_start
+    started = time.perf_counter()
+
+    metrics = MetricsLogger("classify_api")
+    metrics.count("ApiRequests")
+    # Set by the API key authorizer
+    client = ((event.get("requestContext") or {}).get("authorizer") or {}).get("lambda", {}).get("client")
+    metrics.set_property("Client", client)
+    if _cold_start:
+        metrics.count("ColdStarts")
+        _cold_start = False
+
+    try:
+        fields = read_request(event, metrics)
+        job = {**fields, "forwarding_user": API_USER}
+        email_parser.fit_job(job)  # Same text budget as a queued job
+
+        # One pass: the pipeline's rule stages are the parser's pre-check
+        fast = (event.get("queryStringParameters") or {}).get("mode") == "fast"
+        pipeline = FAST_PIPELINE if fast else classifier.DECISION_PIPELINE
+        with metrics.timer("ClassificationLatency"):
+            result = classify_fast(job) if fast else classifier.classify(job)
+        for stage, elapsed_ms in pipeline.last_timings.items():
+            metrics.put(classifier.stage_metric_name(stage), elapsed_ms)
+
+    except BadRequest as e:
+        metrics.count("ApiBadRequests")
+        metrics.flush()
+        return respond(e.status, {"error": str(e)})
+    except QuotaExceeded as e:
+        log.warning(f"OpenAI quota exhausted, retry in {e.retry_after}s")
+        metrics.count("QuotaRejections")
+        metrics.flush()
+        return respond(503, {"error": "Analysis service is under heavy load"},
+                       {"Retry-After": str(max(1, int(e.retry_after)))})
+    except Exception as e:
+        log.error(f"Error classifying request: {str(e)}")
+        metrics.count("ApiErrors")
+        metrics.flush()
+        return respond(500, {"error": "Internal error"})
+
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+    log.info(f"API verdict for {client}: {result['label']} ({result.get('stage')}) for {job['sender']} in {elapsed_ms}ms")
+    metrics.put("ApiLatency", elapsed_ms)
+    metrics.count("EmailsClassified")
+    metrics.set_dimension("Verdict", result["label"])
+    metrics.set_dimension("Stage", result.get("stage"))
+    metrics.set_dimension("Tier", result.get("tier"))
+    metrics.flush()
+
+    return respond(200, {
+        "label": result["label"],
+        "reason": result.get("reason"),
+        "detailed_reason": result.get("detailed_reason"),
+        "confidence": result.get("confidence"),
+        "stage": result.get("stage"),
+        "tier": result.get("tier"),
+        "sender": job["sender"],
+        "subject": job["subject"],
+        "latency_ms": elapsed_ms
+    })
+
+
+if __name__ == "__main__":
+    # python classify_api.py suspicious.eml [--pasted] [--forwarded] [--fast]
+    import argparse
+    from quota import LocalCounterStore
+
+    parser = argparse.ArgumentParser(description="Classify one email through the API handler locally")
+    parser.add_argument("path", help="raw .eml file, or a pasted message with --pasted ('-' for stdin)")
+    parser.add_argument("--pasted", action="store_true", help="input is pasted text, not RFC 822")
+    parser.add_argument("--forwarded", action="store_true", help="input is a report forwarded to scan@")
+    parser.add_argument("--fast", action="store_true", help="skip the model cascade")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    if os.environ.get("OPENAI_API_KEY"):
+        classifier._openai_key_cache = os.environ["OPENAI_API_KEY"]
+    classifier.quota_governor = api_quota_governor(QuotaGovernor(LocalCounterStore()))
+
+    data = sys.stdin.buffer.read() if args.path == "-" else open(args.path, "rb").read()
+    query = {"forwarded": "true"} if args.forwarded else {}
+    if args.fast:
+        query["mode"] = "fast"
+    response = handler({
+        "headers": {"content-type": "text/plain" if args.pasted else "message/rfc822"},
+        "queryStringParameters": query,
+        "isBase64Encoded": True,
+        "body": base64.b64encode(data).decode("ascii")
+    }, None)
+    print(response["statusCode"], json.dumps(json.loads(response["body"]), indent=2))
@@ -4,12 +4,25 @@ import json
 import email
 import logging
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from email import policy
 from email.parser import BytesParser
 from email.utils import parseaddr
 from datetime import datetime, timedelta
 from decimal import Decimal
 from html.parser import HTMLParser
+from shared.domain_rules import deterministic_verdict
+from shared.canonical import canonicalize
+from shared.attachments import build_manifest, attachment_names
+from shared.links import extract_links
+from shared.authentication import message_authentication, extract_authentication, headers_from_text
+from shared.suppression import suppression_cache, admission
+from shared.verdict_email import send_verdict_email
+from shared.metrics import MetricsLogger
+from shared.tracing import new_trace, stamp, emit_trace_metrics
+from shared.profiling import profiled
 
 class HTMLStripper(HTMLParser):
     """Helper class to strip HTML tags"""
@@ -40,12 +53,14 @@ log.setLevel(logging.INFO)
 # Initialize AWS clients
 s3 = boto3.client("s3")
 sqs = boto3.client("sqs")
+ses = boto3.client("ses")
 dynamodb = boto3.resource('dynamodb')
 
 # Environment variables
 BUCKET = os.environ["ATTACHMENT_BUCKET"]
 QUEUE_URL = os.environ["PROCESSING_QUEUE_URL"]
 SUPPRESSION_TABLE = os.environ.get("SUPPRESSION_TABLE", "ScamVanguardEmailSuppression")
+DOMAIN_NAME = os.environ.get("DOMAIN_NAME", "scamvanguard.com")
 
 # Rate limiting configuration
 RATE_LIMIT_WINDOW_MINUTES = 60  # 1 hour window
@@ -55,6 +70,26 @@ RATE_LIMIT_BLOCK_DAYS = 1        # Block for 1 day after rate limit exceeded
 # Get DynamoDB tables
 suppression_table = dynamodb.Table(SUPPRESSION_TABLE)
 
+# Serialized job budget in bytes: the SQS 256KB limit less headroom for the
+# trace stamps and deferral count the classifier adds before re-queueing
+MAX_JOB_BYTES = 250_000
+
+# Emptied, then cut, in this order when a job is still over budget without its text
+JOB_OVERFLOW_FIELDS = ("attachment_manifest", "links", "authentication")
+JOB_OVERFLOW_STRINGS = ("attachments", "subject", "sender")
+MAX_OVERFLOW_CHARS = 1000
+
+# Largest raw email we download and parse. SES accepts up to 40MB, but
+# decoding and archive inspection take several copies of the message, more
+# than the parser's 512MB can hold at that size
+MAX_EMAIL_BYTES = 10_000_000
+
+# Background worker for overlapping the S3 download with the admission gate
+io_pool = ThreadPoolExecutor(max_workers=2)
+
+# First invocation in this container (surfaces cold starts on trace metrics)
+_cold_start = True
+
 def check_rate_limit(email_address):
     """
     Check if email has exceeded rate limit.
@@ -146,24 +181,51 @@ def add_to_suppression_list(email_address, reason, detail):
                 'ttl': ttl
             }
         )
+        suppression_cache.invalidate(email_address)
         
         log.info(f"Added {email_address} to suppression list. Reason: {reason}")
         
     except Exception as e:
         log.error(f"Error adding to suppression list: {str(e)}")
 
-def is_email_suppressed(email_address):
+def is_email_suppressed(email_address, metrics=None):
     """
-    Check if email is in suppression list
+    Check if email is in suppression list (cached per container; on error,
+    let the email in)
     """
-    try:
-        response = suppression_table.get_item(
-            Key={'email': email_address.lower()}
-        )
-        return 'Item' in response
-    except Exception as e:
-        log.error(f"Error checking suppression list: {str(e)}")
-        return False
+    return suppression_cache.is_suppressed(suppression_table, email_address, on_error=False, metrics=metrics)
+
+class EmailTooLarge(Exception):
+    """Raised when the stored raw email is over MAX_EMAIL_BYTES."""
+
+    def __init__(self, size):
+        super().__init__(f"Email is {size} bytes, over the {MAX_EMAIL_BYTES} byte limit")
+        self.size = size
+
+def fetch_raw_email(s3_key, cancelled=None):
+    """
+    Download the raw email from S3. Returns (raw_bytes, elapsed_ms), with
+    raw_bytes None when the download was cancelled before the body was read.
+    Raises EmailTooLarge, without reading the body, for oversized objects.
+    """
+    started = time.perf_counter()
+    response = s3.get_object(Bucket=BUCKET, Key=s3_key)
+    if cancelled is not None and cancelled.is_set():
+        # Admission already failed - don't pull the body over the network
+        response["Body"].close()
+        return None, (time.perf_counter() - started) * 1000
+    if response.get("ContentLength", 0) > MAX_EMAIL_BYTES:
+        response["Body"].close()
+        raise EmailTooLarge(response["ContentLength"])
+    raw_email = response["Body"].read()
+    return raw_email, (time.perf_counter() - started) * 1000
+
+def discard_fetch(future, cancelled):
+    """Cancel a pending S3 download, or drop its result if already running."""
+    cancelled.set()
+    if not future.cancel():
+        # Already in flight; swallow any error since the result is unused
+        future.add_done_callback(lambda f: f.exception())
 
 def extract_original_sender_from_forwarded(email_content, forwarding_user=None):
     """
@@ -180,26 +242,29 @@ def extract_original_sender_from_forwarded(email_content, forwarding_user=None):
     # Log a snippet of what we're searching through
     log.info(f"Searching for sender in content (first 500 chars): {plain_content[:500]}")
     
-    # Common forwarding patterns - updated to be more flexible
+    # Common forwarding patterns - updated to be more flexible.
+    # Repetitions are bounded (an address is at most 254 chars) and dash runs
+    # are anchored to their first dash, so a hostile 250 KB body can't make
+    # these backtrack quadratically.
     patterns = [
         # Basic patterns with flexible spacing and quotes
-        r'From:\s*["\']?([^<\n"\'>]+@[^<\n"\'>]+)["\']?',
-        r'From:\s*<?([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})>?',
+        r'From:\s*["\']?([^<\n"\'>@]{1,254}+@[^<\n"\'>]{1,254})["\']?',
+        r'From:\s*<?([a-zA-Z0-9._%+-]{1,64}@[a-zA-Z0-9.-]{1,253}\.[a-zA-Z]{2,63})>?',
         # Generic – first address on the From: line (brackets optional)
-        r'From:[^\n]*?\s<?\s*([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})\s*>?',
+        r'From:[^\n]{0,254}?\s<?\s*([a-zA-Z0-9._%+-]{1,64}@[a-zA-Z0-9.-]{1,253}\.[a-zA-Z]{2,63})\s*>?',
         # Gmail forward style
-        r'------+\s*Forwarded message\s*------+.*?From:\s*<?([^<\n>]+@[^<\n>]+)>?',
+        r'(?<!-)------+\s*Forwarded message\s*------+.*?From:\s*<?([^<\n>]{1,254}@[^<\n>]{1,254})>?',
         # Outlook style
-        r'From:\s*([^\[]+)\s*\[mailto:([^\]]+)\]',
+        r'From:\s*([^\[]{1,254}+)\s*\[mailto:([^\]]{1,254})\]',
         # Generic forward indicators
-        r'Begin forwarded message:.*?From:\s*<?([^<\n>]+@[^<\n>]+)>?',
-        r'----+\s*Original Message\s*----+.*?From:\s*<?([^<\n>]+@[^<\n>]+)>?',
+        r'Begin forwarded message:.*?From:\s*<?([^<\n>]{1,254}@[^<\n>]{1,254})>?',
+        r'(?<!-)----+\s*Original Message\s*----+.*?From:\s*<?([^<\n>]{1,254}@[^<\n>]{1,254})>?',
         # Just email address on a line after "From:"
-        r'From:\s*\n?\s*([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})',
+        r'From:\s*\n?\s*([a-zA-Z0-9._%+-]{1,64}@[a-zA-Z0-9.-]{1,253}\.[a-zA-Z]{2,63})',
     ]
     
-    # Try patterns on both HTML and plain content
-    for content in [email_content, plain_content]:
+    # Try patterns on both HTML and plain content (once when they're the same)
+    for content in dict.fromkeys([email_content, plain_content]):
         for pattern in patterns:
             matches = re.finditer(pattern, content, re.IGNORECASE | re.MULTILINE | re.DOTALL)
             for match in matches:
@@ -222,7 +287,7 @@ def extract_original_sender_from_forwarded(email_content, forwarding_user=None):
                         return email_addr
     
     # Try one more approach - look for standalone email addresses
-    email_pattern = r'\b([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})\b'
+    email_pattern = r'\b([a-zA-Z0-9._%+-]{1,64}@[a-zA-Z0-9.-]{1,253}\.[a-zA-Z]{2,63})\b'
     all_emails = re.findall(email_pattern, plain_content)
     
     # Filter out common system emails and the forwarding user's email
@@ -246,18 +311,51 @@ def extract_forwarded_content(msg, full_content):
         r'Begin forwarded message:',
         r'-----Original Message-----',
         r'> From:',  # Quoted forward
-        r'From:.*?Sent:.*?To:.*?Subject:',  # Outlook pattern
+        # Outlook pattern (From: ... Sent: ... To: ... Subject: on one line).
+        # Only the line's first From: is tried and the atomic groups take the
+        # earliest Sent:/To:/Subject:, keeping this linear on long lines.
+        r'^(?:(?!From:)[^\n])*(From:(?>.*?Sent:)(?>.*?To:)(?>.*?Subject:))',
     ]
     
     for pattern in forward_patterns:
-        match = re.search(pattern, full_content, re.IGNORECASE)
+        match = re.search(pattern, full_content, re.IGNORECASE | re.MULTILINE)
         if match:
             # Return everything after the forward delimiter
-            return full_content[match.start():]
+            return full_content[match.start(match.lastindex or 0):]
     
     # If no forward pattern found, return the whole content
     return full_content
 
+def forwarded_header_block(text):
+    """
+    The header block that opens the text (headers pasted from "show
+    original") or directly follows the first forward delimiter, up to the
+    first blank line. Anything further down is the suspicious message's own
+    body, where a sender can write header lines of their choosing, so it's
+    never read as headers. A forward header (From:, Sent:, ...) above the
+    delimiter means the delimiter itself came from the forwarded body.
+    """
+    lines = text.replace("\r\n", "\n").split("\n")
+    start = 0
+    while start < len(lines) and not lines[start].strip():
+        start += 1
+    if start < len(lines) and not RAW_HEADER_LINE.match(lines[start]):
+        for i in range(start, len(lines)):
+            if FORWARD_DELIMITER.match(lines[i]):
+                start = i + 1
+                break
+            if HEADER_LINE.match(lines[i]):
+                return ""
+        else:
+            return ""
+
+    block = []
+    for line in lines[start:]:
+        if not line.strip() or not (RAW_HEADER_LINE.match(line) or line[:1] in (" ", "\t")):
+            break
+        block.append(line)
+    return "\n".join(block)
+
 def extract_original_subject(email_content):
     """
     Extract the original subject from forwarded email.
@@ -285,16 +383,346 @@ def extract_original_subject(email_content):
     
     return "No Subject"
 
+# Baggage trimmed from forwarded content before classification. All
+# patterns are matched one line at a time, so they stay linear.
+FORWARD_DELIMITER = re.compile(
+    r'\s*(?:-{5,}\s*(?:Forwarded message|Original Message)\s*-{5,}|Begin forwarded message:)\s*$',
+    re.IGNORECASE
+)
+HEADER_LINE = re.compile(r'\s*(?:From|Sent|Date|To|Cc|Subject|Reply-To):', re.IGNORECASE)
+RAW_HEADER_LINE = re.compile(r'[A-Za-z0-9-]+:')
+QUOTED_LINE = re.compile(r'\s*>')
+DEVICE_TAG = re.compile(r'\s*(?:Sent from my \w+|Sent from (?:Mail|Outlook) for \w+|Get Outlook for \w+)', re.IGNORECASE)
+DISCLAIMER = re.compile(
+    r'intended (?:solely )?for the (?:use of the )?(?:individual|addressee|named recipient)'
+    r'|if you are not the intended recipient'
+    r'|confidentiality notice'
+    r'|this (?:e-?mail|message)(?: and any attachments?)? (?:is|are|may be) (?:strictly )?confidential'
+    r'|please consider the environment before printing',
+    re.IGNORECASE
+)
+HTML_MARKUP = re.compile(r'<(?:html|body|div|p|br|table)\b', re.IGNORECASE)
+SIGNATURE_MAX_LINES = 10  # a longer "-- " block is probably message text
+
+def is_attribution(line):
+    """'On Mon, Jan 13, 2025 at 9:14 AM Jane <jane@x.com> wrote:'"""
+    line = line.strip()
+    return len(line) < 300 and line.startswith("On ") and line.endswith("wrote:")
+
+def trim_forwarded_content(content):
+    """
+    Separate the suspicious message from what was sent along with it:
+    `>`-quoted history, nested forward headers, signatures and legal
+    footers. The leading forward header block is kept. HTML bodies are
+    returned as they are.
+    Returns (trimmed_text, cut) where cut counts the characters removed
+    per kind.
+    """
+    cut = {"quoted": 0, "forward_headers": 0, "signature": 0, "footer": 0}
+    if HTML_MARKUP.search(content):
+        return content, cut
+
+    lines = content.split("\n")
+
+    # The first delimiter/header block identifies the message; keep it
+    start = 0
+    while start < len(lines) and (FORWARD_DELIMITER.match(lines[start]) or HEADER_LINE.match(lines[start])):
+        start += 1
+    kept = lines[:start]
+
+    signature = None
+    in_headers = False
+
+    def end_signature():
+        # Short "-- " blocks are signatures; anything longer stays
+        if signature is not None and len(signature) <= SIGNATURE_MAX_LINES + 1:
+            cut["signature"] += sum(len(line) + 1 for line in signature)
+        elif signature is not None:
+            kept.extend(signature)
+
+    for i in range(start, len(lines)):
+        line = lines[i]
+        if QUOTED_LINE.match(line) or is_attribution(line):
+            kind = "quoted"
+        elif FORWARD_DELIMITER.match(line) or (HEADER_LINE.match(line) and (
+                in_headers or (i + 1 < len(lines) and HEADER_LINE.match(lines[i + 1])))):
+            kind = "forward_headers"
+        else:
+            kind = None
+        in_headers = kind == "forward_headers"
+
+        if kind is not None:
+            end_signature()
+            signature = None
+            cut[kind] += len(line) + 1
+        elif signature is not None:
+            signature.append(line)
+        elif line.rstrip("\r") in ("-- ", "--"):
+            signature = [line]
+        elif DEVICE_TAG.match(line):
+            cut["signature"] += len(line) + 1
+        else:
+            kept.append(line)
+    end_signature()
+
+    # Legal footers: trailing paragraphs that read like a disclaimer
+    while True:
+        while len(kept) > start and not kept[-1].strip():
+            kept.pop()
+        blank = len(kept) - 1
+        while blank >= start and kept[blank].strip():
+            blank -= 1
+        paragraph = kept[blank + 1:]
+        if blank < start or not DISCLAIMER.search(" ".join(paragraph)):
+            break
+        cut["footer"] += sum(len(line) + 1 for line in paragraph)
+        del kept[blank + 1:]
+
+    # Nothing left but headers (e.g. a fully quoted forward): keep it all
+    if not any(line.strip() for line in kept[start:]):
+        return content, {kind: 0 for kind in cut}
+
+    trimmed = re.sub(r'\n(?:[ \t]*\n){2,}', '\n\n', "\n".join(kept))
+    return trimmed, cut
+
+def attached_original(msg):
+    """
+    The first email forwarded as an attachment (a message/rfc822 part, or an
+    .eml file some clients send as application/octet-stream), or None.
+    """
+    for part in msg.walk():
+        try:
+            if part.get_content_type() == "message/rfc822":
+                return part.get_content()
+            if (part.get_filename() or "").lower().endswith(".eml") and not part.is_multipart():
+                return BytesParser(policy=policy.default).parsebytes(part.get_payload(decode=True) or b"")
+        except Exception as e:
+            log.warning(f"Could not parse attached message: {str(e)}")
+            return None
+    return None
+
+def message_body(msg):
+    """Best body of a message: plain text, else HTML, else the first text part found."""
+    body_part = msg.get_body(preferencelist=("plain", "html"))
+    if body_part:
+        return body_part.get_content()
+    
+    # Fallback: walk through all parts
+    body = ""
+    for part in msg.walk():
+        if part.get_content_type() == "text/plain":
+            return part.get_payload(decode=True).decode('utf-8', errors='ignore')
+        elif part.get_content_type() == "text/html" and not body:
+            body = part.get_payload(decode=True).decode('utf-8', errors='ignore')
+    return body
+
+def message_links(msg):
+    """Links as the reader sees them: href plus the text shown for it."""
+    html_part = msg.get_body(preferencelist=("html",))
+    if not html_part:
+        return []
+    try:
+        return extract_links(html_part.get_content())
+    except Exception as e:
+        log.warning(f"Could not read HTML part for links: {str(e)}")
+        return []
+
+def header_date(msg):
+    """The Date: header as ISO 8601, or None when missing or unparseable."""
+    try:
+        date = msg.get("Date")
+        return date.datetime.isoformat() if date is not None and date.datetime else None
+    except Exception:
+        return None
+
+def extract_email_fields(raw_email, forwarding_user, metrics=None, forwarded=True):
+    """
+    Parse a raw forwarded email and pull out what the classifier needs:
+    original sender, subject, trimmed forwarded text (plus what trimming
+    cut), canonical subject/text for the keyword rules, attachment flags,
+    the attachment manifest (see shared/attachments.py), the HTML links
+    with their display text (see shared/links.py) and the original's
+    SPF/DKIM/DMARC results (see shared/authentication.py).
+    Records MIME parse and extraction timings when `metrics` is given.
+    With forwarded=False the email is the suspicious message itself, and an
+    email forwarded as an attachment (message/rfc822) is read the same way
+    from the attached original; sender, subject and date then come straight
+    from headers and no forwarding patterns are searched.
+    """
+    # Parse email
+    started = time.perf_counter()
+    msg = BytesParser(policy=policy.default).parsebytes(raw_email)
+    
+    # Forwarded as an attachment: the original, with its real headers, is right there
+    original = attached_original(msg) if forwarded else None
+    if original is None and not forwarded:
+        original = msg
+    source = "attachment" if forwarded else "headers"
+    
+    # Extract text content (prefer plain text over HTML)
+    body = message_body(original if original is not None else msg)
+    links = message_links(original if original is not None else msg)
+    
+    if metrics is not None:
+        metrics.put("MimeParseLatency", (time.perf_counter() - started) * 1000)
+        if forwarded:
+            metrics.count("AttachedOriginals", int(original is not None))
+    
+    # Extract the forwarded content
+    started = time.perf_counter()
+    original_date = None
+    if original is not None:
+        forwarded_content = body
+        original_sender = str(original.get("From", "")) or None
+        original_date = header_date(original)
+        authentication = message_authentication(original, source)
+    else:
+        forwarded_content = extract_forwarded_content(msg, body)
+        
+        # Try to extract the original sender from the forwarded email
+        original_sender = extract_original_sender_from_forwarded(forwarded_content, forwarding_user)
+        
+        # Authentication headers pasted into the text, from the header block
+        # only (the forwarder's own describe their mail)
+        authentication = extract_authentication(headers_from_text(forwarded_header_block(body)), "forwarded_text")
+    
+    # If we couldn't find the original sender, check email headers
+    if not original_sender:
+        # Sometimes the original sender is in the email headers as "X-Forwarded-From"
+        headers = original if original is not None else msg
+        for header in ["X-Forwarded-From", "X-Original-From", "Reply-To"]:
+            if headers.get(header):
+                original_sender = headers.get(header)
+                break
+    
+    # Extract original subject from forwarded content
+    if original is not None and original.get("Subject"):
+        original_subject = str(original.get("Subject"))
+    else:
+        original_subject = extract_original_subject(forwarded_content)
+    
+    # If still no original sender found, note this in the sender field
+    if not original_sender:
+        log.warning("Could not extract original sender from forwarded email")
+        original_sender = "unknown-sender@unknown.domain"
+    
+    # Check for attachments in the original email
+    has_attachments = any(
+        part.get_content_disposition() == "attachment"
+        for part in msg.walk()
+    )
+    
+    # Also check for image attachments (screenshots)
+    has_images = any(
+        part.get_content_type().startswith("image/")
+        for part in msg.walk()
+    )
+    
+    # Name, types, size and SHA-256 of every attachment, hashed while decoding
+    manifest_started = time.perf_counter()
+    manifest = build_manifest(msg)
+    if metrics is not None:
+        metrics.put("AttachmentScanLatency", (time.perf_counter() - manifest_started) * 1000)
+    
+    # Drop quoted history, nested headers, signatures and footers
+    text, trimmed = trim_forwarded_content(forwarded_content)
+    if any(trimmed.values()):
+        log.info(f"Trimmed {len(forwarded_content) - len(text)} chars before classification: {trimmed}")
+    
+    if metrics is not None:
+        metrics.put("ExtractionLatency", (time.perf_counter() - started) * 1000)
+        metrics.put("TrimmedChars", len(forwarded_content) - len(text), "Count")
+    
+    # Normalized once here so no rule downstream re-lowercases the text
+    started = time.perf_counter()
+    canonical_subject, canonical_text = canonicalize(original_subject), canonicalize(text)
+    if metrics is not None:
+        metrics.put("CanonicalizeLatency", (time.perf_counter() - started) * 1000)
+    
+    return {
+        "sender": original_sender,
+        "subject": original_subject,
+        "text": text,
+        "trimmed": trimmed,
+        "canonical_subject": canonical_subject,
+        "canonical_text": canonical_text,
+        "has_attachments": has_attachments,
+        "has_images": has_images,
+        "attachments": attachment_names(manifest),
+        "attachment_manifest": manifest,
+        "links": links,
+        "authentication": authentication,
+        "date": original_date
+    }
+
+def fit_job(job, limit=MAX_JOB_BYTES):
+    """
+    Serialize `job`, trimming it until the UTF-8 JSON is at most `limit`
+    bytes. The canonical copies go first (the classifier rebuilds them from
+    `text`), then `text` is cut from the end; the cut is counted in
+    job["trimmed"]["queue_budget"]. If that isn't enough (huge attachment
+    names, link lists or subject), JOB_OVERFLOW_FIELDS are dropped and
+    JOB_OVERFLOW_STRINGS cut to MAX_OVERFLOW_CHARS, listed in
+    job["trimmed"]["queue_dropped"]. Returns the JSON body.
+    """
+    body = json.dumps(job)
+    if len(body.encode("utf-8")) <= limit:
+        return body
+
+    job.pop("canonical_subject", None)
+    job.pop("canonical_text", None)
+    job["trimmed"] = dict(job.get("trimmed") or {})
+    job["text"] = job.get("text") or ""
+    original_length = len(job["text"])
+    while True:
+        job["trimmed"]["queue_budget"] = original_length - len(job["text"])
+        body = json.dumps(job)
+        excess = len(body.encode("utf-8")) - limit
+        if excess <= 0 or not job["text"]:
+            break
+        # Escaped size per character varies (\uXXXX for non-ASCII), so cut by the average and re-check
+        bytes_per_char = len(json.dumps(job["text"])) / len(job["text"])
+        job["text"] = job["text"][:max(0, len(job["text"]) - int(excess / bytes_per_char) - 1)]
+
+    # Everything else in the job comes from the email too
+    dropped = []
+    for field in JOB_OVERFLOW_FIELDS + JOB_OVERFLOW_STRINGS:
+        if excess <= 0:
+            break
+        if field in JOB_OVERFLOW_FIELDS and job.get(field):
+            job[field] = None
+        elif field in JOB_OVERFLOW_STRINGS and len(job.get(field) or "") > MAX_OVERFLOW_CHARS:
+            job[field] = job[field][:MAX_OVERFLOW_CHARS]
+        else:
+            continue
+        dropped.append(field)
+        job["trimmed"]["queue_dropped"] = dropped
+        body = json.dumps(job)
+        excess = len(body.encode("utf-8")) - limit
+
+    log.info(f"Job over {limit} bytes: dropped canonical fields, cut {job['trimmed']['queue_budget']} chars"
+             f"{f', trimmed {dropped}' if dropped else ''}")
+    return body
+
+@profiled("email_parser")
 def handler(event, context):
     """
     Process incoming email from SES, extract content, and queue for classification.
     """
     
+    global _cold_start
+    cold_start, _cold_start = _cold_start, False
+    parser_started = int(time.time() * 1000)
+    
     log.info("=" * 60)
     log.info("FULL SES EVENT:")
     log.info(json.dumps(event, indent=2, default=str))
     log.info("=" * 60)
 
+    # Per-stage timings and outcome counts, written as one EMF record
+    metrics = MetricsLogger("email_parser")
+    metrics.count("EmailsReceived")
+
     try:
         # Extract SES event data
         ses_mail = event["Records"][0]["ses"]["mail"]
@@ -308,10 +736,25 @@ def handler(event, context):
         # Get the user who forwarded this (for sending response back)
         forwarding_user = ses_mail.get("source", "unknown").lower()
         log.info(f"Email forwarded by: {forwarding_user}")
+        metrics.set_property("message_id", message_id)
+        
+        # SLA trace, anchored at SES receipt and carried in the job
+        trace = new_trace(message_id, ses_mail.get("timestamp"))
+        stamp(trace, "parser_started", parser_started)
+        trace["parser_cold_start"] = cold_start
+        metrics.set_property("correlation_id", trace["correlation_id"])
+        
+        # Start the S3 download now; it only matters if admission passes
+        cancelled = threading.Event()
+        s3_future = io_pool.submit(fetch_raw_email, s3_key, cancelled)
+        started = time.perf_counter()
         
         # Check if user is suppressed
-        if is_email_suppressed(forwarding_user):
+        admitted_at = time.time()
+        if is_email_suppressed(forwarding_user, metrics):
+            discard_fetch(s3_future, cancelled)
             log.warning(f"Email from {forwarding_user} is suppressed. Not processing.")
+            metrics.count("EmailsSuppressed")
             return {
                 "statusCode": 200,
                 "body": json.dumps({"message": "Email from suppressed sender"})
@@ -321,7 +764,9 @@ def handler(event, context):
         is_allowed, email_count = check_rate_limit(forwarding_user)
         
         if not is_allowed:
+            discard_fetch(s3_future, cancelled)
             log.warning(f"Rate limit exceeded for {forwarding_user}. Count: {email_count}")
+            metrics.count("EmailsRateLimited")
             # Add to suppression list
             add_to_suppression_list(
                 forwarding_user,
@@ -337,68 +782,33 @@ def handler(event, context):
             }
         
         log.info(f"Rate limit check passed. Email #{email_count} in current window for {forwarding_user}")
-        
-        # Retrieve email from S3
-        response = s3.get_object(Bucket=BUCKET, Key=s3_key)
-        raw_email = response["Body"].read()
+        metrics.put("DynamoGateLatency", (time.perf_counter() - started) * 1000)
+        
+        # Retrieve email from S3 (usually finished while the gate ran)
+        started = time.perf_counter()
+        try:
+            raw_email, s3_fetch_ms = s3_future.result()
+        except EmailTooLarge as e:
+            # Retrying can't help, so answer instead of raising
+            log.warning(f"Not processing {message_id} from {forwarding_user}: {str(e)}")
+            metrics.count("EmailsTooLarge")
+            metrics.put("EmailBytes", e.size, "Bytes")
+            return {
+                "statusCode": 413,
+                "body": json.dumps({"message": "Email too large"})
+            }
+        metrics.put("S3FetchLatency", s3_fetch_ms)
+        metrics.put("S3WaitLatency", (time.perf_counter() - started) * 1000)
+        metrics.put("EmailBytes", len(raw_email), "Bytes")
         
         log.info("=" * 60)
         log.info("FULL RAW EMAIL FROM S3:")
         log.info(raw_email.decode('utf-8', errors='ignore'))
         log.info("=" * 60)
 
-        # Parse email
-        msg = BytesParser(policy=policy.default).parsebytes(raw_email)
-        
-        # Extract text content (prefer plain text over HTML)
-        body = ""
-        
-        # Try to get the best body representation
-        body_part = msg.get_body(preferencelist=("plain", "html"))
-        if body_part:
-            body = body_part.get_content()
-        else:
-            # Fallback: walk through all parts
-            for part in msg.walk():
-                if part.get_content_type() == "text/plain":
-                    body = part.get_payload(decode=True).decode('utf-8', errors='ignore')
-                    break
-                elif part.get_content_type() == "text/html" and not body:
-                    body = part.get_payload(decode=True).decode('utf-8', errors='ignore')
-        
-        # Extract the forwarded content
-        forwarded_content = extract_forwarded_content(msg, body)
-        
-        # Try to extract the original sender from the forwarded email
-        original_sender = extract_original_sender_from_forwarded(forwarded_content, forwarding_user)
-        
-        # If we couldn't find the original sender, check email headers
-        if not original_sender:
-            # Sometimes the original sender is in the email headers as "X-Forwarded-From"
-            for header in ["X-Forwarded-From", "X-Original-From", "Reply-To"]:
-                if msg.get(header):
-                    original_sender = msg.get(header)
-                    break
-        
-        # Extract original subject from forwarded content
-        original_subject = extract_original_subject(forwarded_content)
-        
-        # If still no original sender found, note this in the sender field
-        if not original_sender:
-            log.warning("Could not extract original sender from forwarded email")
-            original_sender = "unknown-sender@unknown.domain"
-        
-        # Check for attachments in the original email
-        has_attachments = any(
-            part.get_content_disposition() == "attachment"
-            for part in msg.walk()
-        )
-        
-        # Also check for image attachments (screenshots)
-        has_images = any(
-            part.get_content_type().startswith("image/")
-            for part in msg.walk()
-        )
+        fields = extract_email_fields(raw_email, forwarding_user, metrics)
+        original_sender = fields["sender"]
+        original_subject = fields["subject"]
         
         # Prepare job for classification queue
         job = {
@@ -406,22 +816,60 @@ def handler(event, context):
             "sender": original_sender,  # Original sender of suspicious email
             "forwarding_user": forwarding_user,  # User who forwarded to ScamVanguard
             "subject": original_subject,
-            "text": forwarded_content[:250_000],  # Stay under SQS 256KB limit
-            "has_attachments": has_attachments,
-            "has_images": has_images,
+            "text": fields["text"],
+            "canonical_subject": fields["canonical_subject"],
+            "canonical_text": fields["canonical_text"],
+            "has_attachments": fields["has_attachments"],
+            "has_images": fields["has_images"],
+            "attachments": fields["attachments"],  # Filenames, archive members included
+            "attachment_manifest": fields["attachment_manifest"],
+            "links": fields["links"],  # [{"href", "text"}] from the HTML body
+            "authentication": fields["authentication"],  # Original's SPF/DKIM/DMARC results, or None
+            "original_date": fields["date"],  # Original's Date: (ISO 8601) when its headers were available
             "s3_key": s3_key,
             "timestamp": ses_mail.get("timestamp", ""),
-            "rate_limit_count": email_count  # Include for monitoring
+            "rate_limit_count": email_count,  # Include for monitoring
+            "admission": admission(False, admitted_at),  # Lets the classifier skip its suppression lookup
+            "trimmed": fields["trimmed"],  # Characters cut per kind before classification
+            "trace": trace
         }
         
         # Log what we extracted
         log.info(f"Extracted - Original sender: {original_sender}, Subject: {original_subject[:50]}...")
         
+        # Answer sender/text-only cases here and skip the queue + classifier hop
+        started = time.perf_counter()
+        verdict = deterministic_verdict(original_sender, job["text"], job["attachments"],
+                                        job["attachment_manifest"], job["links"], job["authentication"],
+                                        job["canonical_text"])
+        metrics.put("RulesLatency", (time.perf_counter() - started) * 1000)
+        stamp(trace, "parser_completed")
+        
+        if verdict:
+            log.info(f"Deterministic verdict for {message_id}: {verdict['label']} ({verdict['stage']})")
+            # No queue hop: parsing and classifying are the same step here
+            stamp(trace, "classified", trace["stamps"]["parser_completed"])
+            with metrics.timer("SESSendLatency"):
+                trace["ses_message_id"] = send_verdict_email(ses, forwarding_user, verdict, original_sender, DOMAIN_NAME)
+            stamp(trace, "verdict_sent")
+            emit_trace_metrics(trace, {"Service": "email_parser", "Verdict": verdict["label"], "ColdStart": cold_start})
+            metrics.count("EmailsClassified")
+            metrics.set_dimension("Verdict", verdict["label"])
+            metrics.set_dimension("Stage", verdict["stage"])
+            return {
+                "statusCode": 200,
+                "body": json.dumps({"message": "Email answered without classification", "label": verdict["label"]})
+            }
+        
         # Send to SQS
-        sqs.send_message(
-            QueueUrl=QUEUE_URL,
-            MessageBody=json.dumps(job)
-        )
+        stamp(trace, "sqs_enqueued")
+        body = fit_job(job)  # Stay under the SQS 256KB limit
+        with metrics.timer("SQSSendLatency"):
+            sqs.send_message(
+                QueueUrl=QUEUE_URL,
+                MessageBody=body
+            )
+        metrics.count("EmailsQueued")
         
         log.info(f"Successfully queued email {message_id} for classification")
         
@@ -432,5 +880,9 @@ def handler(event, context):
         
     except Exception as e:
         log.error(f"Error processing email: {str(e)}")
+        metrics.count("ParserErrors")
         # Re-raise to let Lambda retry
-        raise
\ No newline at end of file
+        raise
+    
+    finally:
+        metrics.flush()
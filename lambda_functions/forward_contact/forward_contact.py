@@ -1,12 +1,15 @@
 import os
+import re
+import uuid
 import boto3
 import logging
-from io import BytesIO
 from email import policy
+from email.message import EmailMessage
 from email.parser import BytesParser
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.application import MIMEApplication
+from shared.metrics import MetricsLogger
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -19,7 +22,153 @@ KEY_PREFIX = os.environ.get("KEY_PREFIX", "contact/")
 FORWARD_TO = os.environ.get("FORWARD_EMAIL")
 FROM_ADDRESS = "noreply@scamvanguard.com"
 
+# "raw" forwards the original MIME body bytes untouched; "rebuild" parses
+# the message and re-assembles its text, HTML and attachments
+FORWARD_MODE = os.environ.get("FORWARD_MODE", "raw")
+
+# SES rejects raw messages over 10 MB, and the body is held in memory
+# (read, joined into the forward, then base64-encoded by the SES call).
+# Anything larger is left in S3 and only a notice is forwarded
+MAX_FORWARD_BYTES = 10_000_000
+
+# End of the header block, and the headers that describe the top-level body
+# (they move into the wrapped part along with the body bytes)
+HEADER_END = re.compile(rb'\r?\n\r?\n')
+HEADER_FIELD = re.compile(rb'\r?\n(?![ \t])')
+BODY_HEADER = re.compile(rb'content-', re.IGNORECASE)
+
+def raw_forward(raw_email, original_from, original_subject, forward_info):
+    """
+    Forward without decoding anything: new From/To/Reply-To/Subject headers,
+    a text part with the forward info, then the original top-level entity
+    (its Content-* headers and the body bytes exactly as received).
+    """
+    match = HEADER_END.search(raw_email)
+    header_block = raw_email[:match.start()] if match else raw_email
+    body_start = match.end() if match else len(raw_email)
+    
+    body_headers = b"".join(
+        re.sub(rb'\r?\n', b"\r\n", field) + b"\r\n"
+        for field in HEADER_FIELD.split(header_block) if BODY_HEADER.match(field)
+    )
+    
+    # The boundary must not occur anywhere in the original
+    boundary = f"=_forward_{uuid.uuid4().hex}"
+    while boundary.encode() in raw_email:
+        boundary = f"=_forward_{uuid.uuid4().hex}"
+    delimiter = f"--{boundary}".encode()
+    
+    # header_store_parse builds header objects, which fold non-ASCII as encoded words
+    headers = b"".join(
+        policy.SMTP.fold_binary(*policy.SMTP.header_store_parse(name, value)) for name, value in [
+            ("From", FROM_ADDRESS),
+            ("To", FORWARD_TO),
+            ("Reply-To", original_from),
+            ("Subject", f"Fwd: {original_subject}"),
+            ("MIME-Version", "1.0"),
+            ("Content-Type", f'multipart/mixed; boundary="{boundary}"'),
+        ]
+    )
+    info_part = MIMEText(forward_info, 'plain', 'utf-8')
+    del info_part['MIME-Version']
+    
+    # One copy of the body: join reads straight from the memoryview
+    return b"".join([
+        headers, b"\r\n",
+        delimiter, b"\r\n", info_part.as_bytes(policy=policy.SMTP), b"\r\n",
+        delimiter, b"\r\n", body_headers, b"\r\n",
+        memoryview(raw_email)[body_start:],
+        b"\r\n", delimiter, b"--\r\n",
+    ])
+
+def notice_forward(original_from, original_subject, forward_info, size, s3_key):
+    """
+    Forward only the forward info and where the original is stored, for
+    messages over MAX_FORWARD_BYTES
+    """
+    notice = EmailMessage(policy=policy.SMTP)
+    notice['Subject'] = f"Fwd: {original_subject}"
+    notice['From'] = FROM_ADDRESS
+    notice['To'] = FORWARD_TO
+    notice['Reply-To'] = original_from
+    notice.set_content(
+        forward_info + f"Original message is {size} bytes, over the {MAX_FORWARD_BYTES} byte "
+        f"forwarding limit. It is stored at s3://{BUCKET}/{s3_key}\n"
+    )
+    return notice.as_bytes()
+
+def rebuild_forward(raw_email, original_from, original_subject, forward_info, metrics):
+    """
+    Forward by parsing the original and re-assembling its first text and
+    HTML bodies and its attachments under the forward info
+    """
+    # Parse the original email
+    with metrics.timer("MimeParseLatency"):
+        msg = BytesParser(policy=policy.default).parsebytes(raw_email)
+
+    # Create a new forward message
+    forward_msg = MIMEMultipart('mixed')
+
+    # Set headers for the forwarded message
+    forward_msg['Subject'] = f"Fwd: {original_subject}"
+    forward_msg['From'] = FROM_ADDRESS
+    forward_msg['To'] = FORWARD_TO
+    forward_msg['Reply-To'] = original_from
+
+    # Extract original message body
+    body_text = ""
+    body_html = ""
+
+    if msg.is_multipart():
+        for part in msg.walk():
+            content_type = part.get_content_type()
+            if content_type == "text/plain" and not body_text:
+                body_text = part.get_content()
+            elif content_type == "text/html" and not body_html:
+                body_html = part.get_content()
+    else:
+        content_type = msg.get_content_type()
+        if content_type == "text/plain":
+            body_text = msg.get_content()
+        elif content_type == "text/html":
+            body_html = msg.get_content()
+
+    # Add text part
+    if body_text:
+        text_content = forward_info + body_text
+        text_part = MIMEText(text_content, 'plain')
+        forward_msg.attach(text_part)
+
+    # Add HTML part if exists
+    if body_html:
+        # Prepend forward info to HTML
+        html_info = forward_info.replace('\n', '<br>')
+        html_content = f"<div style='color: #666;'>{html_info}</div><hr>{body_html}"
+        html_part = MIMEText(html_content, 'html')
+        forward_msg.attach(html_part)
+
+    # If no text or HTML found, create a simple text message
+    if not body_text and not body_html:
+        text_part = MIMEText(forward_info + "Original message had no readable content.", 'plain')
+        forward_msg.attach(text_part)
+
+    # Handle attachments
+    if msg.is_multipart():
+        for part in msg.walk():
+            content_disposition = part.get("Content-Disposition", "")
+            if "attachment" in content_disposition:
+                filename = part.get_filename()
+                if filename:
+                    # Add original attachment
+                    attachment = MIMEApplication(part.get_payload(decode=True))
+                    attachment.add_header('Content-Disposition', 'attachment', filename=filename)
+                    forward_msg.attach(attachment)
+
+    # Convert message to string
+    return forward_msg.as_string()
+
 def handler(event, context):
+    metrics = MetricsLogger("forward_contact")
     try:
         logger.info("Processing SES event")
         
@@ -37,24 +186,21 @@ def handler(event, context):
         
         # Fetch email from S3
         try:
-            obj = s3.get_object(Bucket=BUCKET, Key=s3_key)
-            raw_email = obj["Body"].read()
+            with metrics.timer("S3FetchLatency"):
+                obj = s3.get_object(Bucket=BUCKET, Key=s3_key)
+                size = obj.get("ContentLength", 0)
+                if size > MAX_FORWARD_BYTES:
+                    # Don't pull the body into memory at all
+                    obj["Body"].close()
+                    raw_email = None
+                else:
+                    raw_email = obj["Body"].read()
+                    size = len(raw_email)
+            metrics.put("EmailBytes", size, "Bytes")
         except Exception as e:
             logger.error(f"Failed to fetch from S3: {str(e)}")
             raise
         
-        # Parse the original email
-        msg = BytesParser(policy=policy.default).parsebytes(raw_email)
-        
-        # Create a new forward message
-        forward_msg = MIMEMultipart('mixed')
-        
-        # Set headers for the forwarded message
-        forward_msg['Subject'] = f"Fwd: {original_subject}"
-        forward_msg['From'] = FROM_ADDRESS
-        forward_msg['To'] = FORWARD_TO
-        forward_msg['Reply-To'] = original_from
-        
         # Create forward information header
         forward_info = f"""
 ---------- Forwarded message ----------
@@ -65,66 +211,27 @@ To: contact@scamvanguard.com
 
 """
         
-        # Extract original message body
-        body_text = ""
-        body_html = ""
-        
-        if msg.is_multipart():
-            for part in msg.walk():
-                content_type = part.get_content_type()
-                if content_type == "text/plain" and not body_text:
-                    body_text = part.get_content()
-                elif content_type == "text/html" and not body_html:
-                    body_html = part.get_content()
+        if raw_email is None:
+            logger.warning(f"Email {message_id} is {size} bytes; forwarding a notice instead")
+            metrics.count("ContactEmailsTooLarge")
+            forward_raw = notice_forward(original_from, original_subject, forward_info, size, s3_key)
+        elif FORWARD_MODE == "rebuild":
+            forward_raw = rebuild_forward(raw_email, original_from, original_subject, forward_info, metrics)
         else:
-            content_type = msg.get_content_type()
-            if content_type == "text/plain":
-                body_text = msg.get_content()
-            elif content_type == "text/html":
-                body_html = msg.get_content()
-        
-        # Add text part
-        if body_text:
-            text_content = forward_info + body_text
-            text_part = MIMEText(text_content, 'plain')
-            forward_msg.attach(text_part)
-        
-        # Add HTML part if exists
-        if body_html:
-            # Prepend forward info to HTML
-            html_info = forward_info.replace('\n', '<br>')
-            html_content = f"<div style='color: #666;'>{html_info}</div><hr>{body_html}"
-            html_part = MIMEText(html_content, 'html')
-            forward_msg.attach(html_part)
-        
-        # If no text or HTML found, create a simple text message
-        if not body_text and not body_html:
-            text_part = MIMEText(forward_info + "Original message had no readable content.", 'plain')
-            forward_msg.attach(text_part)
-        
-        # Handle attachments
-        if msg.is_multipart():
-            for part in msg.walk():
-                content_disposition = part.get("Content-Disposition", "")
-                if "attachment" in content_disposition:
-                    filename = part.get_filename()
-                    if filename:
-                        # Add original attachment
-                        attachment = MIMEApplication(part.get_payload(decode=True))
-                        attachment.add_header('Content-Disposition', 'attachment', filename=filename)
-                        forward_msg.attach(attachment)
-        
-        # Convert message to string
-        forward_raw = forward_msg.as_string()
+            with metrics.timer("ForwardBuildLatency"):
+                forward_raw = raw_forward(raw_email, original_from, original_subject, forward_info)
+        metrics.put("ForwardBytes", len(forward_raw), "Bytes")
         
         # Send the email
         logger.info(f"Sending forwarded email to {FORWARD_TO}")
         
-        response = ses.send_raw_email(
-            Source=FROM_ADDRESS,
-            Destinations=[FORWARD_TO],
-            RawMessage={'Data': forward_raw}
-        )
+        with metrics.timer("SESSendLatency"):
+            response = ses.send_raw_email(
+                Source=FROM_ADDRESS,
+                Destinations=[FORWARD_TO],
+                RawMessage={'Data': forward_raw}
+            )
+        metrics.count("ContactEmailsForwarded")
         
         logger.info(f"Email forwarded successfully. MessageId: {response['MessageId']}")
         
@@ -136,4 +243,7 @@ To: contact@scamvanguard.com
     except Exception as e:
         logger.error(f"Error processing email: {str(e)}")
         logger.error(f"Event: {event}")
-        raise
\ No newline at end of file
+        metrics.count("ContactForwardErrors")
+        raise
+    finally:
+        metrics.flush()
\ No newline at end of file
@@ -1,86 +1,279 @@
 import json
 import boto3
+import hashlib
 import os
-from datetime import datetime, timedelta
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from botocore.exceptions import ClientError
+from shared.metrics import MetricsLogger
+from shared.suppression import suppression_cache
 
 dynamodb = boto3.resource('dynamodb')
 table = dynamodb.Table(os.environ['SUPPRESSION_TABLE'])
 
+# Keep suppressed for 6 months
+SUPPRESSION_DAYS = 180
+
+# Transient (soft) bounces are counted per address; an address that keeps
+# soft-bouncing within the window is suppressed for a shorter period
+SOFT_BOUNCE_THRESHOLD = int(os.environ.get("SOFT_BOUNCE_THRESHOLD", "3"))
+SOFT_BOUNCE_WINDOW_DAYS = int(os.environ.get("SOFT_BOUNCE_WINDOW_DAYS", "7"))
+SOFT_BOUNCE_SUPPRESSION_DAYS = int(os.environ.get("SOFT_BOUNCE_SUPPRESSION_DAYS", "30"))
+
+# BatchWriteItem takes at most 25 puts; unprocessed items are retried with
+# full-jitter exponential backoff
+BATCH_SIZE = 25
+MAX_WRITE_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 0.05
+BACKOFF_MAX_SECONDS = 2.0
+
+# Complaints outrank bounces when one address has both in an invocation
+REASON_PRIORITY = {'complaint': 3, 'bounce': 2, 'soft_bounce': 1}
+
 def handler(event, context):
     """
-    Process SES bounce and complaint notifications from SNS
+    Process SES bounce and complaint notifications, delivered one at a time
+    by SNS or in batches from the feedback SQS queue
     """
-    for record in event['Records']:
-        if record['EventSource'] != 'aws:sns':
-            continue
-            
-        message = json.loads(record['Sns']['Message'])
+    metrics = MetricsLogger("ses_feedback_processor")
+    bounces = complaints = soft_bounces = 0
+    suppressions = {}
+    soft_bounce_ids = {}  # address -> SES feedback ids of its soft bounces
+    sources = {}  # address -> SQS message ids it came from
+
+    for record_id, message in feedback_messages(event):
         notification_type = message.get('notificationType')
-        
+
         if notification_type == 'Bounce':
-            process_bounce(message)
+            bounces += 1
+            with metrics.timer("BounceProcessingLatency"):
+                items = process_bounce(message)
+                if message['bounce']['bounceType'] == 'Transient':
+                    soft_bounces += 1
+                    for email in transient_recipients(message):
+                        soft_bounce_ids.setdefault(email, set()).add(feedback_id(message))
+                        sources.setdefault(email, set()).add(record_id)
         elif notification_type == 'Complaint':
-            process_complaint(message)
-    
-    return {'statusCode': 200}
+            complaints += 1
+            with metrics.timer("ComplaintProcessingLatency"):
+                items = process_complaint(message)
+        else:
+            continue
+
+        collect(suppressions, items)
+        for item in items:
+            sources.setdefault(item['email'], set()).add(record_id)
+
+    # Soft-bounce counters; addresses over the threshold join the batch
+    with metrics.timer("SoftBounceCounterLatency"):
+        escalated, failed = count_soft_bounces(soft_bounce_ids)
+    collect(suppressions, escalated)
+
+    # One batched, idempotent write for every recipient in the invocation
+    with metrics.timer("SuppressionWriteLatency"):
+        failed += write_suppressions(list(suppressions.values()), metrics)
+
+    metrics.count("FeedbackRecords", len(event['Records']))
+    metrics.count("BouncesReceived", bounces)
+    metrics.count("SoftBouncesReceived", soft_bounces)
+    metrics.count("ComplaintsReceived", complaints)
+    metrics.count("SoftBounceEscalations", len(escalated))
+    metrics.count("SuppressionWrites", len(suppressions) - len(failed))
+    metrics.count("SuppressionWriteFailures", len(failed))
+    metrics.flush()
+
+    if any(record.get('eventSource') == 'aws:sqs' for record in event['Records']):
+        # Only the messages behind failed addresses go back on the queue
+        failed_ids = sorted({record_id for email in failed for record_id in sources.get(email, ())})
+        return {'batchItemFailures': [{'itemIdentifier': record_id} for record_id in failed_ids]}
+
+    if failed:
+        # Writes are idempotent, so failing the invocation lets Lambda retry safely
+        raise RuntimeError(f"Failed to suppress {len(failed)} addresses: {', '.join(failed)}")
+
+    return {'statusCode': 200, 'suppressed': len(suppressions)}
+
+def feedback_messages(event):
+    """
+    Yield (record_id, SES notification) for SNS records and for SQS records
+    (raw SNS delivery, or the SNS envelope when raw delivery is off).
+    record_id is the SQS message id, None for SNS.
+    """
+    for record in event['Records']:
+        if record.get('EventSource') == 'aws:sns':
+            yield None, json.loads(record['Sns']['Message'])
+        elif record.get('eventSource') == 'aws:sqs':
+            body = json.loads(record['body'])
+            if body.get('Type') == 'Notification' and 'Message' in body:
+                body = json.loads(body['Message'])
+            yield record['messageId'], body
+
+def collect(suppressions, items):
+    """Merge suppression items by address, keeping the strongest reason."""
+    for item in items:
+        current = suppressions.get(item['email'])
+        if current is None or REASON_PRIORITY[item['reason']] > REASON_PRIORITY[current['reason']]:
+            suppressions[item['email']] = item
 
 def process_bounce(message):
     """
-    Handle bounce notifications
+    Handle bounce notifications; returns the suppression items to write
     """
     bounce = message['bounce']
     bounce_type = bounce['bounceType']
-    
+
     # Only suppress hard bounces and complaints
-    if bounce_type == 'Permanent':
-        for recipient in bounce['bouncedRecipients']:
-            email = recipient['emailAddress']
-            suppress_email(email, 'bounce', bounce_type)
-            
-            # Log for monitoring
-            print(f"Suppressed email due to permanent bounce: {email}")
+    if bounce_type != 'Permanent':
+        return []
+
+    items = []
+    for recipient in bounce['bouncedRecipients']:
+        email = recipient['emailAddress']
+        items.append(suppression_item(email, 'bounce', bounce_type, bounce.get('timestamp')))
+
+        # Log for monitoring
+        print(f"Suppressing email due to permanent bounce: {email}")
+    return items
 
 def process_complaint(message):
     """
-    Handle complaint notifications
+    Handle complaint notifications; returns the suppression items to write
     """
     complaint = message['complaint']
-    
+
+    items = []
     for recipient in complaint['complainedRecipients']:
         email = recipient['emailAddress']
-        suppress_email(email, 'complaint', 'user_complaint')
-        
+        items.append(suppression_item(email, 'complaint', 'user_complaint', complaint.get('timestamp')))
+
         # Log for monitoring
-        print(f"Suppressed email due to complaint: {email}")
+        print(f"Suppressing email due to complaint: {email}")
+    return items
+
+def transient_recipients(message):
+    """Lowercased recipients of a soft (Transient) bounce."""
+    return {recipient['emailAddress'].lower() for recipient in message['bounce']['bouncedRecipients']}
+
+def feedback_id(message):
+    """SES feedback id of a bounce (a hash of the notification if it's missing)."""
+    return message['bounce'].get('feedbackId') or \
+        hashlib.sha256(json.dumps(message, sort_keys=True).encode()).hexdigest()
+
+def count_soft_bounces(bounce_ids):
+    """
+    Add this batch's soft bounces to each address's counter (one update per
+    address; the counter expires SOFT_BOUNCE_WINDOW_DAYS after its last
+    bounce). The counter is the set of feedback ids, so a redelivered
+    notification isn't counted twice; it stays small because the address is
+    suppressed once it reaches the threshold. Returns (suppression items for
+    addresses at the threshold, addresses whose counter could not be updated).
+    """
+    escalated, failed = [], []
+    ttl = int((datetime.now(timezone.utc) + timedelta(days=SOFT_BOUNCE_WINDOW_DAYS)).timestamp())
+    for email, ids in bounce_ids.items():
+        try:
+            response = table.update_item(
+                Key={'email': f'soft_bounce#{email}'},
+                UpdateExpression="ADD #bounces :ids SET #ttl = :ttl, #type = :type",
+                ExpressionAttributeNames={'#bounces': 'bounces', '#ttl': 'ttl', '#type': 'type'},
+                ExpressionAttributeValues={':ids': ids, ':ttl': ttl, ':type': 'soft_bounce_counter'},
+                ReturnValues="UPDATED_NEW"
+            )
+        except ClientError as e:
+            print(f"Error counting soft bounces for {email}: {str(e)}")
+            failed.append(email)
+            continue
+
+        total = len(response['Attributes']['bounces'])
+        if total >= SOFT_BOUNCE_THRESHOLD:
+            print(f"Suppressing email after {total} soft bounces: {email}")
+            escalated.append(suppression_item(
+                email, 'soft_bounce', f"{total} transient bounces in {SOFT_BOUNCE_WINDOW_DAYS} days",
+                days=SOFT_BOUNCE_SUPPRESSION_DAYS
+            ))
+    return escalated, failed
+
+def suppression_item(email, reason, detail, timestamp=None, days=SUPPRESSION_DAYS):
+    """
+    Suppression list item with TTL. Times come from the SES notification, so
+    a redelivered notification produces an identical item.
+    """
+    try:
+        suppressed_at = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        suppressed_at = datetime.now(timezone.utc)
+
+    return {
+        'email': email.lower(),
+        'reason': reason,
+        'detail': detail,
+        'suppressed_at': suppressed_at.isoformat(),
+        'ttl': int((suppressed_at + timedelta(days=days)).timestamp())
+    }
 
-def suppress_email(email, reason, detail):
+def write_escalation(item):
     """
-    Add email to suppression list with TTL
+    Put a soft-bounce suppression unless the address already has one that
+    lasts longer (a complaint or hard bounce keeps it for SUPPRESSION_DAYS).
+    Returns False when the write failed.
     """
-    # Keep suppressed for 6 months
-    ttl = int((datetime.now() + timedelta(days=180)).timestamp())
-    
     try:
         table.put_item(
-            Item={
-                'email': email.lower(),
-                'reason': reason,
-                'detail': detail,
-                'suppressed_at': datetime.now().isoformat(),
-                'ttl': ttl
-            }
+            Item=item,
+            ConditionExpression="attribute_not_exists(email) OR #ttl < :ttl",
+            ExpressionAttributeNames={'#ttl': 'ttl'},
+            ExpressionAttributeValues={':ttl': item['ttl']}
         )
-    except Exception as e:
-        print(f"Error suppressing email {email}: {str(e)}")
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            print(f"Keeping longer suppression for {item['email']}")
+            return True
+        print(f"Error suppressing email {item['email']}: {str(e)}")
+        return False
+    return True
+
+def write_suppressions(items, metrics=None):
+    """
+    Put suppression items with BatchWriteItem, retrying UnprocessedItems.
+    Soft-bounce escalations are shorter than what they may replace, so they
+    are conditional puts instead (see write_escalation). Returns the
+    addresses that still could not be written.
+    """
+    failed = [item['email'] for item in items if item['reason'] == 'soft_bounce' and not write_escalation(item)]
+    batched = [item for item in items if item['reason'] != 'soft_bounce']
+    retries = 0
+    for start in range(0, len(batched), BATCH_SIZE):
+        requests = [{'PutRequest': {'Item': item}} for item in batched[start:start + BATCH_SIZE]]
+
+        for attempt in range(MAX_WRITE_ATTEMPTS):
+            if attempt:
+                # Full jitter: spread retries from concurrent invocations apart
+                time.sleep(random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt)))
+                retries += 1
+            try:
+                response = table.meta.client.batch_write_item(RequestItems={table.name: requests})
+                requests = response.get('UnprocessedItems', {}).get(table.name, [])
+            except ClientError as e:
+                # Throttled or failed outright: retry the whole chunk
+                print(f"BatchWriteItem error (attempt {attempt + 1}): {str(e)}")
+            if not requests:
+                break
+
+        for request in requests:
+            email = request['PutRequest']['Item']['email']
+            print(f"Error suppressing email {email}: still unprocessed after {MAX_WRITE_ATTEMPTS} attempts")
+            failed.append(email)
+
+    for item in items:
+        suppression_cache.invalidate(item['email'])
+
+    if metrics is not None:
+        metrics.count("BatchWriteRetries", retries)
+    return failed
 
 def is_suppressed(email):
     """
     Check if an email is in the suppression list
     """
-    try:
-        response = table.get_item(
-            Key={'email': email.lower()}
-        )
-        return 'Item' in response
-    except Exception:
-        return False
\ No newline at end of file
+    return suppression_cache.is_suppressed(table, email)
@@ -0,0 +1,288 @@
+"""
+Attachment manifest and known-malicious hash lookups.
+
+The parser lists every attachment of a forwarded email (filename, declared
+and sniffed type, decoded size and SHA-256) and ships the manifest with the
+job. Payloads are decoded chunk by chunk straight into the hash, so no
+decoded copy of an attachment is ever held; only zip archives are spooled
+(to /tmp past SPOOL_MEMORY_BYTES) so their members can be listed and hashed
+in turn. Hashes are matched against a known-bad set loaded once per
+container from KNOWN_BAD_HASHES_FILE.
+"""
+import binascii
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import zipfile
+import zlib
+
+log = logging.getLogger()
+
+KNOWN_BAD_HASHES_FILE = os.environ.get(
+    "KNOWN_BAD_HASHES_FILE", os.path.join(os.path.dirname(__file__), "known_bad_hashes.txt")
+)
+
+# Encoded characters decoded per step (a multiple of 4 keeps base64 aligned)
+CHUNK_CHARS = 64 * 1024
+
+# Archive handling: spool size kept in memory, nesting depth, members listed
+# per archive and total decompressed bytes hashed per message (zip bombs)
+SPOOL_MEMORY_BYTES = 1024 * 1024
+MAX_ARCHIVE_DEPTH = 2
+MAX_ARCHIVE_MEMBERS = 50
+MAX_ARCHIVE_BYTES = 50 * 1024 * 1024
+
+# Most manifest entries (attachments plus archive members) shipped in a job
+MAX_MANIFEST_ENTRIES = 100
+
+# Leading bytes of the file types worth telling apart
+MAGIC_NUMBERS = [
+    (b"MZ", "application/x-msdownload"),
+    (b"\x7fELF", "application/x-executable"),
+    (b"\xca\xfe\xba\xbe", "application/java-vm"),
+    (b"PK\x03\x04", "application/zip"),
+    (b"PK\x05\x06", "application/zip"),
+    (b"Rar!\x1a\x07", "application/vnd.rar"),
+    (b"7z\xbc\xaf\x27\x1c", "application/x-7z-compressed"),
+    (b"\x1f\x8b", "application/gzip"),
+    (b"%PDF-", "application/pdf"),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "application/x-ole-storage"),
+    (b"{\\rtf", "application/rtf"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF8", "image/gif"),
+]
+HTML_START = re.compile(rb'\s*<(?:!doctype html|html|head|body|script)', re.IGNORECASE)
+
+SHA256_HEX = re.compile(r'[0-9a-f]{64}')
+
+# Raised by corrupt, encrypted or unsupported archive members
+ARCHIVE_ERRORS = (zipfile.BadZipFile, zlib.error, OSError, ValueError, RuntimeError, EOFError, NotImplementedError)
+
+
+class ArchiveBudgetExceeded(Exception):
+    """The message's decompressed-bytes budget ran out mid-member."""
+
+
+def sniff_type(head):
+    """Content type from the first bytes of a payload, or None if unrecognised."""
+    for magic, content_type in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return content_type
+    if HTML_START.match(head):
+        return "text/html"
+    return None
+
+
+def decoded_chunks(part):
+    """
+    Yield a part's decoded payload in pieces, undoing base64 or
+    quoted-printable per chunk instead of materialising the whole payload
+    like get_payload(decode=True) does.
+    """
+    payload = part.get_payload()
+    if not isinstance(payload, str):
+        return
+    encoding = str(part.get("Content-Transfer-Encoding", "")).strip().lower()
+
+    if encoding == "base64":
+        carry = ""
+        for start in range(0, len(payload), CHUNK_CHARS):
+            piece = carry + "".join(payload[start:start + CHUNK_CHARS].split())
+            usable = len(piece) - len(piece) % 4
+            carry = piece[usable:]
+            try:
+                yield binascii.a2b_base64(piece[:usable])
+            except binascii.Error:
+                return
+        if carry.rstrip("="):
+            try:
+                yield binascii.a2b_base64(carry + "=" * (-len(carry) % 4))
+            except binascii.Error:
+                pass
+
+    elif encoding == "quoted-printable":
+        # Cut on line ends so no =XX escape or soft break spans two chunks
+        start = 0
+        while start < len(payload):
+            end = payload.find("\n", start + CHUNK_CHARS)
+            end = len(payload) if end == -1 else end + 1
+            yield binascii.a2b_qp(payload[start:end].encode("utf-8", "surrogateescape"))
+            start = end
+
+    else:
+        for start in range(0, len(payload), CHUNK_CHARS):
+            yield payload[start:start + CHUNK_CHARS].encode("utf-8", "surrogateescape")
+
+
+def digest(chunks, spool=None):
+    """(size, sha256, sniffed_type) of a chunk stream, copying it to `spool` if given."""
+    sha256 = hashlib.sha256()
+    size, head = 0, b""
+    for chunk in chunks:
+        if len(head) < 64:
+            head += chunk[:64 - len(head)]
+        sha256.update(chunk)
+        size += len(chunk)
+        if spool is not None:
+            spool.write(chunk)
+    return size, sha256.hexdigest(), sniff_type(head)
+
+
+def stream_zip_member(archive, info, budget):
+    """Chunks of one archive member, charged against the message's byte budget."""
+    with archive.open(info) as member:
+        while True:
+            chunk = member.read(CHUNK_CHARS)
+            if not chunk:
+                return
+            budget["bytes"] -= len(chunk)
+            if budget["bytes"] < 0:
+                # Header sizes can lie; a partial hash would be wrong anyway
+                raise ArchiveBudgetExceeded()
+            yield chunk
+
+
+def list_zip(spool, depth, budget):
+    """Manifest entries for the members of a spooled zip archive."""
+    members = []
+    try:
+        archive = zipfile.ZipFile(spool)
+    except (zipfile.BadZipFile, OSError, ValueError):
+        return members, "unreadable"
+
+    with archive:
+        infos = [info for info in archive.infolist() if not info.is_dir()]
+        for info in infos[:MAX_ARCHIVE_MEMBERS]:
+            entry = {"filename": info.filename, "size": info.file_size}
+            if info.flag_bits & 0x1:
+                entry["encrypted"] = True
+            elif info.file_size > budget["bytes"]:
+                entry["skipped"] = "archive byte budget exhausted"
+            else:
+                try:
+                    entry.update(hash_stream(stream_zip_member(archive, info, budget), depth + 1, budget))
+                except ArchiveBudgetExceeded:
+                    entry["skipped"] = "archive byte budget exhausted"
+                except ARCHIVE_ERRORS as e:
+                    entry["error"] = type(e).__name__
+            members.append(entry)
+    return members, "truncated" if len(infos) > MAX_ARCHIVE_MEMBERS else None
+
+
+def hash_stream(chunks, depth, budget):
+    """
+    Hash a payload in one pass; zip archives within the depth limit are
+    spooled on the same pass and their members listed.
+    """
+    chunks = iter(chunks)
+    first = b""
+    for first in chunks:
+        if first:
+            break
+    if depth >= MAX_ARCHIVE_DEPTH or sniff_type(first) != "application/zip":
+        size, sha256, sniffed = digest(_chain(first, chunks))
+        return {"size": size, "sha256": sha256, "sniffed_type": sniffed}
+
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES) as spool:
+        size, sha256, sniffed = digest(_chain(first, chunks), spool)
+        spool.seek(0)
+        members, status = list_zip(spool, depth, budget)
+
+    entry = {"size": size, "sha256": sha256, "sniffed_type": sniffed, "members": members}
+    if status:
+        entry["archive_status"] = status
+    return entry
+
+
+def _chain(first, rest):
+    if first:
+        yield first
+    yield from rest
+
+
+def is_attachment(part):
+    """Leaf parts that are files rather than the message body."""
+    if part.is_multipart():
+        return False
+    if part.get_content_disposition() == "attachment" or part.get_filename():
+        return True
+    return part.get_content_maintype() not in ("text", "message")
+
+
+def build_manifest(msg):
+    """
+    One entry per attachment: filename, declared_type, sniffed_type, size,
+    sha256, and for zip archives the (nested) member entries.
+    """
+    manifest = []
+    budget = {"bytes": MAX_ARCHIVE_BYTES}
+    for part in msg.walk():
+        if not is_attachment(part):
+            continue
+        entry = {"filename": part.get_filename() or "", "declared_type": part.get_content_type()}
+        entry.update(hash_stream(decoded_chunks(part), 0, budget))
+        manifest.append(entry)
+    return limit_entries(manifest, MAX_MANIFEST_ENTRIES)
+
+
+def limit_entries(entries, room):
+    """Keep at most `room` entries counting archive members, depth first."""
+    kept = []
+    for entry in entries:
+        if room <= 0:
+            break
+        room -= 1
+        if entry.get("members"):
+            entry = {**entry, "members": limit_entries(entry["members"], room)}
+            room -= count_entries(entry["members"])
+        kept.append(entry)
+    return kept
+
+
+def count_entries(entries):
+    return sum(1 + count_entries(entry.get("members", [])) for entry in entries)
+
+
+def iter_entries(manifest):
+    """Every entry in a manifest, archive members included."""
+    for entry in manifest or []:
+        yield entry
+        yield from iter_entries(entry.get("members"))
+
+
+def attachment_names(manifest):
+    """Filenames of all attachments and archive members, one per line."""
+    return "\n".join(entry["filename"] for entry in iter_entries(manifest) if entry.get("filename"))
+
+
+def load_hash_set(path=KNOWN_BAD_HASHES_FILE):
+    """Lowercase SHA-256 hex digests from a file, one per line (# comments allowed)."""
+    try:
+        with open(path) as f:
+            lines = [line.split("#", 1)[0].strip().lower() for line in f]
+    except OSError as e:
+        log.warning(f"Known-bad hash list unavailable ({path}): {str(e)}")
+        return frozenset()
+    return frozenset(line for line in lines if SHA256_HEX.fullmatch(line))
+
+
+# Loaded once per container
+KNOWN_BAD_HASHES = load_hash_set()
+
+
+def known_bad_verdict(manifest, known_bad=None):
+    """Any attachment (or archive member) with a known-malicious hash → SCAM, else None."""
+    known_bad = KNOWN_BAD_HASHES if known_bad is None else known_bad
+    for entry in iter_entries(manifest):
+        if entry.get("sha256") in known_bad:
+            name = entry.get("filename") or "an attachment"
+            log.info(f"Known malicious attachment: {name} ({entry['sha256']})")
+            return {
+                "label": "SCAM",
+                "reason": "Known malicious attachment",
+                "detailed_reason": f"The attachment {name} matches a known malware sample. Do not open it; delete this email."
+            }
+    return None
@@ -0,0 +1,176 @@
+"""
+Sender-authentication results (SPF, DKIM, DMARC) of the original message.
+
+When the suspicious email reaches us with its headers (forwarded as an
+attachment, submitted raw to the API, or pasted from "show original"), the
+receiving provider's Authentication-Results, Received-SPF and DKIM-Signature
+headers say whether the From: domain was really the sender. The parser turns
+them into the job's `authentication` field:
+
+    {"source": "attachment", "authserv_id": "mx.google.com",
+     "spf": "pass", "spf_domain": "paypal.com",
+     "dkim": [{"result": "pass", "domain": "paypal.com"}],
+     "dmarc": "pass", "header_from": "paypal.com",
+     "signing_domains": ["paypal.com"]}
+
+Only the topmost Authentication-Results and Received-SPF headers are read:
+the receiving server adds its own above anything the sender wrote, so lower
+ones may be forged. For the same reason pasted headers are read only from
+the header block at the top of the forward, never from the body.
+"""
+import re
+from shared.links import registrable_domain
+
+AUTH_HEADERS = ("Authentication-Results", "Received-SPF", "DKIM-Signature")
+
+# Header lines (with folded continuations) inside forwarded text
+HEADER_LINE = re.compile(r'^(Authentication-Results|Received-SPF|DKIM-Signature):[ \t]*(.*(?:\n[ \t]+.*)*)',
+                         re.IGNORECASE | re.MULTILINE)
+COMMENT = re.compile(r'\([^()]*\)')
+PROPERTY = re.compile(r'([\w.-]+)\s*=\s*("[^"]*"|[^\s;]+)')
+DKIM_TAG = re.compile(r'(?:^|;)\s*d\s*=\s*([^\s;]+)', re.IGNORECASE)
+
+
+def strip_comments(value):
+    """Drop (comments), innermost first, and unfold."""
+    value = " ".join(value.split())
+    while True:
+        stripped = COMMENT.sub(" ", value)
+        if stripped == value:
+            return value
+        value = stripped
+
+
+def address_domain(value):
+    """user@Example.COM → example.com; bare domains pass through lowercased."""
+    value = value.strip('"<> ').lower()
+    return value.rsplit("@", 1)[-1].rstrip(".")
+
+
+def parse_authentication_results(value):
+    """
+    RFC 8601 header value → {"authserv_id", "spf", "spf_domain", "dkim",
+    "dmarc", "header_from"}. Methods that aren't present are None (dkim: []).
+    Outlook omits the authserv-id, so the first clause may be a method.
+    """
+    result = {"authserv_id": None, "spf": None, "spf_domain": None, "dkim": [], "dmarc": None, "header_from": None}
+    clauses = [clause.strip() for clause in strip_comments(value).split(";")]
+    if clauses and "=" not in clauses[0]:
+        result["authserv_id"] = clauses.pop(0).split()[0].lower() if clauses[0] else None
+
+    for clause in clauses:
+        properties = PROPERTY.findall(clause)
+        if not properties:
+            continue
+        (method, outcome), props = properties[0], {k.lower(): v.strip('"') for k, v in properties[1:]}
+        method, outcome = method.lower(), outcome.lower()
+        if method == "spf" and result["spf"] is None:
+            result["spf"] = outcome
+            sender = props.get("smtp.mailfrom") or props.get("smtp.helo")
+            result["spf_domain"] = address_domain(sender) if sender else None
+        elif method == "dkim":
+            domain = props.get("header.d") or props.get("header.i")
+            result["dkim"].append({"result": outcome, "domain": address_domain(domain) if domain else None})
+        elif method == "dmarc" and result["dmarc"] is None:
+            result["dmarc"] = outcome
+            if props.get("header.from"):
+                result["header_from"] = address_domain(props["header.from"])
+    return result
+
+
+def parse_received_spf(value):
+    """Received-SPF value → (result, envelope-from domain or None)."""
+    value = strip_comments(value)
+    outcome = value.split()[0].lower() if value.split() else None
+    props = {k.lower(): v.strip('"') for k, v in PROPERTY.findall(value)}
+    sender = props.get("envelope-from") or props.get("helo")
+    return outcome, address_domain(sender) if sender else None
+
+
+def headers_from_text(text):
+    """
+    (name, value) pairs of authentication headers in pasted header text, top
+    to bottom. Pass only a header block (email_parser.forwarded_header_block):
+    header lines in a message body are the sender's to write.
+    """
+    return [(name, value) for name, value in HEADER_LINE.findall(text or "")]
+
+
+def extract_authentication(headers, source):
+    """
+    Authentication summary from (name, value) header pairs in message order
+    (top first), or None when none of AUTH_HEADERS is present.
+    """
+    headers = [(name.lower(), str(value)) for name, value in headers if name.lower() in
+               {h.lower() for h in AUTH_HEADERS}]
+    if not headers:
+        return None
+
+    auth = {"source": source, "authserv_id": None, "spf": None, "spf_domain": None, "dkim": [],
+            "dmarc": None, "header_from": None, "signing_domains": []}
+    results = next((value for name, value in headers if name == "authentication-results"), None)
+    if results is not None:
+        auth.update(parse_authentication_results(results))
+
+    received_spf = next((value for name, value in headers if name == "received-spf"), None)
+    if received_spf is not None and auth["spf"] is None:
+        auth["spf"], auth["spf_domain"] = parse_received_spf(received_spf)
+
+    # d= of every signature; unverified, so only a hint unless a dkim= result backs it
+    for name, value in headers:
+        if name == "dkim-signature":
+            match = DKIM_TAG.search(" ".join(value.split()))
+            if match and match.group(1).lower() not in auth["signing_domains"]:
+                auth["signing_domains"].append(match.group(1).lower().rstrip("."))
+    return auth
+
+
+def message_authentication(msg, source):
+    """Authentication summary from an email.message.Message's own headers."""
+    return extract_authentication(msg.items(), source)
+
+
+def aligned(domain, sender_domain):
+    """Relaxed DMARC alignment: same registrable (organizational) domain."""
+    if not domain or not sender_domain:
+        return False
+    return (registrable_domain(domain) or domain) == (registrable_domain(sender_domain) or sender_domain)
+
+
+def alignment(auth, sender_domain):
+    """
+    "pass" when the From: domain is authenticated (DMARC pass, or an aligned
+    SPF/DKIM pass), "fail" on a DMARC fail or an SPF fail of unsigned mail,
+    None otherwise: softfail, neutral and DKIM-only failures, nothing to
+    judge by, or results that belong to a different From: domain.
+    """
+    if not auth or not sender_domain:
+        return None
+    if auth.get("header_from"):
+        if not aligned(auth["header_from"], sender_domain):
+            return None
+        # A DMARC result only speaks for the From: domain it names
+        if auth.get("dmarc") in ("pass", "fail"):
+            return auth["dmarc"]
+
+    spf_pass = auth.get("spf") == "pass" and aligned(auth.get("spf_domain"), sender_domain)
+    dkim_pass = any(sig["result"] == "pass" and aligned(sig["domain"], sender_domain) for sig in auth.get("dkim", []))
+    if spf_pass or dkim_pass:
+        return "pass"
+    # Without DMARC only a hard SPF fail on unsigned mail counts. Forwarding
+    # and relays routinely break SPF (softfail) and DKIM, and a signature of
+    # any kind means the SPF result may just be the relay's
+    if auth.get("spf") == "fail" and not auth.get("dkim") and not auth.get("signing_domains"):
+        return "fail"
+    return None
+
+
+def authentication_summary(auth):
+    """One prompt line describing the results."""
+    if not auth:
+        return "Sender authentication: not available"
+    parts = [f"{method}={auth[method]}" for method in ("spf", "dmarc") if auth.get(method)]
+    parts += [f"dkim={sig['result']} (d={sig['domain']})" for sig in auth.get("dkim", [])[:2]]
+    if auth.get("header_from"):
+        parts.append(f"header.from={auth['header_from']}")
+    return f"Sender authentication: {', '.join(parts) or 'no results'}"
@@ -0,0 +1,252 @@
+"""
+Memory-mapped blocklist of phishing hosts and domains.
+
+The list is one binary file: a Bloom filter over the entries followed by
+their sorted 64-bit hashes. Containers map it read-only, so a list of
+millions of hosts costs page cache rather than Python objects. A lookup
+tests k bits of the filter (almost every clean host stops there) and only
+filter hits are confirmed by a binary search of the hashes.
+
+The file ships in the image (shared/blocklist.bin) or is fetched from
+BLOCKLIST_S3_URI into /tmp, re-checked every BLOCKLIST_REFRESH_SECONDS with
+a conditional GET. Build one with tools/build_blocklist.py.
+
+Layout (little-endian):
+    header   magic "SVBLOOM1", bloom bit count (u64), hash count (u32),
+             entry count (u64), 4 bytes padding
+    bloom    ceil(bits / 8) bytes
+    entries  entry count sorted u64 hashes
+"""
+import hashlib
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+import time
+from email.utils import parseaddr
+
+log = logging.getLogger()
+
+MAGIC = b"SVBLOOM1"
+HEADER = struct.Struct("<8sQIQ4x")
+ENTRY = struct.Struct("<Q")
+
+BLOCKLIST_PATH = os.environ.get("BLOCKLIST_PATH", os.path.join(os.path.dirname(__file__), "blocklist.bin"))
+BLOCKLIST_S3_URI = os.environ.get("BLOCKLIST_S3_URI", "")
+BLOCKLIST_REFRESH_SECONDS = int(os.environ.get("BLOCKLIST_REFRESH_SECONDS", "300"))
+DOWNLOAD_PATH = "/tmp/blocklist.bin"
+
+# Hosts in URLs (skipping any user:pass@ prefix)
+URL_HOST = re.compile(r'https?://(?:[^\s/?#@<>"\']*@)?([^\s/?#:<>"\'\\]+)', re.IGNORECASE)
+
+
+def normalize_host(host):
+    """Lowercase, no trailing dot, IDNA (punycode) form when it has one."""
+    host = host.strip().rstrip(".").lower()
+    if not host.isascii():
+        try:
+            host = host.encode("idna").decode("ascii")
+        except UnicodeError:
+            pass
+    return host
+
+
+def host_hashes(host):
+    """Two independent 64-bit hashes of a normalized host."""
+    digest = hashlib.blake2b(host.encode("utf-8", "surrogateescape"), digest_size=16).digest()
+    return struct.unpack("<QQ", digest)
+
+
+def bloom_positions(h1, h2, bits, hashes):
+    # Kirsch-Mitzenmacher: k positions from two hashes
+    return [(h1 + i * h2) % bits for i in range(hashes)]
+
+
+def parent_domains(host):
+    """a.b.evil.com → a.b.evil.com, b.evil.com, evil.com (never the bare TLD)."""
+    labels = host.split(".")
+    return [".".join(labels[i:]) for i in range(max(1, len(labels) - 1))]
+
+
+class Blocklist:
+    """Read-only view of a blocklist file; an empty list when path is None."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self._file = self._map = None
+        self.bits, self.hashes, self.count = 8, 1, 0
+        if path is None:
+            return
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, self.bits, self.hashes, self.count = HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a blocklist file")
+            self._entries_at = HEADER.size + (self.bits + 7) // 8
+            if len(self._map) < self._entries_at + self.count * ENTRY.size:
+                raise ValueError(f"{path} is truncated")
+        except Exception:
+            self.close()
+            raise
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, host):
+        if not self.count:
+            return False
+        h1, h2 = host_hashes(normalize_host(host))
+        for position in bloom_positions(h1, h2, self.bits, self.hashes):
+            if not self._map[HEADER.size + position // 8] & (1 << (position % 8)):
+                return False
+        # Filter hit: confirm against the sorted hashes
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            value = ENTRY.unpack_from(self._map, self._entries_at + middle * ENTRY.size)[0]
+            if value == h1:
+                return True
+            if value < h1:
+                low = middle + 1
+            else:
+                high = middle
+        return False
+
+    def match(self, host):
+        """The listed entry covering `host` (the host or a parent domain), else None."""
+        for candidate in parent_domains(normalize_host(host)):
+            if candidate in self:
+                return candidate
+        return None
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        if self._file is not None:
+            self._file.close()
+        self._map = self._file = None
+
+
+def build_blocklist(hosts, path, false_positive_rate=0.001):
+    """Write a blocklist file for `hosts`; returns the number of entries."""
+    pairs = set()
+    for host in hosts:
+        host = normalize_host(host)
+        if host:
+            pairs.add(host_hashes(host))
+    count = len(pairs)
+    bits = max(8, math.ceil(-count * math.log(false_positive_rate) / math.log(2) ** 2))
+    hashes = max(1, round(bits / max(count, 1) * math.log(2)))
+
+    bloom = bytearray((bits + 7) // 8)
+    for h1, h2 in pairs:
+        for position in bloom_positions(h1, h2, bits, hashes):
+            bloom[position // 8] |= 1 << (position % 8)
+    entries = sorted({h1 for h1, _ in pairs})
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, bits, hashes, len(entries)))
+        f.write(bloom)
+        f.write(b"".join(ENTRY.pack(h1) for h1 in entries))
+    os.replace(temp_path, path)
+    return len(entries)
+
+
+# ---------- PER-CONTAINER INSTANCE ----------
+
+_active = None
+_etag = None
+_checked_at = 0.0
+
+
+def download_blocklist(s3_uri, etag=None):
+    """
+    Fetch the S3 blocklist into /tmp unless its ETag is unchanged. Returns the
+    new ETag, or None when the local copy is current.
+    """
+    import boto3
+    from botocore.exceptions import ClientError
+
+    bucket, _, key = s3_uri[len("s3://"):].partition("/")
+    params = {"Bucket": bucket, "Key": key}
+    if etag:
+        params["IfNoneMatch"] = etag
+    try:
+        response = boto3.client("s3").get_object(**params)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("304", "NotModified"):
+            return None
+        raise
+
+    temp_path = f"{DOWNLOAD_PATH}.tmp"
+    with open(temp_path, "wb") as f:
+        for chunk in response["Body"].iter_chunks(1024 * 1024):
+            f.write(chunk)
+    os.replace(temp_path, DOWNLOAD_PATH)
+    return response["ETag"]
+
+
+def active_blocklist():
+    """
+    This container's blocklist: the image copy at first, swapped for the S3
+    copy whenever it changes. Failures keep the current list (fail open).
+    """
+    global _active, _etag, _checked_at
+    if _active is None:
+        try:
+            _active = Blocklist(BLOCKLIST_PATH if os.path.exists(BLOCKLIST_PATH) else None)
+        except Exception as e:
+            log.error(f"Error loading blocklist {BLOCKLIST_PATH}: {str(e)}")
+            _active = Blocklist()
+
+    if BLOCKLIST_S3_URI and time.time() - _checked_at >= BLOCKLIST_REFRESH_SECONDS:
+        _checked_at = time.time()
+        try:
+            etag = download_blocklist(BLOCKLIST_S3_URI, _etag)
+            if etag:
+                # The old map stays valid until closed, even though its file was replaced
+                previous, _active = _active, Blocklist(DOWNLOAD_PATH)
+                previous.close()
+                _etag = etag
+                log.info(f"Loaded blocklist {BLOCKLIST_S3_URI} ({len(_active)} entries)")
+        except Exception as e:
+            log.error(f"Error refreshing blocklist from {BLOCKLIST_S3_URI}: {str(e)}")
+    return _active
+
+
+def url_hosts(text):
+    """Distinct hosts of the http(s) URLs in `text`."""
+    return list(dict.fromkeys(normalize_host(host) for host in URL_HOST.findall(text or "")))
+
+
+def blocklist_verdict(sender, hosts, blocklist=None):
+    """Sender domain or any URL host on the blocklist → SCAM, else None."""
+    blocklist = active_blocklist() if blocklist is None else blocklist
+    if not len(blocklist):
+        return None
+
+    address = parseaddr(sender or "")[1]
+    if "@" in address:
+        listed = blocklist.match(address.rsplit("@", 1)[1])
+        if listed:
+            log.info(f"Blocklisted sender domain: {listed}")
+            return {
+                "label": "SCAM",
+                "reason": "Sender domain is known phishing infrastructure",
+                "detailed_reason": f"The sender's domain ({listed}) is on our list of known phishing and scam domains."
+            }
+
+    for host in hosts:
+        listed = blocklist.match(host)
+        if listed:
+            log.info(f"Blocklisted link host: {host} ({listed})")
+            return {
+                "label": "SCAM",
+                "reason": "Links to a known phishing site",
+                "detailed_reason": f"This email links to {host}, which is on our list of known phishing and scam sites. Don't click it."
+            }
+    return None
@@ -0,0 +1,70 @@
+"""
+Canonical form of email text for the keyword rules.
+
+Scammers dodge keyword regexes with zero-width characters, fullwidth or
+mathematical letters and Cyrillic/Greek lookalikes ("РаyРаl"). The parser
+canonicalizes the subject and text once and ships both with the job, so the
+rules in the parser and the classifier match against the same lowercased,
+NFKC-normalized text without redoing the work per check.
+"""
+import re
+import unicodedata
+
+# Invisible format characters: zero-width spaces/joiners, bidi controls,
+# soft hyphen, word joiners, BOM, variation selectors and tag characters
+INVISIBLE_RANGES = [
+    (0x00AD, 0x00AD), (0x034F, 0x034F), (0x061C, 0x061C), (0x115F, 0x1160),
+    (0x17B4, 0x17B5), (0x180B, 0x180E), (0x200B, 0x200F), (0x202A, 0x202E),
+    (0x2060, 0x2064), (0x2066, 0x206F), (0x3164, 0x3164), (0xFE00, 0xFE0F),
+    (0xFEFF, 0xFEFF), (0xFFA0, 0xFFA0), (0x1D173, 0x1D17A), (0xE0000, 0xE007F),
+    (0xE0100, 0xE01EF),
+]
+
+# Letters that render like Latin ones but survive NFKC (subset of Unicode
+# confusables.txt covering the Cyrillic and Greek lookalikes seen in phishing)
+CONFUSABLES = {
+    # Cyrillic
+    'а': 'a', 'в': 'b', 'е': 'e', 'ё': 'e', 'к': 'k', 'м': 'm', 'н': 'h', 'о': 'o', 'р': 'p',
+    'с': 'c', 'т': 't', 'у': 'y', 'х': 'x', 'і': 'i', 'ї': 'i', 'ј': 'j', 'ѕ': 's', 'ԁ': 'd',
+    'һ': 'h', 'ӏ': 'l', 'ԛ': 'q', 'ԝ': 'w', 'ү': 'y', 'ɡ': 'g',
+    'А': 'A', 'В': 'B', 'Е': 'E', 'К': 'K', 'М': 'M', 'Н': 'H', 'О': 'O', 'Р': 'P', 'С': 'C',
+    'Т': 'T', 'У': 'Y', 'Х': 'X', 'І': 'I', 'Ј': 'J', 'Ѕ': 'S', 'Ԁ': 'D', 'Ԛ': 'Q', 'Ԝ': 'W',
+    'Ү': 'Y', 'Ӏ': 'I',
+    # Greek
+    'α': 'a', 'ο': 'o', 'ν': 'v', 'ρ': 'p', 'ι': 'i', 'κ': 'k', 'υ': 'u', 'ϲ': 'c', 'ϳ': 'j',
+    'Α': 'A', 'Β': 'B', 'Ε': 'E', 'Ζ': 'Z', 'Η': 'H', 'Ι': 'I', 'Κ': 'K', 'Μ': 'M', 'Ν': 'N',
+    'Ο': 'O', 'Ρ': 'P', 'Τ': 'T', 'Υ': 'Y', 'Χ': 'X',
+    # Latin
+    'ı': 'i', 'ȷ': 'j', 'ɑ': 'a', 'ɩ': 'i', 'ʏ': 'y',
+}
+
+TRANSLATION = {ord(k): v for k, v in CONFUSABLES.items()}
+for first, last in INVISIBLE_RANGES:
+    TRANSLATION.update(dict.fromkeys(range(first, last + 1)))
+
+HORIZONTAL_SPACE = re.compile(r'[^\S\n]{2,}|[^\S \n]')  # runs, or a lone tab etc.
+LINE_BREAKS = re.compile(r' ?\n\s*')
+
+def canonicalize(text):
+    """
+    NFKC-normalize, drop invisible characters, map lookalike letters to
+    Latin (before lowercasing, so capital lookalikes map to the letter they
+    resemble), lowercase, and collapse runs of whitespace (line breaks are kept
+    as single newlines so line-anchored rules still work).
+    """
+    if not text:
+        return ""
+    if not text.isascii():
+        text = unicodedata.normalize("NFKC", text).translate(TRANSLATION)
+    text = HORIZONTAL_SPACE.sub(" ", text.lower())
+    return LINE_BREAKS.sub("\n", text).strip()
+
+def canonical_fields(message):
+    """
+    (canonical_subject, canonical_text) for a job. Jobs queued before the
+    parser shipped them get them computed here, once, and stored on the job.
+    """
+    if "canonical_text" not in message:
+        message["canonical_subject"] = canonicalize(message.get("subject", ""))
+        message["canonical_text"] = canonicalize(message.get("text", ""))
+    return message["canonical_subject"], message["canonical_text"]
@@ -0,0 +1,366 @@
+"""
+Sender-domain rules shared by the email parser and the classifier.
+
+Both Lambdas apply the same deterministic checks: the parser uses them to
+answer obvious cases without queueing, the classifier as the first stages of
+its decision pipeline. RULE_STAGES is the one list of those stages; the
+parser runs it through deterministic_verdict and the classifier builds its
+pipeline from it.
+"""
+import logging
+import re
+import tldextract
+from email.utils import parseaddr
+from functools import cached_property
+from shared.attachments import known_bad_verdict
+from shared.canonical import canonical_fields
+from shared.blocklist import blocklist_verdict
+from shared.links import analyze_links, message_urls, link_hosts
+from shared.authentication import alignment
+
+log = logging.getLogger()
+
+# Public email domains that companies should NEVER use
+PUBLIC_EMAIL_DOMAINS = {
+    'gmail.com', 'outlook.com', 'hotmail.com', 'yahoo.com', 'icloud.com',
+    'aol.com', 'protonmail.com', 'gmx.com', 'mail.com', 'usa.com',
+    'yandex.com', 'mail.ru', 'qq.com', '163.com', '126.com', 'sina.com',
+    'yahoo.co.uk', 'yahoo.ca', 'yahoo.de', 'yahoo.fr', 'yahoo.es',
+    'outlook.de', 'outlook.fr', 'outlook.es', 'live.com', 'msn.com',
+    'me.com', 'mac.com', 'googlemail.com', 'pm.me', 'proton.me',
+    'tutanota.com', 'fastmail.com', 'hushmail.com', 'gmx.de', 'web.de'
+}
+
+# Known legitimate company domains (expandable)
+LEGITIMATE_COMPANY_DOMAINS = {
+    # Banks
+    'bankofamerica.com', 'chase.com', 'wellsfargo.com', 'citibank.com',
+    'usbank.com', 'pnc.com', 'capitalone.com', 'tdbank.com', 'keybank.com',
+    'regions.com', 'fifththird.com', 'huntington.com', 'suntrust.com',
+    # Major tech companies
+    'amazon.com', 'apple.com', 'microsoft.com', 'google.com', 'meta.com',
+    'netflix.com', 'adobe.com', 'salesforce.com', 'oracle.com', 'ibm.com',
+    # Payment services
+    'paypal.com', 'venmo.com', 'cashapp.com', 'zelle.com', 'stripe.com',
+    # E-commerce
+    'ebay.com', 'etsy.com', 'shopify.com', 'walmart.com', 'target.com',
+    'bestbuy.com', 'homedepot.com', 'lowes.com', 'costco.com',
+    # Services
+    'uber.com', 'lyft.com', 'doordash.com', 'grubhub.com', 'airbnb.com',
+    'spotify.com', 'dropbox.com', 'slack.com', 'zoom.us', 'linkedin.com',
+    'twitter.com', 'instagram.com', 'facebook.com', 'tiktok.com',
+    # Utilities & Telecom
+    'att.com', 'verizon.com', 'tmobile.com', 'comcast.com', 'spectrum.com',
+    # Airlines
+    'aa.com', 'delta.com', 'united.com', 'southwest.com', 'jetblue.com',
+    # Automotive
+    'grammarly.com', 'cars.com', 'carvana.com', 'carmax.com', 'email-carmax.com',
+    'autotrader.com', 'carvana.com', 'vroom.com', 'shift.com', 'accu-trade.com'
+    # Other services
+    'indeed.com', 'glassdoor.com', 'zillow.com', 'redfin.com', 'apartments.com'
+}
+
+LEGITIMATE_ESP_DOMAINS = {
+    'convertkit.com', 'sendgrid.net', 'mailgun.org', 'rsgsv.net',
+    'mailchimp.com', 'constantcontact.com', 'klaviyo.com', 
+    'braze.com', 'salesforce.com', 'exacttarget.com',
+    'mailjet.com', 'sendinblue.com', 'getresponse.com'
+}
+
+# Common email marketing domain patterns used by legitimate companies
+LEGITIMATE_EMAIL_PATTERNS = [
+    r'email[.-].*\.com$',  # email-company.com, email.company.com
+    r'mail[.-].*\.com$',   # mail-company.com, mail.company.com
+    r'.*\.mailer\..*',     # company.mailer.com
+    r'.*\.mailgun\..*',    # via mailgun
+    r'.*\.sendgrid\..*',   # via sendgrid
+    r'.*\.amazonses\.com$', # Amazon SES
+    r'.*\.messagebus\.com$' # MessageBus
+]
+
+no_cache_extract = tldextract.TLDExtract(cache_dir='/tmp')
+
+# Claims to be from a company (used with public sender domains)
+COMPANY_CLAIM_PATTERN = r'\b(bank|paypal|amazon|apple|microsoft|google|netflix|ebay|fedex|ups|irs|government|support team|customer service|security team|account team)\b'
+
+# Red-flag attachment extensions that block the known-company SAFE exit
+# (checked per line: attachments are newline-separated filenames)
+EXECUTABLE_ATTACHMENT_PATTERN = r'\.(exe|scr|vbs|pif|cmd|bat|jar|zip|rar)$'
+
+def extract_sender_domain(raw_from):
+    """
+    Extract the registrable domain from a From: header.
+    Handles names like 'Chipotle <chipotle@email.chipotle.com>'.
+    """
+    addr = parseaddr(raw_from)[1]              # chipotle@email.chipotle.com
+    if not addr or '@' not in addr:
+        return None
+    full_domain = addr.split('@')[1].lower()   # email.chipotle.com
+    # Use the configured extractor instead of the default
+    ext = no_cache_extract(full_domain)    
+    if not ext.domain or not ext.suffix:
+        return full_domain                     # fallback
+    return f"{ext.domain}.{ext.suffix}"        # chipotle.com
+
+def is_public_email_domain(domain):
+    """True only for *exact* public providers like gmail.com, yahoo.com, etc."""
+    if not domain:
+        return False
+    return domain in PUBLIC_EMAIL_DOMAINS   # no sub-domain match
+
+def check_domain_legitimacy(domain):
+    """Check if a domain appears to be from a legitimate company."""
+    if not domain:
+        return False
+    
+        # Exact match for known ESPs (they send on behalf of many companies)
+    if domain in LEGITIMATE_ESP_DOMAINS:
+        return True
+    
+    # Check against known legitimate domains first
+    if domain in LEGITIMATE_COMPANY_DOMAINS:
+        return True
+    
+    # Check if it's a subdomain of a legitimate company
+    parts = domain.split('.')
+    if len(parts) >= 2:
+        base_domain = '.'.join(parts[-2:])
+        if base_domain in LEGITIMATE_COMPANY_DOMAINS:
+            return True
+        
+        if len(parts) >= 3:
+            base_domain_extended = '.'.join(parts[-3:])
+            if base_domain_extended in LEGITIMATE_COMPANY_DOMAINS:
+                return True
+
+    # Check common email marketing patterns
+    for pattern in LEGITIMATE_EMAIL_PATTERNS:
+        if re.match(pattern, domain):
+            # Additional check: ensure the base company name is recognizable
+            for company in ['carmax', 'uber', 'amazon', 'apple', 'paypal', 'ebay', 
+                          'netflix', 'spotify', 'target', 'walmart', 'bestbuy',
+                          'bankofamerica', 'chase', 'wellsfargo', 'citibank']:
+                if company in domain.lower().replace('-', '').replace('_', ''):
+                    return True
+    
+    return False
+
+def authentication_verdict(sender_domain, auth, attachments=""):
+    """
+    Known company sender domain whose SPF/DKIM/DMARC results (the job's
+    `authentication`, see shared/authentication.py) pass → SAFE, fail → SCAM
+    (a spoofed From:), else None.
+    """
+    if not check_domain_legitimacy(sender_domain) or is_public_email_domain(sender_domain):
+        return None
+    if sender_domain in LEGITIMATE_ESP_DOMAINS:
+        return None
+    
+    status = alignment(auth, sender_domain)
+    if status == "fail":
+        log.info(f"Sender authentication failed for {sender_domain}")
+        return {
+            "label": "SCAM",
+            "reason": "Forged sender address",
+            "detailed_reason": f"This email claims to come from {sender_domain}, but the receiving mail server reported that {sender_domain} did not send it (SPF/DKIM/DMARC failed)."
+        }
+    if status == "pass" and not re.search(EXECUTABLE_ATTACHMENT_PATTERN, attachments or "", re.MULTILINE | re.IGNORECASE):
+        return {
+            "label": "SAFE",
+            "reason": "Authenticated company sender",
+            "detailed_reason": f"The receiving mail server verified that this email really came from {sender_domain}, a recognised company domain; no red-flag attachments detected."
+        }
+    return None
+
+def domain_verdict(sender_domain, attachments=""):
+    """Known company and ESP sender domains → SAFE verdict, else None."""
+    is_public_domain = is_public_email_domain(sender_domain)
+    
+    # Legit-looking company domain → SAFE,
+    # unless an executable attachment is present.
+    if check_domain_legitimacy(sender_domain) and not is_public_domain:
+        if not re.search(EXECUTABLE_ATTACHMENT_PATTERN, attachments or "", re.MULTILINE | re.IGNORECASE):
+            return {
+                "label": "SAFE",
+                "reason": "Legitimate company domain",
+                "detailed_reason": f"{sender_domain} is a recognised company domain; no red-flag attachments detected."
+            }
+    
+    if sender_domain in LEGITIMATE_ESP_DOMAINS:
+        return {
+            "label": "SAFE",
+            "reason": "Recognised ESP domain",
+            "detailed_reason": f"{sender_domain} is a verified email-service provider domain used for newsletters/receipts."
+        }
+    
+    return None
+
+def public_domain_claim_verdict(sender_domain, text):
+    """Public email domain claiming to be a company → SCAM verdict, else None."""
+    if not is_public_email_domain(sender_domain) or check_domain_legitimacy(sender_domain):
+        return None
+    
+    # Claims to be from a company but uses public email = INSTANT SCAM
+    # (IGNORECASE rather than .lower(): callers pass canonical text, already lowercased)
+    if re.search(COMPANY_CLAIM_PATTERN, text, re.IGNORECASE):
+        log.info(f"Instant scam detection: Public domain {sender_domain} claiming to be a company")
+        return {
+            "label": "SCAM",
+            "reason": "Fraudulent sender using public email",
+            "detailed_reason": f"This email claims to be from a legitimate company but is sent from {sender_domain}, a public email domain. Real companies NEVER use Gmail, Yahoo, Outlook, etc."
+        }
+    
+    return None
+
+def link_mismatch_verdict(sender_domain, report):
+    """
+    Link disguised as a recognised company's domain, or a brand name planted
+    in the subdomain of an unrelated site (paypal.com.account-check.net)
+    → SCAM verdict, else None. `report` comes from shared.links.analyze_links.
+    """
+    for mismatch in report["display_mismatch"]:
+        shown, actual = mismatch["shown"], mismatch["actual"]
+        # Click tracking through the sender's own or a known ESP domain is normal
+        if actual == sender_domain or check_domain_legitimacy(actual):
+            continue
+        if check_domain_legitimacy(shown) and not is_public_email_domain(shown):
+            log.info(f"Disguised link: shows {shown}, goes to {actual}")
+            return {
+                "label": "SCAM",
+                "reason": "Link disguised as a trusted website",
+                "detailed_reason": f"A link in this email shows {shown} but actually goes to {actual}. Don't click it."
+            }
+    
+    for mismatch in report["brand_mismatch"]:
+        host, actual = mismatch["host"], mismatch["actual"]
+        if not host.endswith(f".{actual}") or check_domain_legitimacy(actual):
+            continue
+        if mismatch["brand"] in re.split(r'[.-]', host[:-len(actual) - 1]):
+            log.info(f"Brand planted in link subdomain: {host}")
+            return {
+                "label": "SCAM",
+                "reason": f"Fake {mismatch['brand'].title()} link",
+                "detailed_reason": f"A link in this email goes to {host}, which uses {mismatch['brand'].title()}'s name but belongs to {actual}, not {mismatch['brand'].title()}."
+            }
+    
+    return None
+
+class RuleFeatures:
+    """
+    What the rule stages read from a job, each computed on first use so that
+    stages which decide early never pay for URL extraction. URLs and hosts
+    come from the raw text and the parser's links (one list, message_urls);
+    keyword rules use the canonical text.
+    """
+    
+    def __init__(self, message):
+        self.message = message
+    
+    @cached_property
+    def sender(self):
+        return self.message.get("sender", "")
+    
+    @cached_property
+    def text(self):
+        return self.message.get("text", "")
+    
+    @cached_property
+    def canonical_text(self):
+        return canonical_fields(self.message)[1]
+    
+    @cached_property
+    def sender_domain(self):
+        return extract_sender_domain(self.sender)
+    
+    @cached_property
+    def is_public_domain(self):
+        return is_public_email_domain(self.sender_domain)
+    
+    @cached_property
+    def is_known_company(self):
+        return check_domain_legitimacy(self.sender_domain)
+    
+    @cached_property
+    def claims_to_be_company(self):
+        return bool(re.search(COMPANY_CLAIM_PATTERN, self.canonical_text))
+    
+    @cached_property
+    def all_links(self):
+        return message_urls(self.message.get("links"), self.text)
+    
+    @cached_property
+    def url_hosts(self):
+        return link_hosts(self.all_links)
+    
+    @cached_property
+    def link_report(self):
+        return analyze_links(self.message.get("links"), self.text, self.sender_domain, self.all_links)
+    
+    @cached_property
+    def authentication(self):
+        return self.message.get("authentication")
+
+def attachment_hash_stage(features):
+    """Attachment or archive member with a known-malicious SHA-256 → SCAM."""
+    return known_bad_verdict(features.message.get("attachment_manifest"))
+
+def blocklist_stage(features):
+    """Sender domain or a linked host on the phishing blocklist → SCAM."""
+    return blocklist_verdict(features.sender, features.url_hosts)
+
+def authentication_stage(features):
+    """Known company sender domain whose SPF/DKIM/DMARC pass → SAFE, fail → SCAM."""
+    return authentication_verdict(features.sender_domain, features.authentication,
+                                  features.message.get("attachments", ""))
+
+def domain_index_stage(features):
+    """Known company and ESP sender domains → SAFE."""
+    return domain_verdict(features.sender_domain, features.message.get("attachments", ""))
+
+def keyword_scanner_stage(features):
+    """Public email domain claiming to be a company → SCAM."""
+    return public_domain_claim_verdict(features.sender_domain, features.canonical_text)
+
+def link_analysis_stage(features):
+    """Link disguised as a known domain or a brand planted in a subdomain → SCAM."""
+    return link_mismatch_verdict(features.sender_domain, features.link_report)
+
+# (name, cost, decide) of the rule stages, cheapest first. Known malware
+# outranks even a recognised sender domain, and a spoofed known-company From:
+# must fail authentication before the domain index trusts it.
+RULE_STAGES = [
+    ("attachment_hashes", 0, attachment_hash_stage),
+    ("blocklist", 0.5, blocklist_stage),
+    ("authentication", 0.8, authentication_stage),
+    ("domain_index", 1, domain_index_stage),
+    ("keyword_scanner", 10, keyword_scanner_stage),
+    ("link_analysis", 20, link_analysis_stage),
+]
+
+def deterministic_verdict(sender, text, attachments="", manifest=None, links=None, authentication=None,
+                          canonical_text=None):
+    """
+    Run RULE_STAGES over a message given as its sender, text, attachment
+    names and manifest, HTML links and authentication results. URLs and
+    hosts are read from the raw `text` (canonicalization folds homoglyphs,
+    so pаypal.com would lose its xn-- host); keywords are matched in
+    `canonical_text` (see shared/canonical.py), or in `text` when it isn't
+    given.
+    Returns a verdict dict tagged with the rule stage, or None when the
+    message needs model analysis.
+    """
+    features = RuleFeatures({
+        "sender": sender,
+        "text": text,
+        "canonical_subject": "",
+        "canonical_text": text if canonical_text is None else canonical_text,
+        "attachments": attachments,
+        "attachment_manifest": manifest,
+        "links": links,
+        "authentication": authentication,
+    })
+    for name, _, decide in RULE_STAGES:
+        verdict = decide(features)
+        if verdict is not None:
+            return {**verdict, "stage": name}
+    return None
@@ -0,0 +1,380 @@
+"""
+Link extraction, URL normalization and link-mismatch features.
+
+The parser pulls every <a href> out of the HTML body together with the text
+it displays and ships both in the job as `links`. The classifier normalizes
+those and the plain-text URLs (punycode, percent-encoding, decimal/hex/octal
+IP literals), reduces each host to its registrable domain with tldextract's
+bundled suffix list (no network fetch), and derives the signals a human
+would look at: a link that shows one domain but goes to another, a brand
+name in a host that doesn't belong to the brand, raw IP hosts, punycode,
+credentials in the URL and URL shorteners.
+
+Links rewritten by a mail gateway (Outlook Safe Links, Proofpoint URL
+Defense, Google redirects) are unwrapped to the URL they protect before any
+of that. Links through an ESP's click tracker (Mailchimp, SendGrid, ...)
+can't be unwrapped, so their display text is not compared at all.
+"""
+import ipaddress
+import logging
+import re
+import tldextract
+from html.parser import HTMLParser
+from urllib.parse import parse_qs, unquote, urlsplit
+
+log = logging.getLogger()
+
+# Bundled public suffix snapshot only; never fetched at runtime
+suffix_extract = tldextract.TLDExtract(cache_dir=None, suffix_list_urls=())
+
+# Job budget for extracted links
+MAX_LINKS = 50
+MAX_HREF_CHARS = 300
+MAX_TEXT_CHARS = 100
+
+URL_PATTERN = re.compile(r'https?://[^\s<>"{}|\\^`\[\]]+', re.IGNORECASE)
+
+# Display text that names a domain ("paypal.com", "https://www.paypal.com/signin")
+DISPLAYED_DOMAIN = re.compile(r'^\s*(?:https?://)?(?:www\.)?((?:[a-z0-9-]+\.)+[a-z]{2,})(?:[/:?#]\S*)?\s*$',
+                              re.IGNORECASE)
+
+# Brand name → domains it legitimately links to. A link showing one of a
+# brand's domains and going to another of them (twitter.com → x.com,
+# linkedin.com → lnkd.in) is not a disguise
+BRAND_DOMAINS = {
+    'paypal': {'paypal.com', 'paypal.me', 'paypalobjects.com'},
+    'amazon': {'amazon.com', 'amazon.co.uk', 'amazon.de', 'amazon.ca', 'amazonaws.com', 'a.co', 'amzn.to',
+               'amzn.com'},
+    'apple': {'apple.com', 'icloud.com', 'apple.co'},
+    'microsoft': {'microsoft.com', 'live.com', 'office.com', 'microsoftonline.com', 'outlook.com', 'aka.ms'},
+    'google': {'google.com', 'goo.gl', 'youtube.com', 'googleusercontent.com'},
+    'netflix': {'netflix.com'},
+    'ebay': {'ebay.com', 'ebay.co.uk'},
+    'chase': {'chase.com', 'jpmorganchase.com'},
+    'wellsfargo': {'wellsfargo.com'},
+    'bankofamerica': {'bankofamerica.com', 'bofa.com'},
+    'citibank': {'citibank.com', 'citi.com'},
+    'fedex': {'fedex.com'},
+    'usps': {'usps.com'},
+    'dhl': {'dhl.com'},
+    'coinbase': {'coinbase.com'},
+    'docusign': {'docusign.com', 'docusign.net'},
+    'venmo': {'venmo.com'},
+    'zelle': {'zellepay.com', 'zelle.com'},
+    'irs': {'irs.gov'},
+    'twitter': {'twitter.com', 'x.com', 't.co'},
+    'facebook': {'facebook.com', 'fb.com', 'fb.me', 'facebook.net', 'fbcdn.net', 'meta.com'},
+    'instagram': {'instagram.com', 'instagr.am'},
+    'linkedin': {'linkedin.com', 'lnkd.in'},
+}
+
+URL_SHORTENERS = {
+    'bit.ly', 'tinyurl.com', 't.co', 'goo.gl', 'ow.ly', 'is.gd', 'buff.ly', 'rebrand.ly',
+    'cutt.ly', 'shorturl.at', 'rb.gy', 'tiny.cc', 'bl.ink', 's.id', 'v.gd',
+}
+
+# Gateway/redirect hosts (registrable domain, optional host suffix) → query
+# parameter carrying the original URL. Only these are unwrapped: trusting
+# any ?url= would let a phishing link borrow the domain it displays.
+REDIRECT_PARAMS = {
+    ('outlook.com', '.safelinks.protection.outlook.com'): 'url',
+    ('proofpoint.com', '.urldefense.proofpoint.com'): 'u',
+    ('google.com', None): 'q',
+}
+
+# ESP click trackers; the target is in their database, not the URL
+TRACKING_DOMAINS = {
+    'list-manage.com', 'mailchimp.com', 'mcsv.net', 'sendgrid.net', 'mandrillapp.com', 'mailgun.org',
+    'sparkpostmail.com', 'mjt.lu', 'rs6.net', 'hubspotlinks.com', 'klclick.com', 'klclick1.com',
+    'awstrack.me', 'exacttarget.com', 'cmail19.com', 'cmail20.com', 'createsend1.com',
+    'convertkit-mail.com', 'mlsend.com', 'sendibt3.com', 'constantcontact.com',
+}
+
+# urldefense.com/v3/__<url>__;<checksum>
+URLDEFENSE_V3 = re.compile(r'^https?://urldefense\.com/v3/__(.+?)__;', re.IGNORECASE)
+MAX_REDIRECT_DEPTH = 3
+
+
+class LinkExtractor(HTMLParser):
+    """Collects (href, display text) for every <a>/<area> with an href."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links = []
+        self._open = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("a", "area"):
+            href = dict(attrs).get("href")
+            if href:
+                self._open = {"href": href.strip()[:MAX_HREF_CHARS], "text": ""}
+                self.links.append(self._open)
+                if tag == "area":
+                    self._open = None
+
+    def handle_data(self, data):
+        if self._open is not None and len(self._open["text"]) < MAX_TEXT_CHARS:
+            self._open["text"] = (self._open["text"] + data)[:MAX_TEXT_CHARS]
+
+    def handle_endtag(self, tag):
+        if tag == "a":
+            self._open = None
+
+
+def extract_links(html):
+    """[{"href", "text"}] for the links in an HTML body (at most MAX_LINKS)."""
+    extractor = LinkExtractor()
+    try:
+        extractor.feed(html)
+        extractor.close()
+    except Exception as e:
+        log.warning(f"Could not parse HTML links: {str(e)}")
+    links = []
+    for link in extractor.links[:MAX_LINKS]:
+        links.append({"href": link["href"], "text": " ".join(link["text"].split())})
+    return links
+
+
+def ip_literal(host):
+    """Dotted, integer, hex or octal IPv4 literals and bracketed IPv6 as an address, else None."""
+    host = host.strip("[]")
+    try:
+        return str(ipaddress.ip_address(host))
+    except ValueError:
+        pass
+    parts = host.split(".")
+    if not 1 <= len(parts) <= 4 or not all(re.fullmatch(r'0x[0-9a-f]+|0[0-7]*|[1-9][0-9]*', p) for p in parts):
+        return None
+    try:
+        # inet_aton rules: the last part fills the remaining bytes
+        numbers = [int(p, 16) if p.startswith("0x") else int(p, 8) if len(p) > 1 and p.startswith("0") else int(p)
+                   for p in parts]
+        value = 0
+        for number in numbers[:-1]:
+            if number > 255:
+                return None
+            value = value << 8 | number
+        last_bits = 8 * (5 - len(numbers))
+        if numbers[-1] >= 1 << last_bits:
+            return None
+        return str(ipaddress.IPv4Address(value << last_bits | numbers[-1]))
+    except ValueError:
+        return None
+
+
+def normalize_url(url):
+    """
+    {"url", "scheme", "host", "domain", "ip", "punycode", "userinfo"} for a
+    link, or None when it has no host (mailto:, relative links, ...).
+    javascript:/data: links come back with scheme only.
+    """
+    url = url.strip()
+    try:
+        parts = urlsplit(url if "://" in url or ":" in url.split("/", 1)[0] else f"http://{url}")
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme in ("javascript", "data", "vbscript"):
+        return {"url": url, "scheme": scheme, "host": "", "domain": "", "ip": False,
+                "punycode": False, "userinfo": False}
+    if scheme not in ("http", "https") or not parts.netloc:
+        return None
+
+    netloc = unquote(parts.netloc)
+    userinfo, _, hostport = netloc.rpartition("@")
+    if hostport.startswith("["):
+        host = hostport[1:].split("]", 1)[0]
+    else:
+        host = hostport.split(":", 1)[0]
+    host = host.strip().rstrip(".").lower()
+    if not host:
+        return None
+
+    ip = ip_literal(host)
+    if ip:
+        host, domain = ip, ip
+    else:
+        if not host.isascii():
+            try:
+                host = host.encode("idna").decode("ascii")
+            except UnicodeError:
+                pass
+        ext = suffix_extract(host)
+        domain = f"{ext.domain}.{ext.suffix}" if ext.domain and ext.suffix else host
+
+    return {
+        "url": url,
+        "scheme": scheme,
+        "host": host,
+        "domain": domain,
+        "ip": bool(ip),
+        "punycode": any(label.startswith("xn--") for label in host.split(".")),
+        "userinfo": bool(userinfo),
+    }
+
+
+def registrable_domain(host):
+    """Registrable domain of a host name, or None without a public suffix."""
+    ext = suffix_extract(host.lower().rstrip("."))
+    return f"{ext.domain}.{ext.suffix}" if ext.domain and ext.suffix else None
+
+
+def unwrap_redirect(url):
+    """
+    The URL a gateway rewrite (Safe Links, URL Defense v2/v3, google.com/url)
+    points to, or None when `url` isn't one of REDIRECT_PARAMS' hosts.
+    """
+    match = URLDEFENSE_V3.match(url.strip())
+    if match:
+        return match.group(1)
+    parsed = normalize_url(url)
+    if not parsed or not parsed["host"]:
+        return None
+    for (domain, host_suffix), param in REDIRECT_PARAMS.items():
+        if parsed["domain"] != domain or (host_suffix and not f".{parsed['host']}".endswith(host_suffix)):
+            continue
+        if domain == 'google.com' and urlsplit(parsed["url"]).path != "/url":
+            continue
+        values = parse_qs(urlsplit(parsed["url"]).query).get(param)
+        if not values:
+            return None
+        target = values[0]
+        if domain == 'proofpoint.com':
+            # v2 encoding: "-" escapes hex bytes, "_" stands for "/"
+            target = re.sub(r'-([0-9A-F]{2})', lambda m: chr(int(m.group(1), 16)), target.replace("_", "/"))
+        return target
+    return None
+
+
+def resolve_redirects(url):
+    """`url` with gateway redirects unwrapped, up to MAX_REDIRECT_DEPTH layers."""
+    for _ in range(MAX_REDIRECT_DEPTH):
+        target = unwrap_redirect(url)
+        if not target:
+            break
+        url = target
+    return url
+
+
+def brand_of(host, domain):
+    """
+    A brand named by a whole label or hyphenated token of `host`
+    (paypal-secure.com, amazon.verify-account.net) when the link's
+    registrable domain isn't one of the brand's, else None.
+    """
+    tokens = set(re.split(r'[.-]', host))
+    for brand in tokens & BRAND_DOMAINS.keys():
+        if domain not in BRAND_DOMAINS[brand]:
+            return brand
+    return None
+
+
+def same_brand(shown, actual):
+    """Both domains belong to one brand in BRAND_DOMAINS."""
+    return any(shown in domains and actual in domains for domains in BRAND_DOMAINS.values())
+
+
+def message_urls(links, text):
+    """
+    Every link of a message as {"href", "text"}: the parser's HTML links
+    first, then URLs that only appear in `text` (no display text), with
+    gateway redirects unwrapped. The one list both the link features and
+    the blocklist read.
+    """
+    seen = {link.get("href") for link in links or []}
+    candidates = list(links or []) + [{"href": url, "text": ""} for url in URL_PATTERN.findall(text or "")
+                                      if url not in seen]
+    return [{**link, "href": resolve_redirects(link.get("href", ""))} for link in candidates]
+
+
+def link_hosts(urls):
+    """Distinct normalized hosts of message_urls() entries (all of them, for lookups such as the blocklist)."""
+    hosts = (normalize_url(link["href"]) for link in urls)
+    return list(dict.fromkeys(parsed["host"] for parsed in hosts if parsed and parsed["host"]))
+
+
+def analyze_links(links, text, sender_domain=None, urls=None):
+    """
+    Link features for a message. `links` are the parser's {"href", "text"}
+    pairs; URLs that only appear in `text` are added with no display text.
+    Pass `urls` when message_urls() has already been computed.
+    """
+    candidates = message_urls(links, text) if urls is None else urls
+
+    report = {
+        "count": 0, "domains": [], "display_mismatch": [], "brand_mismatch": [],
+        "ip_hosts": [], "punycode_hosts": [], "userinfo": [], "shorteners": [], "script_links": 0,
+        "offsite": 0, "tracked": 0,
+    }
+    domains = {}
+    for link in candidates[:MAX_LINKS]:
+        parsed = normalize_url(link.get("href", ""))
+        if parsed is None:
+            continue
+        if not parsed["host"]:
+            report["script_links"] += 1
+            continue
+        report["count"] += 1
+        domain = parsed["domain"]
+        domains[domain] = domains.get(domain, 0) + 1
+        if sender_domain and domain != sender_domain:
+            report["offsite"] += 1
+
+        tracked = domain in TRACKING_DOMAINS or parsed["host"] in TRACKING_DOMAINS
+        report["tracked"] += tracked
+        shown = DISPLAYED_DOMAIN.match(link.get("text") or "")
+        if shown and not tracked:
+            shown_domain = registrable_domain(shown.group(1))
+            if shown_domain and shown_domain != domain and not same_brand(shown_domain, domain):
+                report["display_mismatch"].append({"shown": shown_domain, "actual": domain})
+        if not parsed["ip"]:
+            brand = brand_of(parsed["host"], domain)
+            if brand:
+                report["brand_mismatch"].append({"brand": brand, "host": parsed["host"], "actual": domain})
+        if parsed["ip"]:
+            report["ip_hosts"].append(parsed["host"])
+        if parsed["punycode"]:
+            report["punycode_hosts"].append(parsed["host"])
+        if parsed["userinfo"]:
+            report["userinfo"].append(domain)
+        if domain in URL_SHORTENERS:
+            report["shorteners"].append(domain)
+
+    report["domains"] = sorted(domains, key=lambda d: -domains[d])
+    return report
+
+
+def link_summary(report, max_domains=8):
+    """Compact lines describing the links, for the model prompt."""
+    if not report["count"] and not report["script_links"]:
+        return "Links: none"
+    lines = [f"Links: {report['count']} to {len(report['domains'])} domains "
+             f"({', '.join(report['domains'][:max_domains])}{', ...' if len(report['domains']) > max_domains else ''})"]
+    if report.get("tracked"):
+        lines.append(f"Click-tracked links (destination hidden): {report['tracked']}")
+    flags = []
+    for mismatch in report["display_mismatch"][:3]:
+        flags.append(f"shows {mismatch['shown']} but goes to {mismatch['actual']}")
+    for mismatch in report["brand_mismatch"][:3]:
+        flags.append(f"'{mismatch['brand']}' in non-{mismatch['brand']} domain {mismatch['actual']}")
+    if report["ip_hosts"]:
+        flags.append(f"raw IP host {report['ip_hosts'][0]}")
+    if report["punycode_hosts"]:
+        flags.append(f"punycode host {report['punycode_hosts'][0]}")
+    if report["userinfo"]:
+        flags.append("credentials in URL")
+    if report["shorteners"]:
+        flags.append(f"URL shortener {report['shorteners'][0]}")
+    if report["script_links"]:
+        flags.append(f"{report['script_links']} script/data links")
+    if flags:
+        lines.append(f"Link red flags: {'; '.join(flags)}")
+    return "\n".join(lines)
+
+
+def compact_urls(text):
+    """Replace each URL in `text` with its registrable domain, e.g. [link: paypal.com]."""
+    def replace(match):
+        parsed = normalize_url(match.group(0))
+        return f"[link: {parsed['domain']}]" if parsed and parsed["domain"] else "[link]"
+    return URL_PATTERN.sub(replace, text)
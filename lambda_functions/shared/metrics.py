@@ -0,0 +1,127 @@
+"""
+CloudWatch Embedded Metric Format (EMF) helpers.
+
+Every Lambda writes its metrics as one JSON log line per record; CloudWatch
+extracts them into the ScamVanguard namespace without any PutMetricData
+calls. Tests swap the stdout sink for a MemorySink and assert on records.
+"""
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+NAMESPACE = os.environ.get("METRICS_NAMESPACE", "ScamVanguard")
+
+# Where EMF records go; None means stdout (picked up by CloudWatch Logs)
+_sink = None
+
+
+class MemorySink:
+    """Collects EMF records in memory for local runs and tests."""
+
+    def __init__(self):
+        self.records = []
+
+    def __call__(self, record):
+        self.records.append(record)
+
+    def values(self, name, **dimensions):
+        """All values emitted for a metric, optionally filtered by dimension values."""
+        found = []
+        for record in self.records:
+            if name not in record:
+                continue
+            if all(record.get(k) == v for k, v in dimensions.items()):
+                found.append(record[name])
+        return found
+
+    def clear(self):
+        self.records = []
+
+
+def set_sink(sink):
+    """Route EMF records to `sink` (a callable taking the record dict); None restores stdout."""
+    global _sink
+    _sink = sink
+
+
+def emit(metrics, dimensions=None, properties=None):
+    """
+    Write one EMF record.
+
+    metrics: {name: (value, unit)}
+    dimensions: low-cardinality {name: value}; each is published on its own
+        plus an undimensioned aggregate, never as a cross product
+    properties: extra searchable context (message ids etc.), not dimensions
+    """
+    if not metrics:
+        return None
+
+    dimensions = {k: str(v) for k, v in (dimensions or {}).items() if v is not None}
+    record = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": NAMESPACE,
+                "Dimensions": [[]] + [[name] for name in dimensions],
+                "Metrics": [{"Name": name, "Unit": unit} for name, (_, unit) in metrics.items()],
+            }],
+        },
+    }
+    record.update({k: v for k, v in (properties or {}).items() if v is not None})
+    record.update(dimensions)
+    record.update({name: value for name, (value, _) in metrics.items()})
+
+    if _sink is not None:
+        _sink(record)
+    else:
+        sys.stdout.write(json.dumps(record, default=str) + "\n")
+        sys.stdout.flush()
+    return record
+
+
+class MetricsLogger:
+    """
+    Accumulates the metrics of one invocation (or one record) and writes
+    them as a single EMF line on flush().
+    """
+
+    def __init__(self, service):
+        self.service = service
+        self.metrics = {}
+        self.dimensions = {}
+        self.properties = {}
+
+    def put(self, name, value, unit="Milliseconds"):
+        self.metrics[name] = (round(value, 2) if isinstance(value, float) else value, unit)
+
+    def count(self, name, value=1):
+        self.put(name, value, "Count")
+
+    def set_dimension(self, name, value):
+        self.dimensions[name] = value
+
+    def set_property(self, name, value):
+        self.properties[name] = value
+
+    @contextmanager
+    def timer(self, name):
+        """Time a block and record it in milliseconds, even if it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.put(name, (time.perf_counter() - started) * 1000)
+
+    def flush(self):
+        """Emit everything recorded so far and start a fresh record."""
+        record = emit(
+            self.metrics,
+            {"Service": self.service, **self.dimensions},
+            self.properties
+        )
+        self.metrics = {}
+        self.dimensions = {}
+        self.properties = {}
+        return record
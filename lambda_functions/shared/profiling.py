@@ -0,0 +1,137 @@
+"""
+Opt-in profiling for Lambda handlers.
+
+Wrap a handler with @profiled("classifier"). Profiling is off unless
+PROFILE_HANDLERS is set (profile every invocation) or PROFILE_SAMPLE_RATE
+is above zero (profile that share of invocations). When both are off the
+handler is returned unwrapped, so there is no per-invocation cost.
+
+Each profiled invocation writes two small artifacts, keyed by message_id:
+
+    profiles/<service>/<message_id>/<epoch_ms>.prof   (pstats dump, open with snakeviz/pstats)
+    profiles/<service>/<message_id>/<epoch_ms>.txt    (top functions + top allocations)
+
+to PROFILE_BUCKET (default ATTACHMENT_BUCKET), or to /tmp/profiles when no
+bucket is configured, e.g. local runs.
+"""
+import cProfile
+import io
+import json
+import logging
+import marshal
+import os
+import pstats
+import random
+import time
+import tracemalloc
+from functools import wraps
+
+log = logging.getLogger()
+
+PROFILE_ALWAYS = os.environ.get("PROFILE_HANDLERS", "").lower() in ("1", "true", "yes")
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0") or 0)
+PROFILE_BUCKET = os.environ.get("PROFILE_BUCKET", os.environ.get("ATTACHMENT_BUCKET", ""))
+PROFILE_PREFIX = "profiles/"
+LOCAL_PROFILE_DIR = "/tmp/profiles"
+
+TOP_FUNCTIONS = 25
+TOP_ALLOCATIONS = 15
+
+_s3 = None
+
+
+def should_profile():
+    return PROFILE_ALWAYS or (PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE)
+
+
+def event_message_id(event):
+    """Best-effort message_id for SES events and SQS batches of parser jobs."""
+    try:
+        record = event["Records"][0]
+        if "ses" in record:
+            return record["ses"]["mail"]["messageId"]
+        if "body" in record:
+            return json.loads(record["body"]).get("message_id") or record.get("messageId")
+    except (KeyError, IndexError, TypeError, ValueError):
+        pass
+    return "unknown"
+
+
+def summarize(profiler, snapshot, elapsed_ms):
+    """Human-readable report: wall time, hottest functions, biggest allocation sites."""
+    out = io.StringIO()
+    out.write(f"wall time: {elapsed_ms:.1f} ms\n\n")
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+
+    out.write("\ntop allocations (tracemalloc):\n")
+    for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+        out.write(f"  {stat}\n")
+    return out.getvalue()
+
+
+def write_artifacts(service, message_id, profile_bytes, report):
+    """Store the artifacts in S3, or under /tmp when no bucket is configured. Returns the key prefix."""
+    global _s3
+    key = f"{PROFILE_PREFIX}{service}/{message_id}/{int(time.time() * 1000)}"
+
+    if PROFILE_BUCKET:
+        if _s3 is None:
+            import boto3
+            _s3 = boto3.client("s3")
+        _s3.put_object(Bucket=PROFILE_BUCKET, Key=f"{key}.prof", Body=profile_bytes)
+        _s3.put_object(Bucket=PROFILE_BUCKET, Key=f"{key}.txt", Body=report.encode("utf-8"),
+                       ContentType="text/plain")
+        return f"s3://{PROFILE_BUCKET}/{key}"
+
+    path = os.path.join(LOCAL_PROFILE_DIR, key[len(PROFILE_PREFIX):])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.prof", "wb") as f:
+        f.write(profile_bytes)
+    with open(f"{path}.txt", "w") as f:
+        f.write(report)
+    return path
+
+
+def run_profiled(service, handler, event, context):
+    """Run one handler invocation under cProfile and tracemalloc and store the results."""
+    tracing_memory = not tracemalloc.is_tracing()
+    if tracing_memory:
+        tracemalloc.start()
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+
+    try:
+        return profiler.runcall(handler, event, context)
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        snapshot = tracemalloc.take_snapshot()
+        if tracing_memory:
+            tracemalloc.stop()
+
+        # Profiling must never fail the invocation it observed
+        try:
+            profiler.create_stats()
+            location = write_artifacts(
+                service,
+                event_message_id(event),
+                marshal.dumps(profiler.stats),
+                summarize(profiler, snapshot, elapsed_ms)
+            )
+            log.info(f"Profile for {service} written to {location}")
+        except Exception as e:
+            log.error(f"Failed to write profile for {service}: {str(e)}")
+
+
+def profiled(service):
+    """Decorator enabling opt-in profiling of a Lambda handler."""
+    def decorate(handler):
+        if not PROFILE_ALWAYS and PROFILE_SAMPLE_RATE <= 0:
+            return handler
+
+        @wraps(handler)
+        def wrapper(event, context):
+            if not should_profile():
+                return handler(event, context)
+            return run_profiled(service, handler, event, context)
+        return wrapper
+    return decorate
@@ -0,0 +1,109 @@
+"""
+Suppression-list lookups with an in-container cache.
+
+The parser checks the forwarding user against the suppression table on
+admission and the classifier checks again before replying. Warm containers
+keep recent answers in a small TTL LRU: suppressed addresses for up to
+SUPPRESSION_CACHE_TTL_SECONDS (never past the item's own TTL) and clean
+addresses for SUPPRESSION_NEGATIVE_TTL_SECONDS. Writers in the same
+container invalidate the address; the negative TTL bounds how long a
+suppression written by another container (ses_feedback_processor) goes
+unnoticed. The parser's result travels in the job as `admission`, so the
+classifier only looks the user up again when that result has gone stale.
+"""
+import logging
+import os
+import time
+from collections import OrderedDict
+
+log = logging.getLogger()
+
+POSITIVE_TTL_SECONDS = float(os.environ.get("SUPPRESSION_CACHE_TTL_SECONDS", "300"))
+NEGATIVE_TTL_SECONDS = float(os.environ.get("SUPPRESSION_NEGATIVE_TTL_SECONDS", "60"))
+MAX_ENTRIES = int(os.environ.get("SUPPRESSION_CACHE_SIZE", "10000"))
+
+
+class SuppressionCache:
+    """
+    TTL LRU of suppression answers keyed on the lowercased address. The table
+    is passed per lookup so tests and local runs can swap it on the module.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, positive_ttl=POSITIVE_TTL_SECONDS,
+                 negative_ttl=NEGATIVE_TTL_SECONDS, clock=time.time):
+        self.max_entries = max_entries
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.clock = clock
+        self._entries = OrderedDict()  # email -> (suppressed, expires_at)
+
+    def get(self, email):
+        """Cached answer for `email`, or None if unknown or expired."""
+        entry = self._entries.get(email)
+        if entry is None:
+            return None
+        suppressed, expires_at = entry
+        if expires_at <= self.clock():
+            del self._entries[email]
+            return None
+        self._entries.move_to_end(email)
+        return suppressed
+
+    def put(self, email, suppressed, item_ttl=None):
+        """Remember an answer; a suppression never outlives the item's TTL."""
+        now = self.clock()
+        expires_at = now + (self.positive_ttl if suppressed else self.negative_ttl)
+        if suppressed and item_ttl is not None:
+            expires_at = min(expires_at, int(item_ttl))
+        if expires_at <= now:
+            return
+        self._entries[email] = (suppressed, expires_at)
+        self._entries.move_to_end(email)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, email):
+        """Forget `email` after this container wrote its suppression item."""
+        self._entries.pop(email.lower(), None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def is_suppressed(self, table, email, on_error=False, metrics=None):
+        """
+        Whether `email` is on the suppression list. Table errors return
+        `on_error` (callers pick fail-open or fail-closed) and aren't cached.
+        """
+        email = email.lower()
+        cached = self.get(email)
+        if metrics is not None:
+            metrics.count("SuppressionCacheHits", int(cached is not None))
+        if cached is not None:
+            return cached
+
+        try:
+            response = table.get_item(Key={'email': email})
+        except Exception as e:
+            log.error(f"Error checking suppression list for {email}: {str(e)}")
+            return on_error
+
+        item = response.get('Item')
+        self.put(email, item is not None, item.get('ttl') if item else None)
+        return item is not None
+
+
+# One cache per warm container
+suppression_cache = SuppressionCache()
+
+
+def admission(suppressed, checked_at=None):
+    """The parser's suppression answer, as carried in the job."""
+    return {"suppressed": suppressed, "checked_at": int((checked_at or time.time()) * 1000)}
+
+
+def admission_is_fresh(admission, now=None):
+    """True if the job's admission answer is recent enough to reuse."""
+    if not admission or admission.get("suppressed"):
+        return False
+    age_ms = (now or time.time()) * 1000 - admission.get("checked_at", 0)
+    return 0 <= age_ms <= NEGATIVE_TTL_SECONDS * 1000
@@ -0,0 +1,95 @@
+"""
+End-to-end SLA tracing from SES receipt to verdict delivery.
+
+A trace is a plain dict that travels inside the SQS job:
+
+    {"correlation_id": "...", "message_id": "...",
+     "stamps": {"ses_received": 1736937000000, "parser_started": ..., ...}}
+
+Every hop adds an epoch-millisecond stamp. Whoever delivers the verdict
+calls emit_trace_metrics() to publish the total and per-hop latencies.
+"""
+import logging
+import os
+import time
+import uuid
+from datetime import datetime
+
+from shared.metrics import emit
+
+log = logging.getLogger()
+
+# README promise: responses in about 30 seconds
+SLA_TARGET_MS = int(os.environ.get("SLA_TARGET_SECONDS", "30")) * 1000
+
+# (metric name, from stamp, to stamp), in pipeline order
+HOPS = [
+    ("HopSesToParserLatency", "ses_received", "parser_started"),
+    ("HopParserLatency", "parser_started", "parser_completed"),
+    ("HopQueueLatency", "sqs_enqueued", "classifier_dequeued"),
+    ("HopClassificationLatency", "classifier_dequeued", "classified"),
+    ("HopDeliveryLatency", "classified", "verdict_sent"),
+]
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+def parse_ses_timestamp(timestamp):
+    """SES mail timestamps look like 2025-01-15T10:30:00.000Z; returns epoch ms or None."""
+    if not timestamp:
+        return None
+    try:
+        return int(datetime.fromisoformat(timestamp.replace("Z", "+00:00")).timestamp() * 1000)
+    except (ValueError, AttributeError):
+        log.warning(f"Unparseable SES timestamp: {timestamp}")
+        return None
+
+
+def new_trace(message_id, ses_timestamp=None):
+    """Start a trace for an email, anchored at SES receipt when known."""
+    trace = {
+        "correlation_id": uuid.uuid4().hex,
+        "message_id": message_id,
+        "stamps": {},
+    }
+    received = parse_ses_timestamp(ses_timestamp)
+    if received:
+        trace["stamps"]["ses_received"] = received
+    return trace
+
+
+def stamp(trace, name, at=None):
+    """Record that the email reached `name` (now, unless `at` is given in epoch ms)."""
+    trace.setdefault("stamps", {})[name] = at if at is not None else now_ms()
+    return trace
+
+
+def hop_latencies(trace):
+    """Per-hop and total latency in ms for every hop whose stamps are both present."""
+    stamps = trace.get("stamps", {})
+    latencies = {}
+    for name, start, end in HOPS:
+        if start in stamps and end in stamps:
+            latencies[name] = max(0, stamps[end] - stamps[start])
+    if "ses_received" in stamps and "verdict_sent" in stamps:
+        latencies["EndToEndLatency"] = max(0, stamps["verdict_sent"] - stamps["ses_received"])
+    return latencies
+
+
+def emit_trace_metrics(trace, dimensions=None):
+    """Publish the trace's latencies as EMF metrics and log a one-line summary."""
+    latencies = hop_latencies(trace)
+    metrics = {name: (value, "Milliseconds") for name, value in latencies.items()}
+    if "EndToEndLatency" in latencies:
+        metrics["SlaBreaches"] = (int(latencies["EndToEndLatency"] > SLA_TARGET_MS), "Count")
+
+    emit(metrics, dimensions, {
+        "correlation_id": trace.get("correlation_id"),
+        "message_id": trace.get("message_id"),
+        "ses_message_id": trace.get("ses_message_id"),
+        "parser_cold_start": trace.get("parser_cold_start"),
+    })
+    log.info(f"Trace {trace.get('correlation_id')} for {trace.get('message_id')}: {latencies}")
+    return latencies
@@ -120,6 +120,34 @@ resource "aws_s3_bucket_policy" "email_attachments" {
   })
 }
 
+# Threat intel (phishing blocklist) - long-lived, unlike the attachments bucket
+resource "aws_s3_bucket" "threat_intel" {
+  bucket = "scamvanguard-threat-intel-${random_id.bucket_suffix.hex}"
+}
+
+resource "aws_s3_bucket_server_side_encryption_configuration" "threat_intel" {
+  bucket = aws_s3_bucket.threat_intel.id
+
+  rule {
+    apply_server_side_encryption_by_default {
+      sse_algorithm = "AES256"
+    }
+  }
+}
+
+locals {
+  blocklist_s3_uri = "s3://${aws_s3_bucket.threat_intel.id}/blocklist/blocklist.bin"
+}
+
+resource "aws_s3_bucket_public_access_block" "threat_intel" {
+  bucket = aws_s3_bucket.threat_intel.id
+
+  block_public_acls       = true
+  block_public_policy     = true
+  ignore_public_acls      = true
+  restrict_public_buckets = true
+}
+
 # ==================== ECR REPOSITORIES ====================
 
 # Single ECR repository for all Lambda functions
@@ -147,7 +175,7 @@ resource "aws_ecr_lifecycle_policy" "lambda_functions" {
         description  = "Keep last 4 versioned images per function"
         selection = {
           tagStatus     = "tagged"
-          tagPrefixList = ["classifier-", "email-parser-", "ses-feedback-processor-", "forward-contact-"]
+          tagPrefixList = ["classifier-", "email-parser-", "ses-feedback-processor-", "forward-contact-", "classify-api-"]
           countType     = "imageCountMoreThan"
           countNumber   = 4
         }
@@ -160,7 +188,7 @@ resource "aws_ecr_lifecycle_policy" "lambda_functions" {
         description  = "Keep -latest tags forever"
         selection = {
           tagStatus     = "tagged"
-          tagPrefixList = ["classifier-latest", "email-parser-latest", "ses-feedback-processor-latest", "forward-contact-latest"]
+          tagPrefixList = ["classifier-latest", "email-parser-latest", "ses-feedback-processor-latest", "forward-contact-latest", "classify-api-latest"]
           countType     = "imageCountMoreThan"
           countNumber   = 999  # Effectively keep forever
         }
@@ -242,7 +270,7 @@ resource "aws_iam_role_policy" "lambda_policy" {
           "sqs:DeleteMessage",
           "sqs:GetQueueAttributes"
         ]
-        Resource = aws_sqs_queue.processing_queue.arn
+        Resource = [aws_sqs_queue.processing_queue.arn, aws_sqs_queue.feedback_queue.arn]
       },
       {
         Sid      = "S3ReadEmail"
@@ -250,11 +278,23 @@ resource "aws_iam_role_policy" "lambda_policy" {
         Action   = ["s3:GetObject"]
         Resource = "${aws_s3_bucket.email_attachments.arn}/*"
       },
+      {
+        Sid      = "S3ReadBlocklist"
+        Effect   = "Allow"
+        Action   = ["s3:GetObject"]
+        Resource = "${aws_s3_bucket.threat_intel.arn}/blocklist/*"
+      },
+      {
+        Sid      = "S3WriteProfiles"
+        Effect   = "Allow"
+        Action   = ["s3:PutObject"]
+        Resource = "${aws_s3_bucket.email_attachments.arn}/profiles/*"
+      },
       {
         Sid      = "SecretsManagerRead",
         Effect   = "Allow",
         Action   = ["secretsmanager:GetSecretValue"],
-        Resource = aws_secretsmanager_secret.openai_api_key.arn
+        Resource = [aws_secretsmanager_secret.openai_api_key.arn, aws_secretsmanager_secret.classify_api_keys.arn]
       },
       {
         Sid    = "DynamoDBSuppression",
@@ -262,6 +302,8 @@ resource "aws_iam_role_policy" "lambda_policy" {
         Action = [
           "dynamodb:PutItem",
           "dynamodb:GetItem",
+          "dynamodb:UpdateItem",
+          "dynamodb:BatchWriteItem",
           "dynamodb:Query"
         ],
         Resource = aws_dynamodb_table.email_suppression.arn
@@ -295,6 +337,45 @@ resource "aws_sqs_queue" "processing_queue" {
   })
 }
 
+# SES bounce/complaint feedback, buffered so the processor handles it in batches
+resource "aws_sqs_queue" "feedback_dlq" {
+  name                      = "ScamVanguardFeedbackDLQ"
+  message_retention_seconds = 1209600 # 14 days
+  kms_master_key_id         = "alias/aws/sqs"
+}
+
+resource "aws_sqs_queue" "feedback_queue" {
+  name                       = "ScamVanguardFeedbackQueue"
+  message_retention_seconds  = 345600 # 4 days
+  visibility_timeout_seconds = 360    # 6x the processor timeout
+  receive_wait_time_seconds  = 20
+  sqs_managed_sse_enabled    = true # SNS can't publish to queues using the AWS managed KMS key
+
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.feedback_dlq.arn
+    maxReceiveCount     = 5
+  })
+}
+
+resource "aws_sqs_queue_policy" "feedback_from_sns" {
+  queue_url = aws_sqs_queue.feedback_queue.id
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Sid       = "AllowSNSPublish"
+        Effect    = "Allow"
+        Principal = { Service = "sns.amazonaws.com" }
+        Action    = "sqs:SendMessage"
+        Resource  = aws_sqs_queue.feedback_queue.arn
+        Condition = {
+          ArnEquals = { "aws:SourceArn" = aws_sns_topic.ses_notifications.arn }
+        }
+      }
+    ]
+  })
+}
+
 # ==================== LAMBDA FUNCTIONS ====================
 
 # contact@scamvanguard.com forwarder
@@ -311,6 +392,7 @@ resource "aws_lambda_function" "contact_forwarder" {
       ATTACHMENT_BUCKET = aws_s3_bucket.email_attachments.id
       KEY_PREFIX        = "contact/"
       FORWARD_EMAIL     = var.forward_email
+      FORWARD_MODE      = var.forward_mode
     }
   }
 }
@@ -326,9 +408,13 @@ resource "aws_lambda_function" "email_parser" {
   
   environment {
     variables = {
-      ATTACHMENT_BUCKET    = aws_s3_bucket.email_attachments.id
-      PROCESSING_QUEUE_URL = aws_sqs_queue.processing_queue.url
-      SUPPRESSION_TABLE    = aws_dynamodb_table.email_suppression.name
+      ATTACHMENT_BUCKET         = aws_s3_bucket.email_attachments.id
+      PROCESSING_QUEUE_URL      = aws_sqs_queue.processing_queue.url
+      SUPPRESSION_TABLE         = aws_dynamodb_table.email_suppression.name
+      DOMAIN_NAME               = var.domain_name
+      PROFILE_SAMPLE_RATE       = var.profile_sample_rate
+      BLOCKLIST_S3_URI          = local.blocklist_s3_uri
+      BLOCKLIST_REFRESH_SECONDS = var.blocklist_refresh_seconds
     }
   }
   
@@ -348,9 +434,59 @@ resource "aws_lambda_function" "classifier" {
   
   environment {
     variables = {
-      ATTACHMENT_BUCKET  = aws_s3_bucket.email_attachments.id
-      OPENAI_SECRET_NAME = aws_secretsmanager_secret.openai_api_key.name
-      MODEL_THRESHOLD    = var.model_threshold
+      ATTACHMENT_BUCKET            = aws_s3_bucket.email_attachments.id
+      OPENAI_SECRET_NAME           = aws_secretsmanager_secret.openai_api_key.name
+      MODEL_THRESHOLD              = var.model_threshold
+      PROCESSING_QUEUE_URL         = aws_sqs_queue.processing_queue.url # Requeue target for quota deferrals
+      OPENAI_QUOTA_LIMITS          = jsonencode(var.openai_quota_limits)
+      CASCADE_CONFIDENCE_THRESHOLD = var.cascade_confidence_threshold
+      PROFILE_SAMPLE_RATE          = var.profile_sample_rate
+      BLOCKLIST_S3_URI             = local.blocklist_s3_uri
+      BLOCKLIST_REFRESH_SECONDS    = var.blocklist_refresh_seconds
+    }
+  }
+}
+
+# Synchronous classification API (parser extraction + classifier in-process)
+resource "aws_lambda_function" "classify_api" {
+  package_type  = "Image"
+  image_uri     = "${aws_ecr_repository.lambda_functions.repository_url}:classify-api-latest"
+  function_name = "ScamVanguardClassifyApi"
+  role          = aws_iam_role.lambda_execution.arn
+  timeout       = 29 # API Gateway integration limit
+  memory_size   = 1024
+  
+  environment {
+    variables = {
+      OPENAI_SECRET_NAME           = aws_secretsmanager_secret.openai_api_key.name
+      MODEL_THRESHOLD              = var.model_threshold
+      OPENAI_QUOTA_LIMITS          = jsonencode(var.openai_quota_limits)
+      API_QUOTA_LIMITS             = jsonencode(var.api_quota_limits) # The API's share of the limits above
+      CASCADE_CONFIDENCE_THRESHOLD = var.cascade_confidence_threshold
+      PROFILE_SAMPLE_RATE          = var.profile_sample_rate
+      PROFILE_BUCKET               = aws_s3_bucket.email_attachments.id
+      BLOCKLIST_S3_URI             = local.blocklist_s3_uri
+      BLOCKLIST_REFRESH_SECONDS    = var.blocklist_refresh_seconds
+    }
+  }
+}
+
+# API key check for the classify API (same image, authorizer handler)
+resource "aws_lambda_function" "classify_api_authorizer" {
+  package_type  = "Image"
+  image_uri     = "${aws_ecr_repository.lambda_functions.repository_url}:classify-api-latest"
+  function_name = "ScamVanguardClassifyApiAuthorizer"
+  role          = aws_iam_role.lambda_execution.arn
+  timeout       = 5
+  memory_size   = 256
+
+  image_config {
+    command = ["authorizer.handler"]
+  }
+
+  environment {
+    variables = {
+      API_KEYS_SECRET_NAME = aws_secretsmanager_secret.classify_api_keys.name
     }
   }
 }
@@ -366,7 +502,10 @@ resource "aws_lambda_function" "ses_feedback_processor" {
   
   environment {
     variables = {
-      SUPPRESSION_TABLE = aws_dynamodb_table.email_suppression.name
+      SUPPRESSION_TABLE            = aws_dynamodb_table.email_suppression.name
+      SOFT_BOUNCE_THRESHOLD        = var.soft_bounce_threshold
+      SOFT_BOUNCE_WINDOW_DAYS      = var.soft_bounce_window_days
+      SOFT_BOUNCE_SUPPRESSION_DAYS = var.soft_bounce_suppression_days
     }
   }
 }
@@ -378,6 +517,76 @@ resource "aws_lambda_event_source_mapping" "sqs_trigger" {
   batch_size       = 1
 }
 
+# ==================== CLASSIFY API ====================
+
+# HTTP API in front of the classify_api Lambda: POST /classify
+resource "aws_apigatewayv2_api" "classify" {
+  name          = "ScamVanguardClassifyApi"
+  protocol_type = "HTTP"
+
+  cors_configuration {
+    allow_origins = ["https://${var.domain_name}"]
+    allow_methods = ["POST"]
+    allow_headers = ["content-type", "x-api-key"]
+  }
+}
+
+# Every request can reach OpenAI, so callers need a key from var.classify_api_keys
+resource "aws_apigatewayv2_authorizer" "classify" {
+  api_id                            = aws_apigatewayv2_api.classify.id
+  name                              = "ClassifyApiKey"
+  authorizer_type                   = "REQUEST"
+  authorizer_uri                    = aws_lambda_function.classify_api_authorizer.invoke_arn
+  authorizer_payload_format_version = "2.0"
+  enable_simple_responses           = true
+  identity_sources                  = ["$request.header.x-api-key"]
+  authorizer_result_ttl_in_seconds  = 300
+}
+
+resource "aws_apigatewayv2_integration" "classify" {
+  api_id                 = aws_apigatewayv2_api.classify.id
+  integration_type       = "AWS_PROXY"
+  integration_uri        = aws_lambda_function.classify_api.invoke_arn
+  payload_format_version = "2.0"
+}
+
+resource "aws_apigatewayv2_route" "classify" {
+  api_id    = aws_apigatewayv2_api.classify.id
+  route_key = "POST /classify"
+  target    = "integrations/${aws_apigatewayv2_integration.classify.id}"
+
+  authorization_type = "CUSTOM"
+  authorizer_id      = aws_apigatewayv2_authorizer.classify.id
+}
+
+resource "aws_apigatewayv2_stage" "classify" {
+  api_id      = aws_apigatewayv2_api.classify.id
+  name        = "$default"
+  auto_deploy = true
+
+  # Every request can reach OpenAI, so keep the public endpoint throttled
+  default_route_settings {
+    throttling_rate_limit  = var.api_rate_limit
+    throttling_burst_limit = var.api_burst_limit
+  }
+}
+
+resource "aws_lambda_permission" "classify_api" {
+  statement_id  = "AllowAPIGatewayInvoke"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.classify_api.function_name
+  principal     = "apigateway.amazonaws.com"
+  source_arn    = "${aws_apigatewayv2_api.classify.execution_arn}/*/*"
+}
+
+resource "aws_lambda_permission" "classify_api_authorizer" {
+  statement_id  = "AllowAPIGatewayAuthorize"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.classify_api_authorizer.function_name
+  principal     = "apigateway.amazonaws.com"
+  source_arn    = "${aws_apigatewayv2_api.classify.execution_arn}/authorizers/${aws_apigatewayv2_authorizer.classify.id}"
+}
+
 # ==================== SECRETS MANAGER ====================
 
 # OpenAI API Key secret
@@ -395,6 +604,18 @@ resource "aws_secretsmanager_secret_version" "openai_api_key" {
   })
 }
 
+# Classify API keys: {"<client name>": "<key>"}; read by the authorizer
+resource "aws_secretsmanager_secret" "classify_api_keys" {
+  name                    = "ScamVanguard/ClassifyApi/Keys"
+  description             = "API keys accepted by the classify API"
+  recovery_window_in_days = 7
+}
+
+resource "aws_secretsmanager_secret_version" "classify_api_keys" {
+  secret_id     = aws_secretsmanager_secret.classify_api_keys.id
+  secret_string = jsonencode(var.classify_api_keys)
+}
+
 # ==================== SNS CONFIGURATION ====================
 
 # Create the topic
@@ -458,8 +679,28 @@ resource "aws_ses_identity_notification_topic" "complaint" {
   ]
 }
 
+# Feedback reaches the processor either through the SQS buffer (default:
+# batched, fewer invocations under a bounce storm) or directly from SNS
+resource "aws_sns_topic_subscription" "ses_notifications_queue" {
+  count                = var.feedback_via_queue ? 1 : 0
+  topic_arn            = aws_sns_topic.ses_notifications.arn
+  protocol             = "sqs"
+  endpoint             = aws_sqs_queue.feedback_queue.arn
+  raw_message_delivery = true
+}
+
+resource "aws_lambda_event_source_mapping" "feedback_trigger" {
+  count                              = var.feedback_via_queue ? 1 : 0
+  event_source_arn                   = aws_sqs_queue.feedback_queue.arn
+  function_name                      = aws_lambda_function.ses_feedback_processor.arn
+  batch_size                         = 100
+  maximum_batching_window_in_seconds = 30
+  function_response_types            = ["ReportBatchItemFailures"]
+}
+
 # OPTIONAL BUT RECOMMENDED: Subscribe Lambda to process notifications automatically
 resource "aws_sns_topic_subscription" "ses_notifications_lambda" {
+  count     = var.feedback_via_queue ? 0 : 1
   topic_arn = aws_sns_topic.ses_notifications.arn
   protocol  = "lambda"
   endpoint  = aws_lambda_function.ses_feedback_processor.arn
@@ -467,6 +708,7 @@ resource "aws_sns_topic_subscription" "ses_notifications_lambda" {
 
 # Permission for SNS to invoke the Lambda
 resource "aws_lambda_permission" "allow_sns" {
+  count         = var.feedback_via_queue ? 0 : 1
   statement_id  = "AllowExecutionFromSNS"
   action        = "lambda:InvokeFunction"
   function_name = aws_lambda_function.ses_feedback_processor.function_name
@@ -619,17 +861,9 @@ resource "aws_cloudwatch_metric_alarm" "high_complaint_rate" {
   alarm_actions       = [aws_sns_topic.ses_notifications.arn]
 }
 
-resource "aws_cloudwatch_log_metric_filter" "emails_analyzed" {
-  name           = "EmailsAnalyzed"
-  log_group_name = aws_cloudwatch_log_group.email_parser.name
-  pattern        = "[timestamp, request_id, level=INFO, msg=\"Email analyzed\", ...]"
+# Custom metrics are published by the Lambdas themselves as CloudWatch
+# Embedded Metric Format log lines (lambda_functions/shared/metrics.py)
 
-  metric_transformation {
-    name      = "EmailsAnalyzed"
-    namespace = "ScamVanguard"
-    value     = "1"
-  }
-}
 # Log Groups
 resource "aws_cloudwatch_log_group" "email_parser" {
   name              = "/aws/lambda/${aws_lambda_function.email_parser.function_name}"
@@ -647,8 +881,10 @@ resource "aws_cloudwatch_dashboard" "main" {
         properties = {
           metrics = [
             ["ScamVanguard", "EmailsReceived", { stat = "Sum" }],
+            [".", "EmailsQueued", { stat = "Sum" }],
             [".", "EmailsClassified", { stat = "Sum" }],
-            [".", "ClassificationErrors", { stat = "Sum" }]
+            [".", "ClassificationErrors", { stat = "Sum" }],
+            [".", "ParserErrors", { stat = "Sum" }]
           ]
           period = 300
           stat   = "Sum"
@@ -660,15 +896,66 @@ resource "aws_cloudwatch_dashboard" "main" {
         type = "metric"
         properties = {
           metrics = [
-            ["ScamVanguard", "Classification_SAFE", { stat = "Sum" }],
-            [".", "Classification_SCAM", { stat = "Sum" }],
-            [".", "Classification_UNSURE", { stat = "Sum" }]
+            ["ScamVanguard", "EmailsClassified", "Verdict", "SAFE", { stat = "Sum" }],
+            ["...", "SCAM", { stat = "Sum" }],
+            ["...", "UNSURE", { stat = "Sum" }]
           ]
           period = 300
           stat   = "Sum"
           region = var.aws_region
           title  = "Classification Results"
         }
+      },
+      {
+        type = "metric"
+        properties = {
+          metrics = [
+            ["ScamVanguard", "DynamoGateLatency", { stat = "p95" }],
+            [".", "S3FetchLatency", { stat = "p95" }],
+            [".", "MimeParseLatency", { stat = "p95" }],
+            [".", "ExtractionLatency", { stat = "p95" }],
+            [".", "SQSSendLatency", { stat = "p95" }],
+            [".", "QueueWaitLatency", { stat = "p95" }],
+            [".", "ClassificationLatency", { stat = "p95" }],
+            [".", "SESSendLatency", { stat = "p95" }]
+          ]
+          period = 300
+          region = var.aws_region
+          title  = "Stage Latency (p95, ms)"
+        }
+      },
+      {
+        type = "metric"
+        properties = {
+          metrics = [
+            ["ScamVanguard", "LLMLatency", "Tier", "gpt-5-nano", { stat = "p95" }],
+            ["...", "gpt-5-mini", { stat = "p95" }],
+            ["ScamVanguard", "LLMTokens", "Tier", "gpt-5-nano", { stat = "Sum", yAxis = "right" }],
+            ["...", "gpt-5-mini", { stat = "Sum", yAxis = "right" }]
+          ]
+          period = 300
+          region = var.aws_region
+          title  = "LLM Latency and Tokens by Tier"
+        }
+      },
+      {
+        type = "metric"
+        properties = {
+          metrics = [
+            ["ScamVanguard", "EndToEndLatency", { stat = "p50" }],
+            ["...", { stat = "p95" }],
+            ["...", { stat = "p99" }],
+            [".", "HopSesToParserLatency", { stat = "p95" }],
+            [".", "HopParserLatency", { stat = "p95" }],
+            [".", "HopQueueLatency", { stat = "p95" }],
+            [".", "HopClassificationLatency", { stat = "p95" }],
+            [".", "HopDeliveryLatency", { stat = "p95" }],
+            [".", "SlaBreaches", { stat = "Sum", yAxis = "right" }]
+          ]
+          period = 300
+          region = var.aws_region
+          title  = "End-to-End SLA (SES receipt to verdict, ms)"
+        }
       }
     ]
   })
@@ -690,6 +977,16 @@ output "processing_queue_url" {
   description = "URL of the SQS processing queue"
 }
 
+output "blocklist_s3_uri" {
+  value       = local.blocklist_s3_uri
+  description = "Publish tools/build_blocklist.py output here; Lambdas reload it automatically"
+}
+
+output "classify_api_url" {
+  value       = "${aws_apigatewayv2_api.classify.api_endpoint}/classify"
+  description = "POST raw or pasted emails here for a synchronous verdict"
+}
+
 output "scan_email_address" {
   value       = "scan@${var.domain_name}"
   description = "Email address users should forward suspicious emails to"
@@ -0,0 +1,15 @@
+"""
+pytest setup for the offline tests: puts the Lambda code, tools/ and these
+helpers on sys.path and sets the environment the Lambda modules read at
+import time (both done by local_aws), so test files import them directly.
+"""
+import importlib
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+importlib.import_module("local_aws")
+
+# Checks against a deployed stack (AWS credentials needed); run_all_tests.py runs them
+collect_ignore = ["test_bounce_handling.py", "test_config.py", "test_e2e.py", "test_rate_limiting.py",
+                  "test_ses_config.py"]
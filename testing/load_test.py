@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Offline load generator for the parser → SQS → classifier pipeline.
+
+Drives N emails/sec through email_parser.handler and classifier.handler
+using the stand-ins in local_aws.py, then reports throughput and
+p50/p95/p99 for every latency metric the handlers emit.
+
+    python testing/load_test.py --emails 500 --rate 50 --classifier-workers 8
+
+All workers share one process, so module-level state (caches, the quota
+governor, cold-start flags) behaves like a single very busy container
+rather than many Lambda instances.
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from local_aws import LocalStack
+
+# (original sender, subject, body) - a mix that exercises the parser's fast
+# path, the cheap classifier stages and the LLM
+CORPUS = [
+    ("service@paypal.com", "Your receipt", "You sent $25.00 USD to Jane Doe. Card ending in 3054."),
+    ("paypalsecurity2024@gmail.com", "Account notice", "PayPal Security Team: verify your account now."),
+    ("billing@unknown-vendor.biz", "Invoice overdue", "Please pay the attached invoice by Friday."),
+    ("alerts@secure-bank-login.top", "URGENT", "Your account is suspended. Verify your account or it will be "
+                                               "closed. Click here to confirm your identity and password."),
+    ("friend@gmail.com", "Lunch", "Are we still on for lunch tomorrow?"),
+]
+
+
+def forwarded_email(forwarder, sender, subject, body):
+    return (
+        f"From: {forwarder}\nTo: scan@scamvanguard.com\nSubject: Fwd: {subject}\n\n"
+        f"---------- Forwarded message ---------\n"
+        f"From: {sender}\nSubject: {subject}\n\n{body}\n"
+    ).encode("utf-8")
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def latency_samples(sink):
+    """Millisecond metric values from the captured EMF records, keyed service.metric."""
+    samples = {}
+    for record in sink.records:
+        for directive in record["_aws"]["CloudWatchMetrics"]:
+            for metric in directive["Metrics"]:
+                if metric["Unit"] != "Milliseconds":
+                    continue
+                service = record.get("Service")
+                name = f"{service}.{metric['Name']}" if service else metric["Name"]
+                samples.setdefault(name, []).append(record[metric["Name"]])
+    return samples
+
+
+def run_load(emails=100, rate=20.0, parser_workers=4, classifier_workers=4, llm_latency=None):
+    """Offer `emails` at `rate` per second and wait for every verdict; returns a report dict."""
+    stack = LocalStack(llm_latency).install()
+    finished = threading.Event()
+
+    def classifier_worker():
+        while not (finished.is_set() and len(stack.sqs) == 0):
+            record = stack.sqs.receive()
+            if record is None:
+                time.sleep(0.005)
+                continue
+            stack.classifier.handler({"Records": [record]}, None)
+
+    consumers = [threading.Thread(target=classifier_worker, daemon=True) for _ in range(classifier_workers)]
+    for consumer in consumers:
+        consumer.start()
+
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=parser_workers) as pool:
+            for i in range(emails):
+                # Open-loop arrivals: fall behind rather than slow the offered rate
+                delay = started + i / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                sender, subject, body = CORPUS[i % len(CORPUS)]
+                # One forwarder per email keeps the parser's rate limit out of the way
+                forwarder = f"loadtest{i}@example.com"
+                pool.submit(stack.deliver, forwarded_email(forwarder, sender, subject, body), forwarder)
+        finished.set()
+        for consumer in consumers:
+            consumer.join()
+    finally:
+        stack.uninstall()
+
+    elapsed = time.perf_counter() - started
+    samples = latency_samples(stack.metrics)
+    return {
+        "emails": emails,
+        "offered_rate": rate,
+        "elapsed_s": round(elapsed, 2),
+        "verdicts_sent": len(stack.ses.sent),
+        "throughput": round(len(stack.ses.sent) / elapsed, 2) if elapsed else 0.0,
+        "llm_calls": len(stack.openai.calls),
+        "stages": {
+            name: {
+                "count": len(values),
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "p99": percentile(values, 99),
+            }
+            for name, values in sorted(samples.items())
+        },
+    }
+
+
+def print_report(report):
+    print(f"\n{'='*78}")
+    print(f"Offered {report['emails']} emails at {report['offered_rate']}/s in {report['elapsed_s']}s")
+    print(f"Verdicts sent: {report['verdicts_sent']}  Throughput: {report['throughput']} emails/s  "
+          f"LLM calls: {report['llm_calls']}")
+    print(f"{'='*78}")
+    print(f"{'stage':<48}{'n':>6}{'p50':>8}{'p95':>8}{'p99':>8}  (ms)")
+    for name, stats in report["stages"].items():
+        print(f"{name:<48}{stats['count']:>6}{stats['p50']:>8.0f}{stats['p95']:>8.0f}{stats['p99']:>8.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test of the ScamVanguard pipeline")
+    parser.add_argument("--emails", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=20.0, help="emails offered per second")
+    parser.add_argument("--parser-workers", type=int, default=4)
+    parser.add_argument("--classifier-workers", type=int, default=4)
+    parser.add_argument("--nano-latency", type=float, default=0.3, help="fake gpt-5-nano latency (s)")
+    parser.add_argument("--mini-latency", type=float, default=1.0, help="fake gpt-5-mini latency (s)")
+    args = parser.parse_args()
+
+    print_report(run_load(
+        emails=args.emails,
+        rate=args.rate,
+        parser_workers=args.parser_workers,
+        classifier_workers=args.classifier_workers,
+        llm_latency={"gpt-5-nano": args.nano_latency, "gpt-5-mini": args.mini_latency},
+    ))
+
+
+if __name__ == "__main__":
+    main()
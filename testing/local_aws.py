@@ -0,0 +1,367 @@
+"""
+In-process stand-ins for the AWS services and OpenAI API used by the
+Lambdas, so the whole pipeline can run offline:
+
+    stack = LocalStack(llm_latency={"gpt-5-nano": 0.3, "gpt-5-mini": 1.0})
+    stack.install()                      # patches email_parser + classifier
+    stack.deliver(raw_email_bytes, "user@example.com")
+    stack.drain()                        # runs classifier.handler over the queue
+    stack.ses.sent                       # verdict emails
+
+Only the calls the Lambdas actually make are emulated. Every EMF record the
+handlers emit is captured in stack.metrics (a shared.metrics.MemorySink).
+"""
+import io
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from botocore.exceptions import ClientError
+
+# Each Lambda imports its siblings and shared/ by bare name, as laid out in its image
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+LAMBDA_DIR = os.path.join(ROOT, 'lambda_functions')
+for path in [os.path.join(ROOT, 'tools'), LAMBDA_DIR] + [
+        os.path.join(LAMBDA_DIR, name) for name in ('ses_feedback_processor', 'forward_contact', 'classify_api',
+                                                     'email_parser', 'classifier')]:
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+BUCKET = "local-email-attachments"
+QUEUE_URL = "https://sqs.local/ScamVanguardProcessingQueue"
+SECRET_NAME = "ScamVanguard/OpenAI/APIKey"
+
+# Lambda modules read these at import time
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("ATTACHMENT_BUCKET", BUCKET)
+os.environ.setdefault("PROCESSING_QUEUE_URL", QUEUE_URL)
+os.environ.setdefault("OPENAI_SECRET_NAME", SECRET_NAME)
+os.environ.setdefault("SUPPRESSION_TABLE", "ScamVanguardEmailSuppression")
+os.environ.setdefault("FORWARD_EMAIL", "owner@example.com")
+# The defaults of var.openai_quota_limits and var.api_quota_limits in variables.tf
+os.environ.setdefault("OPENAI_QUOTA_LIMITS", json.dumps({
+    "gpt-5-mini": {"rpm": 500, "tpm": 200000, "daily_tokens": 2000000},
+    "gpt-5-nano": {"rpm": 500, "tpm": 200000, "daily_tokens": 4000000},
+}))
+os.environ.setdefault("API_QUOTA_LIMITS", json.dumps({
+    "gpt-5-mini": {"rpm": 100, "tpm": 40000, "daily_tokens": 400000},
+    "gpt-5-nano": {"rpm": 100, "tpm": 40000, "daily_tokens": 800000},
+}))
+
+
+def client_error(code, message, operation):
+    return ClientError({"Error": {"Code": code, "Message": message}}, operation)
+
+
+class LocalS3:
+    def __init__(self):
+        self.objects = {}
+        self.lock = threading.Lock()
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        with self.lock:
+            self.objects[(Bucket, Key)] = Body if isinstance(Body, bytes) else Body.encode("utf-8")
+        return {"ETag": uuid.uuid4().hex}
+
+    def get_object(self, Bucket, Key):
+        with self.lock:
+            if (Bucket, Key) not in self.objects:
+                raise client_error("NoSuchKey", "The specified key does not exist.", "GetObject")
+            body = self.objects[(Bucket, Key)]
+        return {"Body": io.BytesIO(body), "ContentLength": len(body)}
+
+
+class LocalSQS:
+    """A single FIFO-ish queue honouring DelaySeconds and the 256KB message limit."""
+
+    MAX_MESSAGE_BYTES = 262_144
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.messages = []
+        self.lock = threading.Lock()
+
+    def send_message(self, QueueUrl, MessageBody, DelaySeconds=0, **kwargs):
+        if len(MessageBody.encode("utf-8")) > self.MAX_MESSAGE_BYTES:
+            raise client_error("InvalidParameterValue",
+                               f"Message must be shorter than {self.MAX_MESSAGE_BYTES} bytes.", "SendMessage")
+        message_id = str(uuid.uuid4())
+        now = self.clock()
+        with self.lock:
+            self.messages.append({
+                "messageId": message_id,
+                "body": MessageBody,
+                "attributes": {"SentTimestamp": str(int(now * 1000))},
+                "visible_at": now + DelaySeconds,
+            })
+        return {"MessageId": message_id}
+
+    def receive(self, ignore_delay=False):
+        """Pop the next visible message as an SQS event record, or None."""
+        now = self.clock()
+        with self.lock:
+            for i, message in enumerate(self.messages):
+                if ignore_delay or message["visible_at"] <= now:
+                    message = self.messages.pop(i)
+                    return {k: v for k, v in message.items() if k != "visible_at"}
+        return None
+
+    def __len__(self):
+        return len(self.messages)
+
+
+class LocalTable:
+    """
+    DynamoDB table keyed on `email` with TTL on the `ttl` attribute. Expired
+    items are dropped on read (real DynamoDB deletes them lazily, but the
+    Lambdas treat an expired entry as gone either way).
+    """
+
+    def __init__(self, clock=time.time, name="ScamVanguardEmailSuppression"):
+        self.clock = clock
+        self.name = name
+        self.items = {}
+        self.lock = threading.Lock()
+        # table.meta.client.batch_write_item(...) lands here too
+        self.meta = SimpleNamespace(client=self)
+        self.batch_calls = 0
+        self.get_calls = 0
+        self.get_keys = []
+        # Leave the last put of each of the next N batch calls unprocessed
+        self.unprocessed_batches = 0
+
+    def _live(self, key):
+        item = self.items.get(key)
+        if item is not None and "ttl" in item and int(item["ttl"]) <= self.clock():
+            del self.items[key]
+            return None
+        return item
+
+    def get_item(self, Key, **kwargs):
+        with self.lock:
+            self.get_calls += 1
+            self.get_keys.append(Key["email"])
+            item = self._live(Key["email"])
+        return {"Item": dict(item)} if item is not None else {}
+
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeNames=None,
+                 ExpressionAttributeValues=None, **kwargs):
+        """Supports the `attribute_not_exists(email) OR #a < :x` condition the Lambdas use."""
+        names = ExpressionAttributeNames or {}
+        values = ExpressionAttributeValues or {}
+        with self.lock:
+            current = self._live(Item["email"])
+            if ConditionExpression and current is not None:
+                match = re.search(r"(#\w+)\s*<\s*(:\w+)", ConditionExpression)
+                attribute = names.get(match.group(1), match.group(1)) if match else None
+                if not match or attribute not in current or not current[attribute] < values[match.group(2)]:
+                    raise client_error("ConditionalCheckFailedException", "The conditional request failed", "PutItem")
+            self.items[Item["email"]] = dict(Item)
+        return {}
+
+    def delete_item(self, Key, **kwargs):
+        with self.lock:
+            self.items.pop(Key["email"], None)
+        return {}
+
+    def batch_write_item(self, RequestItems, **kwargs):
+        requests = list(RequestItems[self.name])
+        assert len(requests) <= 25, "BatchWriteItem takes at most 25 requests"
+        unprocessed = []
+        with self.lock:
+            self.batch_calls += 1
+            if self.unprocessed_batches and requests:
+                self.unprocessed_batches -= 1
+                unprocessed = [requests.pop()]
+            for request in requests:
+                item = request["PutRequest"]["Item"]
+                self.items[item["email"]] = dict(item)
+        return {"UnprocessedItems": {self.name: unprocessed} if unprocessed else {}}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ConditionExpression=None, ReturnValues=None, **kwargs):
+        """
+        Supports the `ADD #a :x SET #b = :y, #c = if_not_exists(#c, :z)` updates
+        (numbers and sets) and `#a <= :max` conditions the Lambdas use.
+        """
+        names = ExpressionAttributeNames or {}
+        values = ExpressionAttributeValues or {}
+        resolve = lambda token: names.get(token, token)
+
+        with self.lock:
+            item = dict(self._live(Key["email"]) or {"email": Key["email"]})
+
+            if ConditionExpression:
+                match = re.search(r"(#\w+)\s*<=\s*(:\w+)", ConditionExpression)
+                attribute = resolve(match.group(1)) if match else None
+                if match and attribute in item and item[attribute] > values[match.group(2)]:
+                    raise client_error("ConditionalCheckFailedException", "The conditional request failed", "UpdateItem")
+
+            updated = {}
+            for action, body in re.findall(r"(ADD|SET)\s+(.*?)(?=\s+(?:ADD|SET)\s+|$)", UpdateExpression):
+                for clause in re.split(r",(?![^()]*\))", body):
+                    if action == "ADD":
+                        attribute, value = clause.split()
+                        attribute = resolve(attribute)
+                        if isinstance(values[value], set):  # ADD to a string/number set
+                            item[attribute] = item.get(attribute, set()) | values[value]
+                        else:
+                            item[attribute] = item.get(attribute, 0) + values[value]
+                    else:
+                        attribute, value = [part.strip() for part in clause.split("=", 1)]
+                        attribute = resolve(attribute)
+                        default = re.fullmatch(r"if_not_exists\(\s*(#\w+)\s*,\s*(:\w+)\s*\)", value)
+                        if default:
+                            item[attribute] = item.get(resolve(default.group(1)), values[default.group(2)])
+                        else:
+                            item[attribute] = values[value]
+                    updated[attribute] = item[attribute]
+
+            self.items[Key["email"]] = item
+        return {"Attributes": updated if ReturnValues == "UPDATED_NEW" else item}
+
+
+class LocalSES:
+    def __init__(self):
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def _record(self, **message):
+        message_id = f"local-{uuid.uuid4().hex}"
+        with self.lock:
+            self.sent.append({"MessageId": message_id, "sent_at": time.time(), **message})
+        return {"MessageId": message_id}
+
+    def send_email(self, **kwargs):
+        return self._record(**kwargs)
+
+    def send_raw_email(self, **kwargs):
+        return self._record(**kwargs)
+
+
+class LocalSecrets:
+    def __init__(self, secrets=None):
+        self.secrets = secrets or {SECRET_NAME: json.dumps({"api_key": "sk-local"})}
+
+    def get_secret_value(self, SecretId):
+        if SecretId not in self.secrets:
+            raise client_error("ResourceNotFoundException", "Secrets Manager can't find the specified secret.",
+                               "GetSecretValue")
+        return {"SecretString": self.secrets[SecretId]}
+
+
+SCAM_HINTS = re.compile(r"verify your account|suspend|password|gift card|wire transfer|bitcoin|won|prize|urgent",
+                        re.IGNORECASE)
+
+
+class LocalOpenAI:
+    """
+    Fake OpenAI client for `client.responses.parse(...)`. Answers with a
+    keyword heuristic after sleeping the configured per-model latency
+    (seconds). Construct once and pass `factory` wherever the code builds
+    an OpenAI(api_key=...) client.
+    """
+
+    def __init__(self, latency=None, confidence=None):
+        self.latency = latency or {"gpt-5-nano": 0.3, "gpt-5-mini": 1.0}
+        self.confidence = confidence or {"gpt-5-nano": 0.9, "gpt-5-mini": 0.95}
+        self.calls = []
+        self.lock = threading.Lock()
+        self.responses = SimpleNamespace(parse=self.parse)
+
+    def factory(self, api_key=None, **kwargs):
+        return self
+
+    def parse(self, model, input, text_format):
+        prompt = "\n".join(part["content"] for part in input)
+        time.sleep(self.latency.get(model, 0))
+        is_scam = bool(SCAM_HINTS.search(input[-1]["content"]))
+        parsed = text_format(
+            label="SCAM" if is_scam else "SAFE",
+            reason="Local stand-in verdict",
+            detailed_reason="Produced by the offline OpenAI stand-in.",
+            confidence=self.confidence.get(model, 0.9),
+        )
+        tokens = len(prompt) // 4 + 100
+        with self.lock:
+            self.calls.append({"model": model, "tokens": tokens})
+        return SimpleNamespace(
+            output_parsed=parsed,
+            usage=SimpleNamespace(input_tokens=tokens - 100, output_tokens=100, total_tokens=tokens)
+        )
+
+
+class LocalStack:
+    """Wires the stand-ins into email_parser and classifier and drives them."""
+
+    def __init__(self, llm_latency=None, clock=time.time):
+        from shared.metrics import MemorySink
+
+        self.s3 = LocalS3()
+        self.sqs = LocalSQS(clock)
+        self.table = LocalTable(clock)
+        self.ses = LocalSES()
+        self.secrets = LocalSecrets()
+        self.openai = LocalOpenAI(llm_latency)
+        self.metrics = MemorySink()
+
+    def install(self):
+        """Point both Lambdas' module-level clients at the stand-ins."""
+        import logging
+        import email_parser
+        import classifier
+        from quota import QuotaGovernor, DynamoCounterStore
+        from reputation import ReputationStore
+        from shared import metrics
+        from shared.suppression import suppression_cache
+
+        suppression_cache.clear()  # answers cached from another table
+        for module in (email_parser, classifier):
+            module.s3 = self.s3
+            module.sqs = self.sqs
+            module.ses = self.ses
+            module.suppression_table = self.table
+        classifier.secrets = self.secrets
+        classifier.OpenAI = self.openai.factory
+        classifier.quota_governor = QuotaGovernor(DynamoCounterStore(self.table))
+        classifier.reputation_store = ReputationStore(self.table, clock=self.table.clock)
+        metrics.set_sink(self.metrics)
+
+        # The handlers log full events and emails at INFO
+        logging.getLogger().setLevel(logging.WARNING)
+        self.parser, self.classifier = email_parser, classifier
+        self.bucket = email_parser.BUCKET
+        return self
+
+    def uninstall(self):
+        from shared import metrics
+        metrics.set_sink(None)
+
+    def deliver(self, raw_email, source, message_id=None):
+        """Store the email like SES does and invoke email_parser with the SES event."""
+        message_id = message_id or uuid.uuid4().hex
+        self.s3.put_object(Bucket=self.bucket, Key=f"emails/{message_id}", Body=raw_email)
+        timestamp = datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+        event = {"Records": [{"eventSource": "aws:ses", "ses": {"mail": {
+            "messageId": message_id,
+            "source": source,
+            "timestamp": timestamp,
+            "destination": ["scan@scamvanguard.com"],
+        }}}]}
+        return self.parser.handler(event, None)
+
+    def drain(self, ignore_delay=False):
+        """Run classifier.handler over queued jobs one at a time; returns how many ran."""
+        handled = 0
+        while True:
+            record = self.sqs.receive(ignore_delay)
+            if record is None:
+                return handled
+            self.classifier.handler({"Records": [record]}, None)
+            handled += 1
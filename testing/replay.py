@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Labeled replay corpus → accuracy-versus-latency scoreboard.
+
+Runs every .eml under a corpus directory through the parser's extraction,
+its deterministic rules and classifier.classify(), once per tier
+configuration, with OpenAI answered from a recordings file. Labels come
+from the directory layout:
+
+    corpus/
+      SAFE/*.eml
+      SCAM/*.eml
+
+    python testing/replay.py corpus/                       # replay (offline)
+    python testing/replay.py corpus/ --record              # call OpenAI and save answers
+    python testing/replay.py corpus/ --configs production,mini-only --details out.jsonl
+
+Files are what users forward to scan@. Pass --originals for a corpus of raw
+scam/ham emails; they are wrapped in a Gmail-style forward first.
+
+Latency per email is the measured local time plus the recorded model
+latency (recordings are replayed instantly). LLM calls that were never
+recorded fall back to the keyword stand-in from local_aws.py and are
+counted as "unrecorded" so they can't silently skew the scoreboard.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from email import policy
+from email.parser import BytesParser
+from types import SimpleNamespace
+
+from local_aws import LocalOpenAI  # also sets up sys.path and the env the Lambda modules need
+
+import email_parser
+import classifier
+from pipeline import DecisionPipeline
+from quota import QuotaGovernor, LocalCounterStore
+from shared import metrics
+from shared.canonical import canonical_fields
+from shared.domain_rules import deterministic_verdict
+from shared.metrics import MemorySink
+
+LABELS = ["SAFE", "SCAM"]
+PREDICTIONS = ["SAFE", "SCAM", "UNSURE"]
+FORWARDING_USER = "replay@example.com"
+
+# Captured at import so every configuration starts from the production stages
+PRODUCTION_PIPELINE = classifier.DECISION_PIPELINE
+
+# name -> parser fast path on/off, classifier stages (None = all), model cascade, escalation threshold
+TIER_CONFIGS = {
+    "production": {"parser_rules": True, "stages": None, "tiers": ["gpt-5-nano", "gpt-5-mini"], "threshold": 0.8},
+    "nano-only": {"parser_rules": True, "stages": None, "tiers": ["gpt-5-nano"], "threshold": 0.8},
+    "mini-only": {"parser_rules": True, "stages": None, "tiers": ["gpt-5-mini"], "threshold": 0.8},
+    "llm-only": {"parser_rules": False, "stages": ["llm"], "tiers": ["gpt-5-nano", "gpt-5-mini"], "threshold": 0.8},
+}
+
+
+class RecordedOpenAI:
+    """
+    Stands in for the OpenAI client. Answers are keyed by model + prompt;
+    with a live client (--record) misses are fetched and stored.
+    """
+
+    def __init__(self, path, live_client=None):
+        self.path = path
+        self.live_client = live_client
+        self.recordings = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.recordings = json.load(f)
+        self.fallback = LocalOpenAI(latency={"gpt-5-nano": 0, "gpt-5-mini": 0})
+        self.responses = SimpleNamespace(parse=self.parse)
+        self.llm_ms = 0.0
+        self.unrecorded = 0
+
+    def factory(self, api_key=None, **kwargs):
+        return self
+
+    @staticmethod
+    def key(model, input):
+        prompt = json.dumps([model] + [part["content"] for part in input])
+        return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+    def parse(self, model, input, text_format):
+        key = self.key(model, input)
+
+        if key not in self.recordings and self.live_client is not None:
+            started = time.perf_counter()
+            response = self.live_client.responses.parse(model=model, input=input, text_format=text_format)
+            usage = getattr(response, "usage", None)
+            self.recordings[key] = {
+                "model": model,
+                "parsed": response.output_parsed.model_dump(),
+                "total_tokens": getattr(usage, "total_tokens", 0) if usage else 0,
+                "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+            }
+
+        if key not in self.recordings:
+            self.unrecorded += 1
+            return self.fallback.parse(model, input, text_format)
+
+        recording = self.recordings[key]
+        self.llm_ms += recording["latency_ms"]
+        return SimpleNamespace(
+            output_parsed=text_format(**recording["parsed"]),
+            usage=SimpleNamespace(total_tokens=recording["total_tokens"])
+        )
+
+    def save(self):
+        with open(self.path, "w") as f:
+            json.dump(self.recordings, f, indent=1, sort_keys=True)
+
+
+def wrap_original(raw_email):
+    """Turn a raw original email into what a user forwarding it would send us."""
+    msg = BytesParser(policy=policy.default).parsebytes(raw_email)
+    body_part = msg.get_body(preferencelist=("plain", "html"))
+    body = body_part.get_content() if body_part else ""
+    return (
+        f"From: {FORWARDING_USER}\nTo: scan@scamvanguard.com\nSubject: Fwd: {msg.get('Subject', '')}\n\n"
+        f"---------- Forwarded message ---------\n"
+        f"From: {msg.get('From', '')}\nSubject: {msg.get('Subject', '')}\n\n{body}\n"
+    ).encode("utf-8")
+
+
+def load_corpus(directory, originals=False):
+    """[(path, label, raw_bytes)] for every .eml under directory/<LABEL>/."""
+    corpus = []
+    for label in LABELS:
+        folder = os.path.join(directory, label)
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            if name.endswith(".eml"):
+                with open(os.path.join(folder, name), "rb") as f:
+                    raw = f.read()
+                corpus.append((os.path.join(label, name), label, wrap_original(raw) if originals else raw))
+    return corpus
+
+
+# classifier module attributes a configuration overrides (restored after scoring)
+PATCHED = ["MODEL_TIERS", "CASCADE_CONFIDENCE_THRESHOLD", "quota_governor", "OpenAI", "_openai_key_cache",
+           "DECISION_PIPELINE"]
+
+
+def configure(config, llm):
+    """Point the classifier at one tier configuration with fresh counters."""
+    classifier.MODEL_TIERS = config["tiers"]
+    classifier.CASCADE_CONFIDENCE_THRESHOLD = config["threshold"]
+    classifier.TIER_STATS.clear()
+    classifier.quota_governor = QuotaGovernor(LocalCounterStore())
+    classifier.OpenAI = llm.factory
+    classifier._openai_key_cache = "replay"
+    stages = [s for s in PRODUCTION_PIPELINE.stages if config["stages"] is None or s.name in config["stages"]]
+    classifier.DECISION_PIPELINE = DecisionPipeline(stages)
+
+
+def replay_one(raw_email, config, llm):
+    """Classify one email the way production would. Returns (result, latency_ms)."""
+    llm_ms_before = llm.llm_ms
+    started = time.perf_counter()
+
+    fields = email_parser.extract_email_fields(raw_email, FORWARDING_USER)
+    job = {**fields, "forwarding_user": FORWARDING_USER}
+    result = None
+    if config["parser_rules"]:
+        result = deterministic_verdict(job["sender"], job["text"], job.get("attachments", ""),
+                                       job.get("attachment_manifest"), job.get("links"),
+                                       job.get("authentication"), canonical_fields(job)[1])
+    if result is None:
+        email_parser.fit_job(job)  # What the queue would have carried
+        result = classifier.classify(job)
+
+    local_ms = (time.perf_counter() - started) * 1000
+    return result, local_ms + (llm.llm_ms - llm_ms_before)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))] if ordered else 0.0
+
+
+def score(corpus, config_name, llm, details=None):
+    """Replay the corpus under one configuration and build its scoreboard row."""
+    config = TIER_CONFIGS[config_name]
+    saved = {name: getattr(classifier, name) for name in PATCHED}
+    configure(config, llm)
+    try:
+        return _score(corpus, config_name, config, llm, details)
+    finally:
+        for name, value in saved.items():
+            setattr(classifier, name, value)
+
+
+def _score(corpus, config_name, config, llm, details):
+    unrecorded_before = llm.unrecorded
+
+    confusion = {label: {prediction: 0 for prediction in PREDICTIONS} for label in LABELS}
+    latencies, llm_emails, stages = [], 0, {}
+    for path, label, raw in corpus:
+        result, latency_ms = replay_one(raw, config, llm)
+        prediction = result["label"]
+        stage = result.get("stage", "error")
+        confusion[label][prediction] += 1
+        latencies.append(latency_ms)
+        stages[stage] = stages.get(stage, 0) + 1
+        llm_emails += int(stage == "llm")
+        if details is not None:
+            details.write(json.dumps({
+                "config": config_name, "file": path, "label": label, "prediction": prediction,
+                "stage": stage, "tier": result.get("tier"), "latency_ms": round(latency_ms, 1)
+            }) + "\n")
+
+    total = len(corpus) or 1
+    correct = sum(confusion[label][label] for label in LABELS)
+    return {
+        "config": config_name,
+        "emails": len(corpus),
+        "accuracy": round(correct / total, 3),
+        "unsure_rate": round(sum(confusion[label]["UNSURE"] for label in LABELS) / total, 3),
+        "confusion": confusion,
+        "latency_ms": {"p50": round(percentile(latencies, 50), 1), "p95": round(percentile(latencies, 95), 1),
+                       "mean": round(sum(latencies) / total, 1)},
+        "llm_call_rate": round(llm_emails / total, 3),
+        "decided_by": stages,
+        "tiers": {tier: {"calls": s["calls"], "escalations": s["escalations"], "tokens": s["tokens"]}
+                  for tier, s in classifier.TIER_STATS.items()},
+        "unrecorded_llm_calls": llm.unrecorded - unrecorded_before,
+    }
+
+
+def print_scoreboard(rows):
+    print(f"\n{'config':<14}{'acc':>7}{'unsure':>8}{'p50 ms':>9}{'p95 ms':>9}{'LLM rate':>10}  tokens by tier")
+    for row in rows:
+        tokens = ", ".join(f"{tier}={s['tokens']} ({s['calls']} calls)" for tier, s in row["tiers"].items()) or "-"
+        print(f"{row['config']:<14}{row['accuracy']:>7.3f}{row['unsure_rate']:>8.3f}{row['latency_ms']['p50']:>9.1f}"
+              f"{row['latency_ms']['p95']:>9.1f}{row['llm_call_rate']:>10.3f}  {tokens}")
+        for label in LABELS:
+            cells = "  ".join(f"{p}={row['confusion'][label][p]}" for p in PREDICTIONS)
+            print(f"{'':<14}truth {label:<5} → {cells}")
+        if row["unrecorded_llm_calls"]:
+            print(f"{'':<14}⚠️  {row['unrecorded_llm_calls']} LLM calls had no recording (keyword stand-in used)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a labeled .eml corpus through the classifier")
+    parser.add_argument("corpus", help="directory containing SAFE/ and SCAM/ subdirectories of .eml files")
+    parser.add_argument("--recordings", help="LLM recordings file (default: <corpus>/llm_recordings.json)")
+    parser.add_argument("--record", action="store_true", help="call OpenAI for unrecorded prompts and save them")
+    parser.add_argument("--configs", default=",".join(TIER_CONFIGS), help="comma-separated tier configurations")
+    parser.add_argument("--originals", action="store_true", help="corpus holds raw originals, not forwards")
+    parser.add_argument("--details", help="write per-email results as JSONL to this path")
+    parser.add_argument("--json", action="store_true", help="print the scoreboard as JSON")
+    args = parser.parse_args()
+
+    live_client = None
+    if args.record:
+        from openai import OpenAI
+        live_client = OpenAI()  # OPENAI_API_KEY from the environment
+    llm = RecordedOpenAI(args.recordings or os.path.join(args.corpus, "llm_recordings.json"), live_client)
+
+    import logging
+    logging.getLogger().setLevel(logging.WARNING)
+    metrics.set_sink(MemorySink())  # keep EMF lines out of the report
+
+    corpus = load_corpus(args.corpus, args.originals)
+    if not corpus:
+        sys.exit(f"No .eml files under {args.corpus}/SAFE or {args.corpus}/SCAM")
+
+    details = open(args.details, "w") if args.details else None
+    try:
+        rows = [score(corpus, name.strip(), llm, details) for name in args.configs.split(",")]
+    finally:
+        if details:
+            details.close()
+        if args.record:
+            llm.save()
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print_scoreboard(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import hashlib
+import io
+import os
+import zipfile
+from email import policy
+from email.message import EmailMessage
+from email.parser import BytesParser
+
+from shared import attachments
+from shared.domain_rules import deterministic_verdict
+
+PAYLOAD = b"MZ" + os.urandom(200_000)
+
+def zipped(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in files.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+def email_with_attachments(sender="Amazon <orders@amazon.com>"):
+    msg = EmailMessage()
+    msg["From"] = sender
+    msg["To"] = "user@example.com"
+    msg["Subject"] = "Your invoice"
+    msg.set_content("Please find your invoice attached.\n")
+    msg.add_attachment(PAYLOAD, maintype="application", subtype="pdf", filename="invoice.pdf")
+    msg.add_attachment("Totals\n" + "x" * 5000 + "\n", subtype="csv", filename="totals.csv", cte="quoted-printable")
+    msg.add_attachment(zipped({"readme.txt": b"hello", "inner.zip": zipped({"setup.exe": PAYLOAD})}),
+                       maintype="application", subtype="zip", filename="docs.zip")
+    return msg.as_bytes(policy=policy.SMTP)
+
+def test_manifest_streams_hashes_and_lists_archives():
+    """Hashes match the decoded payloads, types are sniffed and archives listed"""
+    raw = email_with_attachments()
+    msg = BytesParser(policy=policy.default).parsebytes(raw)
+    chunk_chars = attachments.CHUNK_CHARS
+    attachments.CHUNK_CHARS = 1000  # exercise the base64 carry across many chunks
+    try:
+        manifest = attachments.build_manifest(msg)
+    finally:
+        attachments.CHUNK_CHARS = chunk_chars
+
+    expected = {part.get_filename(): hashlib.sha256(part.get_payload(decode=True)).hexdigest()
+                for part in msg.iter_attachments()}
+    assert {e["filename"]: e["sha256"] for e in manifest} == expected
+
+    invoice, totals, docs = manifest
+    assert invoice["declared_type"] == "application/pdf"
+    assert invoice["sniffed_type"] == "application/x-msdownload"  # an executable posing as a PDF
+    assert invoice["size"] == len(PAYLOAD)
+    assert totals["declared_type"] == "text/csv"
+
+    assert docs["sniffed_type"] == "application/zip"
+    members = {m["filename"]: m for m in docs["members"]}
+    assert members["readme.txt"]["sha256"] == hashlib.sha256(b"hello").hexdigest()
+    inner = members["inner.zip"]["members"][0]
+    assert inner["filename"] == "setup.exe" and inner["sha256"] == hashlib.sha256(PAYLOAD).hexdigest()
+
+    assert attachments.attachment_names(manifest).splitlines() == [
+        "invoice.pdf", "totals.csv", "docs.zip", "readme.txt", "inner.zip", "setup.exe"]
+    print("✅ Attachment manifest with streamed hashes and nested archives")
+
+def test_known_bad_hash_beats_known_sender():
+    """A known-bad hash anywhere in the manifest is SCAM, even from a recognised domain"""
+    import email_parser
+    import classifier
+
+    assert "275a021bbfb6489e54d471899f7db9d1663fc695ec2fe2a2c4538aabf651fd0f" in attachments.load_hash_set()
+
+    fields = email_parser.extract_email_fields(email_with_attachments(), "user@example.com", forwarded=False)
+    known_bad = attachments.KNOWN_BAD_HASHES
+    attachments.KNOWN_BAD_HASHES = frozenset([hashlib.sha256(PAYLOAD).hexdigest()])
+    try:
+        verdict = deterministic_verdict(fields["sender"], fields["text"], fields["attachments"],
+                                        fields["attachment_manifest"])
+        assert verdict["label"] == "SCAM" and verdict["stage"] == "attachment_hashes"
+        assert classifier.DECISION_PIPELINE.run(classifier.MessageFeatures(fields))["stage"] == "attachment_hashes"
+    finally:
+        attachments.KNOWN_BAD_HASHES = known_bad
+
+    # Without a hash match, the zipped executable still blocks the known-company SAFE exit
+    assert deterministic_verdict(fields["sender"], fields["text"], fields["attachments"],
+                                 fields["attachment_manifest"]) is None
+    print("✅ Known-bad hashes answer SCAM before the domain index")
@@ -0,0 +1,138 @@
+from email import policy
+from email.message import EmailMessage
+
+from shared.authentication import extract_authentication, headers_from_text, alignment
+from shared.domain_rules import deterministic_verdict
+
+GMAIL = ("mx.google.com; dkim=pass header.i=@paypal.com header.s=pp-dkim1 header.b=abc;"
+         " spf=pass (google.com: domain of service@paypal.com designates 1.2.3.4 as permitted sender)"
+         " smtp.mailfrom=service@paypal.com; dmarc=pass (p=REJECT sp=REJECT dis=NONE) header.from=paypal.com")
+OUTLOOK_FAIL = ("spf=fail (sender IP is 203.0.113.9) smtp.mailfrom=paypal.com; dkim=none (message not signed)"
+                " header.d=none;dmarc=fail action=oreject header.from=paypal.com;compauth=fail reason=000")
+
+def original(results, sender="PayPal <service@paypal.com>"):
+    msg = EmailMessage()
+    msg["Authentication-Results"] = results
+    msg["Authentication-Results"] = "attacker.example; dmarc=pass header.from=paypal.com"  # forged, below
+    msg["DKIM-Signature"] = "v=1; a=rsa-sha256; d=paypal.com; s=pp-dkim1; h=from:to; bh=x; b=y"
+    msg["From"] = sender
+    msg["To"] = "user@example.com"
+    msg["Subject"] = "Your account has been limited"
+    msg.set_content("We noticed unusual activity. Review your account today.\n")
+    return msg
+
+def test_results_are_parsed_and_aligned():
+    """Gmail and Outlook formats, Received-SPF fallback, topmost header only"""
+    auth = extract_authentication(original(GMAIL).items(), "headers")
+    assert auth["authserv_id"] == "mx.google.com"
+    assert auth["spf"] == "pass" and auth["spf_domain"] == "paypal.com"
+    assert auth["dkim"] == [{"result": "pass", "domain": "paypal.com"}]
+    assert auth["dmarc"] == "pass" and auth["header_from"] == "paypal.com"
+    assert auth["signing_domains"] == ["paypal.com"]
+    assert alignment(auth, "paypal.com") == "pass"
+    assert alignment(auth, "paypa1.com") is None  # results for some other From: domain
+
+    auth = extract_authentication(original(OUTLOOK_FAIL).items(), "headers")
+    assert auth["authserv_id"] is None and auth["dmarc"] == "fail"
+    assert alignment(auth, "paypal.com") == "fail"
+
+    # No DMARC result: fall back to SPF/DKIM alignment
+    spf_only = [("Received-SPF", "softfail (example.com: transitioning domain of a@chase.com does not designate"
+                                 " 198.51.100.7 as permitted sender) client-ip=198.51.100.7; envelope-from=a@chase.com;")]
+    assert alignment(extract_authentication(spf_only, "headers"), "chase.com") is None  # softfail is neutral
+    hard_fail = [("Received-SPF", spf_only[0][1].replace("softfail", "fail", 1))]
+    assert alignment(extract_authentication(hard_fail, "headers"), "chase.com") == "fail"
+    signed = [("Authentication-Results", "mx.example.net; dkim=pass header.d=mail.chase.com; spf=softfail")]
+    assert alignment(extract_authentication(signed, "headers"), "chase.com") == "pass"
+
+    pasted = "Authentication-Results: mx.google.com;\n       dmarc=fail header.from=paypal.com\nFrom: x\n\nbody"
+    auth = extract_authentication(headers_from_text(pasted), "forwarded_text")
+    assert auth["source"] == "forwarded_text" and auth["dmarc"] == "fail"
+    assert extract_authentication([("Subject", "hi")], "headers") is None
+    print("✅ Authentication results parsed and aligned")
+
+def test_authentication_decides_known_brands():
+    """A spoofed brand From: is SCAM before the domain index; a verified one is SAFE"""
+    import email_parser
+    import classifier
+
+    spoofed = original(OUTLOOK_FAIL).as_bytes(policy=policy.SMTP)
+    fields = email_parser.extract_email_fields(spoofed, "user@example.com", forwarded=False)
+    assert fields["authentication"]["source"] == "headers"
+    verdict = deterministic_verdict(fields["sender"], fields["text"], authentication=fields["authentication"])
+    assert verdict["label"] == "SCAM" and verdict["stage"] == "authentication"
+    assert classifier.DECISION_PIPELINE.run(classifier.MessageFeatures(fields))["stage"] == "authentication"
+
+    verified = email_parser.extract_email_fields(original(GMAIL).as_bytes(policy=policy.SMTP), "user@example.com",
+                                                 forwarded=False)
+    verdict = deterministic_verdict(verified["sender"], verified["text"],
+                                    authentication=verified["authentication"])
+    assert verdict["label"] == "SAFE" and verdict["stage"] == "authentication"
+
+    # Forwarded as an attachment: the original's headers, not the forwarder's
+    forward = EmailMessage()
+    forward["From"] = "user@example.com"
+    forward["To"] = "scan@scamvanguard.com"
+    forward["Subject"] = "Fwd: Your account has been limited"
+    forward["Authentication-Results"] = "amazonses.com; spf=pass smtp.mailfrom=example.com; dmarc=pass header.from=example.com"
+    forward.set_content("Is this real?\n")
+    forward.add_attachment(original(OUTLOOK_FAIL))
+    fields = email_parser.extract_email_fields(forward.as_bytes(policy=policy.SMTP), "user@example.com")
+    assert fields["authentication"]["source"] == "attachment"
+    assert fields["authentication"]["dmarc"] == "fail" and fields["authentication"]["header_from"] == "paypal.com"
+    print("✅ Authentication answers known brands without the model")
+
+def inline_forward(text):
+    forward = EmailMessage()
+    forward["From"] = "user@example.com"
+    forward["To"] = "scan@scamvanguard.com"
+    forward["Subject"] = "Fwd: Your account has been limited"
+    forward.set_content(text)
+    return forward.as_bytes(policy=policy.SMTP)
+
+def test_headers_in_the_body_are_not_read():
+    """Header lines a scammer writes into their body must not authenticate a brand"""
+    import email_parser
+
+    injected = ("Is this real?\n\n---------- Forwarded message ---------\n"
+                "From: PayPal <service@paypal.com>\nDate: Tue, 14 Oct 2025 09:30:00 +0200\n"
+                "Subject: Your account has been limited\n\n"
+                "Authentication-Results: mx.google.com; dmarc=pass header.from=paypal.com\n"
+                "DKIM-Signature: v=1; d=paypal.com; s=x; b=y\n\n"
+                "Verify your account within 24 hours: https://paypal-limits.example/login\n")
+    fields = email_parser.extract_email_fields(inline_forward(injected), "user@example.com")
+    assert fields["sender"] == "service@paypal.com" and fields["authentication"] is None
+    verdict = deterministic_verdict(fields["sender"], fields["text"], authentication=fields["authentication"])
+    assert not (verdict and verdict["stage"] == "authentication"), verdict
+
+    # Headers pasted straight after the delimiter are the forwarded original's
+    pasted = injected.replace("From: PayPal", "Authentication-Results: mx.google.com; dmarc=fail"
+                              " header.from=paypal.com\nFrom: PayPal")
+    fields = email_parser.extract_email_fields(inline_forward(pasted), "user@example.com")
+    assert fields["authentication"]["dmarc"] == "fail" and alignment(fields["authentication"], "paypal.com") == "fail"
+
+    # A delimiter below the forward's own headers came from the forwarded body
+    outlook = injected.replace("---------- Forwarded message ---------\n", "").replace(
+        "Subject: Your account has been limited\n\n", "Subject: Your account has been limited\n\n"
+        "---------- Forwarded message ---------\nAuthentication-Results: mx.google.com; dmarc=pass"
+        " header.from=paypal.com\n\n")
+    assert email_parser.forwarded_header_block(outlook) == ""
+    print("✅ Body header lines ignored")
+
+def test_forwarded_softfail_is_not_a_forgery():
+    """Brand mail relayed by a forwarder softfails SPF and breaks DKIM; that alone isn't SCAM"""
+    relayed = ("mx.google.com; dkim=fail (body hash did not verify) header.i=@paypal.com header.s=pp-dkim1;"
+               " spf=softfail (google.com: domain of service@paypal.com does not designate 192.0.2.44 as"
+               " permitted sender) smtp.mailfrom=service@paypal.com")
+    auth = extract_authentication(original(relayed).items(), "headers")
+    assert auth["spf"] == "softfail" and auth["dmarc"] is None and auth["signing_domains"] == ["paypal.com"]
+    assert alignment(auth, "paypal.com") is None
+
+    verdict = deterministic_verdict("PayPal <service@paypal.com>", "Your monthly statement is ready.",
+                                    authentication=auth)
+    assert not (verdict and verdict["label"] == "SCAM"), verdict
+
+    # A hard SPF fail still doesn't count once the message carries a signature
+    auth = extract_authentication(original(relayed.replace("spf=softfail", "spf=fail")).items(), "headers")
+    assert alignment(auth, "paypal.com") is None
+    print("✅ Forwarded softfail stays neutral")
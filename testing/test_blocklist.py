@@ -0,0 +1,107 @@
+import os
+import tempfile
+
+from shared import blocklist
+from shared.blocklist import Blocklist, build_blocklist
+from shared.domain_rules import deterministic_verdict
+from build_blocklist import feed_hosts
+
+def test_lookups_have_no_false_negatives():
+    """Every listed host is found, parents cover subdomains, clean hosts are rejected"""
+    listed = [f"phish{i}.example" for i in range(5000)]
+    with tempfile.TemporaryDirectory() as tmp:
+        feed = os.path.join(tmp, "feed.txt")
+        with open(feed, "w") as f:
+            f.write("# test feed\n\nhttp://user@Login.PayPa1-Secure.com:8080/verify?x=1\nbücher-bank.de\n")
+            f.write("\n".join(listed))
+        path = os.path.join(tmp, "blocklist.bin")
+        assert build_blocklist(feed_hosts([feed]), path, 0.01) == len(listed) + 2
+
+        bl = Blocklist(path)
+        try:
+            assert all(host in bl for host in listed)
+            assert bl.match("login.paypa1-secure.com") == "login.paypa1-secure.com"
+            assert bl.match("a.b.phish42.example") == "phish42.example"
+            assert bl.match("xn--bcher-bank-9db.de") and bl.match("BÜCHER-BANK.de.")
+            assert bl.match("paypal.com") is None and bl.match("example") is None
+            passed_filter = sum(f"clean{i}.example" in bl for i in range(20000))
+            assert passed_filter == 0  # the sorted hashes reject Bloom false positives
+        finally:
+            bl.close()
+    print("✅ Blocklist lookups")
+
+def test_listed_host_short_circuits_to_scam():
+    """A listed sender domain or link host is SCAM before the domain index"""
+    import classifier
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "blocklist.bin")
+        build_blocklist(["evil-login.com", "bad.example.org"], path)
+        previous = blocklist._active
+        blocklist._active = Blocklist(path)
+        try:
+            verdict = deterministic_verdict("PayPal <service@amazon.com>",
+                                            "sign in at https://secure.evil-login.com/paypal now")
+            assert verdict["label"] == "SCAM" and verdict["stage"] == "blocklist"
+            assert "secure.evil-login.com" in verdict["detailed_reason"]
+
+            verdict = deterministic_verdict("Support <help@mail.bad.example.org>", "hello")
+            assert verdict["stage"] == "blocklist" and "bad.example.org" in verdict["detailed_reason"]
+
+            result = classifier.DECISION_PIPELINE.run(classifier.MessageFeatures({
+                "sender": "orders@amazon.com", "text": "Track it: http://bad.example.org/track"}))
+            assert result["stage"] == "blocklist"
+
+            assert deterministic_verdict("orders@amazon.com", "see https://amazon.com/orders")["label"] == "SAFE"
+        finally:
+            blocklist._active.close()
+            blocklist._active = previous
+    print("✅ Blocklist hits answer SCAM")
+
+def test_url_feeds_skip_shared_hosting():
+    """A phishing page on docs.google.com or Dropbox doesn't list the whole host"""
+    with tempfile.TemporaryDirectory() as tmp:
+        feed = os.path.join(tmp, "openphish.txt")
+        with open(feed, "w") as f:
+            f.write("https://docs.google.com/forms/d/e/1FAIpQLSf/viewform\n"
+                    "https://sites.google.com/view/paypal-restore/home\n"
+                    "https://drive.google.com/file/d/1AbC/view\n"
+                    "https://raw.githubusercontent.com/someone/kit/main/login.html\n"
+                    "https://www.dropbox.com/s/abc123/invoice.html?dl=0\n"
+                    "https://www.paypal.com/signin?phish=1\n"
+                    "https://paypal-restore.weebly.com/login\n"
+                    "http://login.paypa1-secure.com/verify\n"
+                    "docs-google.account-review.net\n")
+        assert list(feed_hosts([feed])) == ["paypal-restore.weebly.com", "login.paypa1-secure.com",
+                                            "docs-google.account-review.net"]
+
+        path = os.path.join(tmp, "blocklist.bin")
+        build_blocklist(feed_hosts([feed]), path)
+        bl = Blocklist(path)
+        try:
+            assert blocklist.blocklist_verdict("Team <team@bakery-newsletter.net>", ["docs.google.com",
+                                                                                     "www.dropbox.com"], bl) is None
+            assert blocklist.blocklist_verdict("x@bakery-newsletter.net", ["paypal-restore.weebly.com"], bl)
+        finally:
+            bl.close()
+    print("✅ URL feeds don't list shared hosts")
+
+def test_homograph_hosts_are_checked_before_canonicalization():
+    """Cyrillic pаypal.com stays xn--pypal-4ve.com for the blocklist; keywords still use canonical text"""
+    from shared.canonical import canonicalize
+
+    text = "Your account is limited. Restore it at https://p\u0430ypal.com/restore today."
+    assert "https://paypal.com/restore" in canonicalize(text)  # canonicalization would hide the host
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "blocklist.bin")
+        build_blocklist(["xn--pypal-4ve.com"], path)
+        previous = blocklist._active
+        blocklist._active = Blocklist(path)
+        try:
+            verdict = deterministic_verdict("Service <help@account-notice.net>", text,
+                                            canonical_text=canonicalize(text))
+            assert verdict["stage"] == "blocklist" and "xn--pypal-4ve.com" in verdict["detailed_reason"]
+        finally:
+            blocklist._active.close()
+            blocklist._active = previous
+    print("✅ Homograph link hosts reach the blocklist")
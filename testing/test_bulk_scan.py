@@ -0,0 +1,58 @@
+import csv
+import io
+import json
+import mailbox
+import os
+import tempfile
+
+from bulk_scan import scan
+from load_test import forwarded_email
+
+MESSAGES = [
+    ("<1@example.com>", "service@paypal.com", "Receipt", "You sent $25.00 USD to Jane Doe."),
+    ("<2@example.com>", "paypalsecurity2024@gmail.com", "Notice", "PayPal Security Team: verify your account now."),
+    ("<3@example.com>", "billing@unknown-vendor.biz", "Invoice", "Please pay the attached invoice."),
+]
+
+def write_mbox(path, messages):
+    box = mailbox.mbox(path)
+    for message_id, sender, subject, body in messages:
+        raw = forwarded_email("abuse@example.org", sender, subject, body)
+        box.add(mailbox.mboxMessage(f"Message-ID: {message_id}\n".encode() + raw))
+    box.flush()
+    box.close()
+
+def test_scan_and_resume():
+    """Every message gets one row; a second run skips what's already scanned"""
+    with tempfile.TemporaryDirectory() as tmp:
+        mbox = os.path.join(tmp, "abuse.mbox")
+        output = os.path.join(tmp, "results.jsonl")
+        write_mbox(mbox, MESSAGES[:2])
+
+        log = io.StringIO()
+        first = scan(mbox, output, workers=1, batch_size=2, rules_only=True, log=log)
+        assert first["scanned"] == 2 and first["skipped"] == 0, first
+
+        write_mbox(mbox, MESSAGES[2:])  # the mailbox grows between runs
+        second = scan(mbox, output, workers=1, batch_size=2, rules_only=True, log=log)
+        assert second["scanned"] == 1 and second["skipped"] == 2, second
+
+        with open(output) as f:
+            rows = {row["id"]: row for row in map(json.loads, f)}
+    assert rows["<1@example.com>"]["label"] == "SAFE"
+    assert rows["<2@example.com>"]["label"] == "SCAM"
+    assert rows["<3@example.com>"]["stage"] == "skipped"
+    print("✅ Bulk scan with resume")
+
+def test_csv_output():
+    """CSV output has a header and one row per message"""
+    with tempfile.TemporaryDirectory() as tmp:
+        mbox = os.path.join(tmp, "abuse.mbox")
+        output = os.path.join(tmp, "results.csv")
+        write_mbox(mbox, MESSAGES)
+        scan(mbox, output, workers=2, batch_size=1, rules_only=True, log=io.StringIO())
+        scan(mbox, output, workers=2, batch_size=1, rules_only=True, log=io.StringIO())
+        with open(output, newline="") as f:
+            rows = list(csv.DictReader(f))
+    assert sorted(row["id"] for row in rows) == sorted(m[0] for m in MESSAGES)
+    print("✅ Bulk scan CSV output")
@@ -0,0 +1,39 @@
+import classifier
+from email_parser import extract_email_fields
+from shared.canonical import canonicalize, canonical_fields
+from shared.domain_rules import deterministic_verdict
+
+# Zero-width space, Cyrillic Р/а, fullwidth and math-bold letters, padded spaces
+EVASIVE = "Message from the Р​а‍yРаl  Ｓｅｃｕｒｉｔｙ  Team:  𝐯𝐞𝐫𝐢𝐟𝐲 your account"
+
+def test_canonical_text_defeats_evasion():
+    """Invisible characters, lookalikes and compatibility forms normalize away"""
+    assert canonicalize(EVASIVE) == "message from the paypal security team: verify your account"
+    assert canonicalize("Line one  \n\n\t Line\ttwo ") == "line one\nline two"
+    assert canonicalize("") == ""
+
+    # The raw text slips past the company-claim rule; the canonical text doesn't
+    assert deterministic_verdict("paypalsecurity2024@gmail.com", EVASIVE) is None
+    verdict = deterministic_verdict("paypalsecurity2024@gmail.com", canonicalize(EVASIVE))
+    assert verdict["label"] == "SCAM" and verdict["stage"] == "keyword_scanner", verdict
+    verdict = deterministic_verdict("paypalsecurity2024@gmail.com", EVASIVE, canonical_text=canonicalize(EVASIVE))
+    assert verdict["stage"] == "keyword_scanner", verdict
+    assert classifier.analyze_email_content({"subject": "", "text": EVASIVE})["verify_account"]
+    print("✅ Evasive text canonicalized")
+
+def test_canonical_fields_ship_with_the_job():
+    """The parser computes canonical fields once; the classifier reuses them"""
+    raw = ("From: me@example.com\nSubject: Fwd: Notice\nContent-Type: text/plain; charset=utf-8\n"
+           "Content-Transfer-Encoding: 8bit\n\n---------- Forwarded message ---------\n"
+           f"From: paypalsecurity2024@gmail.com\nSubject: Notice\n\n{EVASIVE}\n").encode("utf-8")
+    fields = extract_email_fields(raw, "me@example.com")
+    assert fields["canonical_subject"] == "notice"
+    assert "paypal security team: verify your account" in fields["canonical_text"]
+
+    # Shipped fields are used as-is (no re-normalization) ...
+    job = {"text": "Hello", "subject": "Hi", "canonical_subject": "hi", "canonical_text": "shipped"}
+    assert classifier.MessageFeatures(job).canonical_text == "shipped"
+    # ... and jobs queued without them get them computed once
+    old_job = {"text": "Hello  THERE", "subject": "Hi"}
+    assert canonical_fields(old_job) == ("hi", "hello there") and old_job["canonical_text"] == "hello there"
+    print("✅ Canonical fields shipped and reused")
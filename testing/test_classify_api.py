@@ -0,0 +1,87 @@
+import base64
+import json
+
+from local_aws import LocalStack, LocalSecrets
+
+import classify_api
+import authorizer
+
+ORIGINAL = (
+    b"From: PayPal <service@paypal.com>\nTo: me@example.com\nSubject: Your receipt\n"
+    b"Message-ID: <r1@paypal.com>\n\nYou sent $25.00 USD to Jane Doe.\n"
+)
+
+def call(body, content_type="message/rfc822", query=None):
+    event = {
+        "headers": {"Content-Type": content_type},
+        "queryStringParameters": query,
+        "isBase64Encoded": True,
+        "body": base64.b64encode(body).decode("ascii"),
+    }
+    response = classify_api.handler(event, None)
+    return response["statusCode"], json.loads(response["body"])
+
+def test_verdicts():
+    """Raw, pasted and JSON bodies all come back with a verdict"""
+    stack = LocalStack({"gpt-5-nano": 0, "gpt-5-mini": 0}).install()
+    try:
+        stats = classify_api.classifier.DECISION_PIPELINE.stats["attachment_hashes"]
+        runs = stats["runs"]
+        status, body = call(ORIGINAL)
+        assert status == 200 and body["label"] == "SAFE" and body["stage"] == "domain_index", body
+        assert stats["runs"] == runs + 1, "the rule stages should run once per request"
+        assert body["sender"] == "PayPal <service@paypal.com>" and body["subject"] == "Your receipt", body
+        assert body["latency_ms"] < 1000, body
+
+        pasted = b"From: paypalsecurity2024@gmail.com\nSubject: Notice\n\nPayPal Security Team: verify your account now."
+        status, body = call(pasted, "text/plain")
+        assert status == 200 and body["label"] == "SCAM", body
+
+        unknown = json.dumps({"message": "Please pay the attached invoice by Friday.",
+                              "sender": "billing@unknown-vendor.biz"}).encode()
+        status, body = call(unknown, "application/json", {"mode": "fast"})
+        assert body["label"] == "UNSURE" and body["stage"] == "skipped", body
+        assert not stack.openai.calls, "fast mode must not reach the model"
+
+        status, body = call(unknown, "application/json")
+        assert status == 200 and body["stage"] == "llm", body
+        assert stack.metrics.values("ApiLatency", Service="classify_api")
+    finally:
+        stack.uninstall()
+    print("✅ API verdicts for raw, pasted and JSON bodies")
+
+def test_bad_requests():
+    """Unusable bodies are rejected with a 4xx, never classified"""
+    stack = LocalStack().install()
+    try:
+        assert call(b"")[0] == 400
+        assert call(b"{not json", "application/json")[0] == 400
+        assert call(b'{"other": 1}', "application/json")[0] == 400
+        assert call(b"x" * (classify_api.MAX_BODY_BYTES + 1))[0] == 413
+    finally:
+        stack.uninstall()
+    print("✅ Bad requests rejected")
+
+def test_api_keys_and_quota_share():
+    """Only configured keys get through; the API draws on its own quota share"""
+    authorizer.API_KEYS_SECRET_NAME = "ScamVanguard/ClassifyApi/Keys"
+    authorizer.secrets = LocalSecrets({authorizer.API_KEYS_SECRET_NAME: json.dumps({"website": "k-123"})})
+    authorizer._keys_cache = (None, 0.0)
+
+    allowed = authorizer.handler({"headers": {"X-Api-Key": "k-123"}}, None)
+    assert allowed == {"isAuthorized": True, "context": {"client": "website"}}
+    assert authorizer.handler({"headers": {"x-api-key": "k-124"}}, None) == {"isAuthorized": False}
+    assert authorizer.handler({"headers": {}}, None) == {"isAuthorized": False}
+
+    # Unreadable keys fail closed
+    authorizer.secrets = LocalSecrets({})
+    authorizer._keys_cache = (None, 0.0)
+    assert authorizer.handler({"headers": {"x-api-key": "k-123"}}, None) == {"isAuthorized": False}
+
+    stack = LocalStack().install()
+    try:
+        governor = classify_api.api_quota_governor(classify_api.classifier.quota_governor)
+        assert governor.namespace == "api" and governor.parent is classify_api.classifier.quota_governor
+    finally:
+        stack.uninstall()
+    print("✅ API keys checked and quota shared")
@@ -0,0 +1,44 @@
+from pipeline import DecisionPipeline, Stage
+
+def test_stages_run_in_cost_order_and_short_circuit():
+    """The cheapest deciding stage wins and later stages never run"""
+    calls = []
+
+    def cheap(features):
+        calls.append("cheap")
+        return {"label": "SAFE", "reason": "cheap"} if features == "known" else None
+
+    def expensive(features):
+        calls.append("expensive")
+        return {"label": "UNSURE", "reason": "expensive"}
+
+    # Registered out of order on purpose
+    pipeline = DecisionPipeline([Stage("expensive", 1000, expensive), Stage("cheap", 1, cheap)])
+
+    result = pipeline.run("known")
+    assert result == {"label": "SAFE", "reason": "cheap", "stage": "cheap"}, result
+    assert calls == ["cheap"], calls
+
+    result = pipeline.run("unknown")
+    assert result["stage"] == "expensive"
+    assert calls == ["cheap", "cheap", "expensive"], calls
+
+    assert pipeline.hit_rates() == {"cheap": 0.5, "expensive": 1.0}
+    print("✅ Stages ordered by cost and short-circuit")
+
+def test_register_replaces_stage_by_name():
+    """Plugging in a stage with an existing name swaps the implementation"""
+    pipeline = DecisionPipeline([Stage("llm", 1000, lambda f: {"label": "UNSURE"})])
+    pipeline.register(Stage("llm", 1000, lambda f: {"label": "SCAM"}))
+
+    assert len(pipeline.stages) == 1
+    assert pipeline.run(None)["label"] == "SCAM"
+    print("✅ Stage replaced by name")
+
+def test_no_verdict_returns_none():
+    """A pipeline where every stage passes returns None"""
+    pipeline = DecisionPipeline([Stage("noop", 1, lambda f: None)])
+
+    assert pipeline.run(None) is None
+    assert pipeline.stats["noop"]["runs"] == 1
+    print("✅ Undecided message returns None")
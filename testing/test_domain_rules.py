@@ -0,0 +1,36 @@
+from shared.domain_rules import deterministic_verdict, RULE_STAGES
+
+def test_known_company_is_safe():
+    """Mail from a recognised company domain is answered SAFE"""
+    verdict = deterministic_verdict("PayPal <service@paypal.com>", "Your card ending in 3054 expires soon")
+    assert verdict["label"] == "SAFE"
+    assert verdict["stage"] == "domain_index"
+    print("✅ Known company domain SAFE")
+
+def test_known_company_with_executable_needs_analysis():
+    """A red-flag attachment keeps a known-company email out of the fast path"""
+    verdict = deterministic_verdict("service@paypal.com", "See attached", attachments="invoice.exe")
+    assert verdict is None, verdict
+    print("✅ Executable attachment blocks SAFE fast path")
+
+def test_public_domain_claiming_company_is_scam():
+    """A Gmail sender claiming to be a company is answered SCAM"""
+    verdict = deterministic_verdict("paypalsecurity2024@gmail.com", "Message from the PayPal Security Team")
+    assert verdict["label"] == "SCAM"
+    assert verdict["stage"] == "keyword_scanner"
+    print("✅ Public domain impersonation SCAM")
+
+def test_unknown_domain_goes_to_classifier():
+    """Anything the rules cannot decide is left for the classifier"""
+    assert deterministic_verdict("someone@definitely-not-paypal.com", "Your PayPal account is suspended") is None
+    assert deterministic_verdict("friend@gmail.com", "Lunch tomorrow?") is None
+    print("✅ Undecided emails left for classification")
+
+def test_parser_rules_are_the_classifier_pipeline_prefix():
+    """The parser's pre-check and the classifier's first stages are one list"""
+    import classifier
+
+    stages = [(s.name, s.cost, s.decide) for s in classifier.DECISION_PIPELINE.stages]
+    assert stages[:len(RULE_STAGES)] == RULE_STAGES
+    assert all(cost > RULE_STAGES[-1][1] for _, cost, _ in stages[len(RULE_STAGES):])
+    print("✅ Rule stages shared with the classifier")
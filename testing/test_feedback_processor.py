@@ -0,0 +1,118 @@
+import json
+from datetime import datetime, timezone
+
+from local_aws import LocalTable
+import ses_feedback_processor as processor
+from shared import metrics
+from shared.metrics import MemorySink
+
+def sns_event(*messages):
+    return {"Records": [{"EventSource": "aws:sns", "Sns": {"Message": json.dumps(m)}} for m in messages]}
+
+def sqs_event(*messages, envelope=False):
+    records = []
+    for i, message in enumerate(messages):
+        body = json.dumps(message)
+        if envelope:  # raw message delivery off
+            body = json.dumps({"Type": "Notification", "Message": body})
+        records.append({"eventSource": "aws:sqs", "messageId": f"m{i}", "body": body})
+    return {"Records": records}
+
+def bounce(*emails, bounce_type="Permanent", timestamp="2025-01-13T09:14:00.000Z", feedback_id=None):
+    return {"notificationType": "Bounce", "bounce": {
+        "bounceType": bounce_type, "timestamp": timestamp, "feedbackId": feedback_id or f"fb-{emails[0]}-{timestamp}",
+        "bouncedRecipients": [{"emailAddress": e} for e in emails]}}
+
+def complaint(*emails, timestamp="2025-01-13T10:00:00.000Z"):
+    return {"notificationType": "Complaint", "complaint": {
+        "timestamp": timestamp, "complainedRecipients": [{"emailAddress": e} for e in emails]}}
+
+def install(table):
+    processor.table = table
+    processor.BACKOFF_BASE_SECONDS = 0
+    sink = MemorySink()
+    metrics.set_sink(sink)
+    return sink
+
+def test_bounce_storm_is_batched_and_idempotent():
+    """Recipients across records are deduped into 25-item batches; redelivery rewrites identical items"""
+    table = LocalTable()
+    sink = install(table)
+    try:
+        storm = [bounce(*[f"user{i}@example.com" for i in range(n, n + 20)]) for n in range(0, 60, 10)]
+        event = sns_event(*storm, complaint("USER5@example.com"), bounce("soft@example.com", bounce_type="Transient"))
+        assert processor.handler(event, None)["suppressed"] == 70
+        assert table.batch_calls == 3  # 70 unique addresses
+        assert table.items["user5@example.com"]["reason"] == "complaint"
+        assert "soft@example.com" not in table.items
+
+        before = {k: dict(v) for k, v in table.items.items()}
+        processor.handler(event, None)  # SNS redelivery
+        assert table.items == before
+        assert sink.values("SuppressionWrites") == [70, 70]
+    finally:
+        metrics.set_sink(None)
+    print("✅ Bounce storm batched and idempotent")
+
+def test_unprocessed_items_are_retried_then_reported():
+    """UnprocessedItems are retried; what never lands fails the invocation"""
+    table = LocalTable()
+    sink = install(table)
+    try:
+        table.unprocessed_batches = 2
+        processor.handler(sns_event(bounce("a@example.com", "b@example.com")), None)
+        assert {"a@example.com", "b@example.com"} <= set(table.items)
+        assert sink.values("BatchWriteRetries") == [2]
+
+        table.unprocessed_batches = processor.MAX_WRITE_ATTEMPTS
+        try:
+            processor.handler(sns_event(complaint("c@example.com")), None)
+            assert False, "a write that never lands must fail the invocation"
+        except RuntimeError as e:
+            assert "c@example.com" in str(e)
+        assert sink.values("SuppressionWriteFailures")[-1] == 1
+    finally:
+        metrics.set_sink(None)
+    print("✅ Unprocessed items retried and reported")
+
+def test_queued_feedback_counts_soft_bounces_and_reports_failures():
+    """Batched SQS feedback escalates repeat soft bounces and reports only failed messages"""
+    table = LocalTable()
+    sink = install(table)
+    try:
+        soft = [bounce("flaky@example.com", bounce_type="Transient", feedback_id=f"fb{i}")
+                for i in range(processor.SOFT_BOUNCE_THRESHOLD - 1)]
+        event = sqs_event(*soft, bounce("hard@example.com"), envelope=True)
+        assert processor.handler(event, None) == {"batchItemFailures": []}
+        processor.handler(event, None)  # a redelivered batch is not counted twice
+        assert len(table.items["soft_bounce#flaky@example.com"]["bounces"]) == processor.SOFT_BOUNCE_THRESHOLD - 1
+        assert "flaky@example.com" not in table.items and "hard@example.com" in table.items
+
+        # One more soft bounce crosses the threshold
+        processor.handler(sqs_event(bounce("FLAKY@example.com", bounce_type="Transient", feedback_id="fb-last")), None)
+        assert table.items["flaky@example.com"]["reason"] == "soft_bounce"
+        assert sink.values("SoftBounceEscalations")[-1] == 1
+
+        table.unprocessed_batches = processor.MAX_WRITE_ATTEMPTS
+        response = processor.handler(sqs_event(complaint("x@example.com", "y@example.com"), bounce("z@example.com")), None)
+        # The last put of each attempt (z@) never lands; only its message is retried
+        assert response == {"batchItemFailures": [{"itemIdentifier": "m1"}]}, response
+    finally:
+        metrics.set_sink(None)
+    print("✅ Queued feedback batched with soft-bounce escalation")
+
+def test_soft_bounce_escalation_keeps_longer_suppression():
+    """Escalating soft bounces never shortens an existing complaint suppression"""
+    table = LocalTable()
+    install(table)
+    try:
+        now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        processor.handler(sns_event(complaint("flaky@example.com", timestamp=now)), None)
+        existing = dict(table.items["flaky@example.com"])
+        soft = [bounce("flaky@example.com", bounce_type="Transient", feedback_id=f"fb{i}")
+                for i in range(processor.SOFT_BOUNCE_THRESHOLD)]
+        assert processor.handler(sqs_event(*soft), None) == {"batchItemFailures": []}
+        assert table.items["flaky@example.com"] == existing
+    finally:
+        metrics.set_sink(None)
+    print("✅ Longer suppression kept over a soft-bounce escalation")
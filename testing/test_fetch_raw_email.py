@@ -0,0 +1,107 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+from local_aws import LocalS3, LocalStack
+from load_test import forwarded_email
+
+import email_parser
+
+class TrackingS3(LocalS3):
+    """LocalS3 that remembers whether each body was read or closed."""
+
+    def __init__(self):
+        super().__init__()
+        self.bodies = []
+
+    def get_object(self, Bucket, Key):
+        response = super().get_object(Bucket, Key)
+        body, read = response["Body"], []
+        response["Body"].read = lambda *args: read.append(True) or type(body).read(body, *args)
+        self.bodies.append((body, read))
+        return response
+
+def install(s3):
+    saved = email_parser.s3
+    email_parser.s3 = s3
+    return lambda: setattr(email_parser, "s3", saved)
+
+def test_fetch_branches():
+    """Found, missing, oversized and cancelled objects"""
+    s3 = TrackingS3()
+    restore = install(s3)
+    try:
+        s3.put_object(Bucket=email_parser.BUCKET, Key="emails/ok", Body=b"Subject: hi\r\n\r\nhello")
+        raw_email, elapsed_ms = email_parser.fetch_raw_email("emails/ok")
+        assert raw_email == b"Subject: hi\r\n\r\nhello" and elapsed_ms >= 0
+
+        # Not found: the S3 error reaches the handler, which fails the invocation for a retry
+        try:
+            email_parser.fetch_raw_email("emails/missing")
+            assert False, "a missing object should raise"
+        except ClientError as e:
+            assert e.response["Error"]["Code"] == "NoSuchKey"
+
+        # Oversized: refused from ContentLength, the body is never downloaded
+        s3.put_object(Bucket=email_parser.BUCKET, Key="emails/huge", Body=b"x" * (email_parser.MAX_EMAIL_BYTES + 1))
+        try:
+            email_parser.fetch_raw_email("emails/huge")
+            assert False, "an oversized object should raise"
+        except email_parser.EmailTooLarge as e:
+            assert e.size == email_parser.MAX_EMAIL_BYTES + 1
+        body, read = s3.bodies[-1]
+        assert body.closed and not read
+
+        # Cancelled: admission failed while the request was out
+        cancelled = threading.Event()
+        cancelled.set()
+        raw_email, _ = email_parser.fetch_raw_email("emails/ok", cancelled)
+        body, read = s3.bodies[-1]
+        assert raw_email is None and body.closed and not read
+    finally:
+        restore()
+    print("✅ S3 fetch branches")
+
+def test_discard_fetch():
+    """A queued download is cancelled; one in flight has its error swallowed"""
+    s3 = LocalS3()
+    restore = install(s3)
+    pool = ThreadPoolExecutor(max_workers=1)
+    try:
+        # Queued behind a busy worker: cancelled outright, S3 never called
+        gate = threading.Event()
+        pool.submit(gate.wait)
+        cancelled = threading.Event()
+        future = pool.submit(email_parser.fetch_raw_email, "emails/missing", cancelled)
+        email_parser.discard_fetch(future, cancelled)
+        assert future.cancelled() and cancelled.is_set()
+        gate.set()
+
+        # Already running: can't be cancelled, and its NoSuchKey must not go unobserved
+        started, release = threading.Event(), threading.Event()
+        get_object = s3.get_object
+        s3.get_object = lambda **kwargs: (started.set(), release.wait(), get_object(**kwargs))[-1]
+        cancelled = threading.Event()
+        future = pool.submit(email_parser.fetch_raw_email, "emails/missing", cancelled)
+        started.wait(5)
+        email_parser.discard_fetch(future, cancelled)
+        release.set()
+        assert isinstance(future.exception(5), ClientError) and not future.cancelled()
+    finally:
+        pool.shutdown(wait=True)
+        restore()
+    print("✅ Discarded fetches")
+
+def test_oversized_email_is_not_parsed():
+    """The handler answers 413 for an oversized email instead of parsing or retrying it"""
+    stack = LocalStack({"gpt-5-nano": 0, "gpt-5-mini": 0}).install()
+    limit = email_parser.MAX_EMAIL_BYTES
+    email_parser.MAX_EMAIL_BYTES = 1000
+    try:
+        result = stack.deliver(forwarded_email("user@example.com", "billing@paypa1-secure.com",
+                                               "Verify your account", "x" * 5000), "user@example.com")
+    finally:
+        email_parser.MAX_EMAIL_BYTES = limit
+    assert result["statusCode"] == 413, result
+    assert not stack.sqs.messages and not stack.ses.sent
+    print("✅ Oversized email refused")
@@ -0,0 +1,93 @@
+import os
+from email import policy
+from email.message import EmailMessage
+from email.parser import BytesParser
+
+from local_aws import LocalS3, LocalSES
+import forward_contact
+from shared import metrics
+from shared.metrics import MemorySink
+
+def contact_email():
+    msg = EmailMessage()
+    msg["From"] = "Zoë <zoe@example.com>"
+    msg["To"] = "contact@scamvanguard.com"
+    msg["Subject"] = "Partnership – résumé attached"
+    msg["DKIM-Signature"] = "v=1; a=rsa-sha256; d=example.com; b=abc"
+    msg.set_content("Hi,\n\nPlease see the attached résumé.\n")
+    msg.add_alternative("<p>Please see the attached <b>résumé</b>.</p>", subtype="html")
+    msg.add_attachment(os.urandom(300_000), maintype="application", subtype="pdf", filename="resume.pdf")
+    return msg.as_bytes(policy=policy.SMTP)
+
+def forward(raw, mode="raw"):
+    forward_contact.s3 = s3 = LocalS3()
+    forward_contact.ses = ses = LocalSES()
+    forward_contact.FORWARD_MODE = mode
+    s3.put_object(Bucket=forward_contact.BUCKET, Key="contact/msg-1", Body=raw)
+    sink = MemorySink()
+    metrics.set_sink(sink)
+    try:
+        forward_contact.handler({"Records": [{"ses": {"mail": {"messageId": "msg-1", "commonHeaders": {
+            "from": ["Zoë <zoe@example.com>"],
+            "subject": "Partnership – résumé attached",
+            "date": "Mon, 13 Jan 2025 09:14:00 +0000"
+        }}}}]}, None)
+    finally:
+        metrics.set_sink(None)
+    return ses.sent[0]["RawMessage"]["Data"], sink
+
+def test_raw_forward_keeps_body_bytes():
+    """Only the headers change; the original body bytes are forwarded verbatim"""
+    raw = contact_email()
+    data, sink = forward(raw)
+    body_start = raw.index(b"\r\n\r\n") + 4
+    assert raw[body_start:] in data
+
+    forwarded = BytesParser(policy=policy.default).parsebytes(data)
+    assert forwarded["From"] == forward_contact.FROM_ADDRESS
+    assert forwarded["To"] == "owner@example.com"
+    assert forwarded["Reply-To"] == "Zoë <zoe@example.com>"
+    assert forwarded["Subject"] == "Fwd: Partnership – résumé attached"
+    assert "DKIM-Signature" not in forwarded
+
+    info, original = forwarded.iter_parts()
+    assert "---------- Forwarded message ----------" in info.get_content()
+    assert original.get_content_type() == "multipart/mixed"
+    attachment = [p for p in original.iter_attachments()][0]
+    assert attachment.get_filename() == "resume.pdf"
+    source = BytesParser(policy=policy.default).parsebytes(raw)
+    assert attachment.get_content() == list(source.iter_attachments())[0].get_content()
+    assert "résumé" in original.get_body(("plain",)).get_content()
+
+    assert sink.values("ForwardBytes")[0] == len(data)
+    print("✅ Raw forward rewrites headers and keeps the body bytes")
+
+def test_single_part_and_rebuild_mode():
+    """Non-multipart originals forward too, and the rebuild mode still works"""
+    raw = b"From: a@example.com\nSubject: hi\nContent-Type: text/plain; charset=us-ascii\n\nhello there\n"
+    data, _ = forward(raw)
+    original = list(BytesParser(policy=policy.default).parsebytes(data).iter_parts())[1]
+    assert original.get_content_type() == "text/plain"
+    assert original.get_content() == "hello there\n"
+
+    data, sink = forward(contact_email(), mode="rebuild")
+    forwarded = BytesParser(policy=policy.default).parsebytes(data.encode())
+    assert [p.get_filename() for p in forwarded.iter_attachments()] == ["resume.pdf"]
+    assert sink.values("MimeParseLatency")
+    print("✅ Single-part raw forward and rebuild mode")
+
+def test_oversized_email_forwards_a_notice():
+    """Messages over MAX_FORWARD_BYTES stay in S3; only a notice is forwarded"""
+    limit = forward_contact.MAX_FORWARD_BYTES
+    forward_contact.MAX_FORWARD_BYTES = 100_000
+    try:
+        data, sink = forward(contact_email())
+    finally:
+        forward_contact.MAX_FORWARD_BYTES = limit
+    notice = BytesParser(policy=policy.default).parsebytes(data)
+    assert not notice.is_multipart()
+    assert notice["Reply-To"] == "Zoë <zoe@example.com>"
+    assert f"s3://{forward_contact.BUCKET}/contact/msg-1" in notice.get_content()
+    assert sink.values("ContactEmailsTooLarge") == [1]
+    assert len(data) < 2_000
+    print("✅ Oversized email forwarded as a notice")
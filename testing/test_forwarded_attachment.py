@@ -0,0 +1,56 @@
+from email import policy
+from email.message import EmailMessage
+
+import email_parser
+
+USER = "forwarder@example.com"
+
+def original():
+    msg = EmailMessage()
+    msg["From"] = "Netflix Billing <billing@netflix-renewal.com>"
+    msg["To"] = "someone@example.com"
+    msg["Subject"] = "Zahlung fehlgeschlagen – Konto gesperrt"
+    msg["Date"] = "Tue, 14 Oct 2025 09:30:00 +0200"
+    msg.set_content("Your payment failed.\n")
+    msg.add_alternative('<p>Your payment failed. <a href="https://netflix-renewal.com/pay">netflix.com</a></p>',
+                        subtype="html")
+    return msg
+
+def forward(attach):
+    msg = EmailMessage()
+    msg["From"] = USER
+    msg["To"] = "scan@scamvanguard.com"
+    msg["Subject"] = "Fwd: is this real?"
+    # A From: line the regexes would otherwise pick up
+    msg.set_content("Got this today.\nFrom: my-friend@example.org said it looked odd\n")
+    attach(msg)
+    return msg.as_bytes(policy=policy.SMTP)
+
+def test_attached_original_is_read_from_its_headers():
+    """Sender, subject, date, body and links come from the message/rfc822 part, no regex hunting"""
+    hunt = email_parser.extract_original_sender_from_forwarded
+    email_parser.extract_original_sender_from_forwarded = lambda *args: (_ for _ in ()).throw(
+        AssertionError("regex sender extraction ran"))
+    try:
+        fields = email_parser.extract_email_fields(forward(lambda msg: msg.add_attachment(original())), USER)
+    finally:
+        email_parser.extract_original_sender_from_forwarded = hunt
+
+    assert fields["sender"] == "Netflix Billing <billing@netflix-renewal.com>"
+    assert fields["subject"] == "Zahlung fehlgeschlagen – Konto gesperrt"
+    assert fields["date"] == "2025-10-14T09:30:00+02:00"
+    assert fields["text"].strip() == "Your payment failed."
+    assert fields["links"] == [{"href": "https://netflix-renewal.com/pay", "text": "netflix.com"}]
+    print("✅ Attached originals parsed from their own headers")
+
+def test_eml_files_and_inline_forwards():
+    """.eml files sent as octet-stream count as originals; inline forwards keep the pattern search"""
+    eml = original().as_bytes(policy=policy.SMTP)
+    fields = email_parser.extract_email_fields(forward(lambda msg: msg.add_attachment(
+        eml, maintype="application", subtype="octet-stream", filename="Payment failed.eml")), USER)
+    assert fields["sender"] == "Netflix Billing <billing@netflix-renewal.com>" and fields["date"]
+
+    # No attachment: the forwarded text is searched as before and there's no date
+    fields = email_parser.extract_email_fields(forward(lambda msg: None), USER)
+    assert fields["sender"] == "my-friend@example.org" and fields["date"] is None
+    print("✅ .eml attachments and inline forwards")
@@ -0,0 +1,81 @@
+import json
+from email import policy
+from email.message import EmailMessage
+
+from local_aws import LocalStack
+from load_test import forwarded_email
+
+def test_fit_job_keeps_small_jobs_and_trims_large_ones():
+    """Small jobs go out whole; large ones lose the canonical copies, then text"""
+    import email_parser
+
+    job = {"text": "hello", "canonical_subject": "hi", "canonical_text": "hello", "trimmed": {"quoted": 0}}
+    assert json.loads(email_parser.fit_job(dict(job))) == job
+
+    for text in ("a" * 200_000, "払" * 128_000, "\U0001F4B8" * 60_000 + "z"):
+        job = {"text": text, "canonical_subject": "x", "canonical_text": text, "trimmed": {"quoted": 3}}
+        body = email_parser.fit_job(job, limit=100_000)
+        assert 99_000 < len(body.encode("utf-8")) <= 100_000
+        sent = json.loads(body)
+        assert "canonical_text" not in sent and sent["trimmed"]["quoted"] == 3
+        assert sent["text"] == text[:len(sent["text"])]
+        assert sent["trimmed"]["queue_budget"] == len(text) - len(sent["text"])
+    print("✅ Jobs trimmed to the byte budget")
+
+def test_large_non_ascii_email_is_queued_and_answered():
+    """128k CJK characters used to overflow SQS and the user never heard back"""
+    stack = LocalStack({"gpt-5-nano": 0, "gpt-5-mini": 0}).install()
+    try:
+        forwarder = "cjk@example.com"
+        body = "您的账户已被暂停，请立即验证。" * 9_000
+        stack.deliver(forwarded_email(forwarder, "support@account-notice.com", "账户通知", body), forwarder)
+        queued = stack.sqs.messages[0]["body"]
+        assert len(queued.encode("utf-8")) <= stack.parser.MAX_JOB_BYTES
+        assert json.loads(queued)["trimmed"]["queue_budget"] > 0
+        stack.drain()
+    finally:
+        stack.uninstall()
+
+    assert [m["Destination"]["ToAddresses"][0] for m in stack.ses.sent] == [forwarder]
+    print("✅ Large non-ASCII email queued and answered")
+
+def test_oversized_fields_besides_text_are_trimmed():
+    """A huge attachment name still fits once the text is gone; the classifier gets a job"""
+    import email_parser
+
+    name = "Invoice " + "\u200b" * 100_000 + ".pdf.exe"
+    job = {"sender": "billing@invoice-example.com", "subject": "Invoice " * 10_000, "text": "Pay today.",
+           "attachments": name, "attachment_manifest": [{"name": name, "type": "application/pdf"}] * 3,
+           "links": [{"href": "https://invoice-example.com/" + "a" * 290, "text": "View"}] * 50,
+           "authentication": None, "trimmed": {}}
+    body = email_parser.fit_job(job, limit=20_000)
+    assert len(body.encode("utf-8")) <= 20_000
+    sent = json.loads(body)
+    assert sent["text"] == "" and sent["attachment_manifest"] is None and sent["links"] is None
+    assert sent["trimmed"]["queue_dropped"] == ["attachment_manifest", "links", "attachments", "subject"]
+    assert sent["attachments"].startswith("Invoice") and sent["sender"] == "billing@invoice-example.com"
+
+    stack = LocalStack({"gpt-5-nano": 0, "gpt-5-mini": 0}).install()
+    try:
+        msg = EmailMessage()
+        msg["From"] = "Billing <billing@invoice-example.com>"
+        msg["To"] = "user@example.com"
+        msg["Subject"] = "Invoice attached"
+        msg.set_content("Please pay the attached invoice today.\n")
+        for i in range(3):
+            msg.add_attachment(b"%PDF-1.4", maintype="application", subtype="pdf",
+                               filename=f"Invoice {i} " + "x" * 120_000 + ".pdf")
+        forward = EmailMessage()
+        forward["From"] = "user@example.com"
+        forward["To"] = "scan@scamvanguard.com"
+        forward["Subject"] = "Fwd: Invoice attached"
+        forward.set_content("Is this real?\n")
+        forward.add_attachment(msg)
+        stack.deliver(forward.as_bytes(policy=policy.SMTP), "user@example.com")
+        for message in stack.sqs.messages:
+            assert len(message["body"].encode("utf-8")) <= stack.parser.MAX_JOB_BYTES
+        stack.drain()
+    finally:
+        stack.uninstall()
+    assert [m["Destination"]["ToAddresses"][0] for m in stack.ses.sent] == ["user@example.com"]
+    print("✅ Oversized attachment names trimmed")
@@ -0,0 +1,125 @@
+from email.message import EmailMessage
+from email import policy
+
+from shared.links import normalize_url, extract_links, analyze_links, link_summary, compact_urls
+from shared.domain_rules import deterministic_verdict
+
+def html_email(sender, html):
+    msg = EmailMessage()
+    msg["From"] = sender
+    msg["To"] = "user@example.com"
+    msg["Subject"] = "Action needed on your account"
+    msg.set_content("Please view this message in HTML.\n")
+    msg.add_alternative(html, subtype="html")
+    return msg.as_bytes(policy=policy.SMTP)
+
+def test_urls_normalize_and_mismatches_are_found():
+    """IP literals, punycode, percent-encoding and credentials normalize; mismatches are reported"""
+    assert normalize_url("http://0x7f.1/login")["host"] == "127.0.0.1"
+    assert normalize_url("http://3232235777/")["host"] == "192.168.1.1"
+    assert normalize_url("http://0300.0250.1.1")["ip"]
+    assert normalize_url("http://[::1]:8080/")["host"] == "::1"
+
+    encoded = normalize_url("https://b%C3%BCcher.de/a%20b")
+    assert encoded["host"] == "xn--bcher-kva.de" and encoded["punycode"]
+
+    tricked = normalize_url("https://www.paypal.com@evil.example.co.uk:8443/signin")
+    assert tricked["domain"] == "example.co.uk" and tricked["userinfo"]
+    assert normalize_url("HTTP://WWW.PayPal.COM./x")["domain"] == "paypal.com"
+    assert normalize_url("mailto:help@paypal.com") is None and normalize_url("/account") is None
+    assert normalize_url("javascript:void(0)")["host"] == ""
+
+    links = extract_links(
+        '<a href="https://track.evil-example.com/x">www.PayPal.com</a>'
+        '<a href="https://www.paypal.com/signin"><b>Sign</b> in</a>'
+        '<a href="https://paypal.com.account-check.net/">Verify</a>'
+        '<a href="https://pineapple.com/">pineapple.com</a>'
+        '<a href="/unsubscribe">john.doe</a>'
+    )
+    assert links[1] == {"href": "https://www.paypal.com/signin", "text": "Sign in"}
+
+    report = analyze_links(links, "or call http://bit.ly/2xyz", "paypal-alerts.net")
+    assert report["count"] == 5
+    assert report["display_mismatch"] == [{"shown": "paypal.com", "actual": "evil-example.com"}]
+    assert [m["actual"] for m in report["brand_mismatch"]] == ["account-check.net"]  # not pineapple.com
+    assert report["shorteners"] == ["bit.ly"] and report["offsite"] == 5
+
+    summary = link_summary(report)
+    assert "shows paypal.com but goes to evil-example.com" in summary and "URL shortener bit.ly" in summary
+    assert compact_urls("Go to https://secure.login.example.co.uk/a?b=1 now") == "Go to [link: example.co.uk] now"
+    print("✅ Link normalization and mismatch features")
+
+def test_disguised_link_is_scam_without_the_llm():
+    """A link showing a known domain but going elsewhere is decided by link_analysis"""
+    import email_parser
+    import classifier
+
+    raw = html_email("Account Services <notice@secure-mail.net>",
+                     '<p>Your account is on hold. Sign in at '
+                     '<a href="http://185.22.4.7/pp/login">https://www.paypal.com/signin</a></p>')
+    fields = email_parser.extract_email_fields(raw, "user@example.com", forwarded=False)
+    assert fields["links"] == [{"href": "http://185.22.4.7/pp/login", "text": "https://www.paypal.com/signin"}]
+
+    verdict = deterministic_verdict(fields["sender"], fields["text"], fields["attachments"],
+                                    fields["attachment_manifest"], fields["links"])
+    assert verdict["label"] == "SCAM" and verdict["stage"] == "link_analysis"
+    assert "paypal.com" in verdict["detailed_reason"] and "185.22.4.7" in verdict["detailed_reason"]
+
+    result = classifier.DECISION_PIPELINE.run(classifier.MessageFeatures(fields))
+    assert result["stage"] == "link_analysis"
+
+    # The sender's own click-tracking domain is not a disguise
+    raw = html_email("Shop <news@shopexample.com>",
+                     '<a href="https://click.shopexample.com/r?u=1">www.paypal.com</a>')
+    fields = email_parser.extract_email_fields(raw, "user@example.com", forwarded=False)
+    assert deterministic_verdict(fields["sender"], fields["text"], links=fields["links"]) is None
+    print("✅ Disguised links answer SCAM before the model")
+
+def test_gateway_and_tracking_links_are_not_disguises():
+    """Safe Links and URL Defense unwrap to their target; ESP click trackers aren't compared"""
+    from shared.links import resolve_redirects
+
+    safelinks = ("https://nam12.safelinks.protection.outlook.com/?url=https%3A%2F%2Fwww.amazon.com%2Forders"
+                 "&data=05%7C01&reserved=0")
+    assert resolve_redirects(safelinks) == "https://www.amazon.com/orders"
+    urldefense = "https://urldefense.com/v3/__https://www.paypal.com/signin__;!!ABC123!xyz$"
+    assert resolve_redirects(urldefense) == "https://www.paypal.com/signin"
+    v2 = "https://urldefense.proofpoint.com/v2/url?u=https-3A__www.paypal.com_signin&d=DwMF&c=x"
+    assert resolve_redirects(v2) == "https://www.paypal.com/signin"
+    # Only known gateways: anyone else's ?url= is taken at face value
+    assert resolve_redirects("https://evil-example.com/r?url=https://www.paypal.com") == \
+        "https://evil-example.com/r?url=https://www.paypal.com"
+    assert resolve_redirects(safelinks.replace("url=https%3A%2F%2Fwww.amazon.com",
+                                               "url=https%3A%2F%2Fpaypa1-login.com")) == "https://paypa1-login.com/orders"
+
+    links = [
+        {"href": "https://company.us4.list-manage.com/track/click?u=1a2b&id=3c4d&e=5e6f", "text": "linkedin.com"},
+        {"href": safelinks, "text": "amazon.com"},
+        {"href": urldefense, "text": "www.paypal.com"},
+    ]
+    report = analyze_links(links, "", "newsletter-example.com")
+    assert report["display_mismatch"] == [] and report["tracked"] == 1
+    assert report["domains"] == ["list-manage.com", "amazon.com", "paypal.com"]
+    assert deterministic_verdict("News <news@newsletter-example.com>", "", links=links) is None
+
+    # A gateway-wrapped disguise is still caught once unwrapped
+    wrapped = safelinks.replace("www.amazon.com", "amazon-orders.evil-example.com")
+    report = analyze_links([{"href": wrapped, "text": "amazon.com"}], "", "newsletter-example.com")
+    assert report["display_mismatch"] == [{"shown": "amazon.com", "actual": "evil-example.com"}]
+    print("✅ Gateway redirects unwrapped, click trackers skipped")
+
+def test_brand_short_domains_are_not_disguises():
+    """A brand's own short or renamed domain behind its display text is ordinary mail"""
+    for shown, href in [("twitter.com", "https://x.com/scamvanguard"),
+                        ("amazon.com", "https://amzn.to/3xYzAbC"),
+                        ("linkedin.com", "https://lnkd.in/gH7kP2q"),
+                        ("facebook.com", "https://fb.me/scamvanguard"),
+                        ("instagram.com", "https://instagr.am/p/Cx1y2z3")]:
+        links = [{"href": href, "text": shown}]
+        assert analyze_links(links, "", "bakery-newsletter.net")["display_mismatch"] == [], shown
+        assert deterministic_verdict("Bakery <hello@bakery-newsletter.net>", "Follow us!", links=links) is None, shown
+
+    # Another brand's short domain still counts
+    links = [{"href": "https://lnkd.in/gH7kP2q", "text": "paypal.com"}]
+    assert deterministic_verdict("Bakery <hello@bakery-newsletter.net>", "", links=links)["label"] == "SCAM"
+    print("✅ Brand short domains allowed")
@@ -0,0 +1,45 @@
+import math
+
+import classifier
+from classifier import LOCAL_MODEL_BIAS, LOCAL_MODEL_WEIGHTS, MODEL_THRESHOLD
+
+def score(signals):
+    """The local model's probability for a set of firing signals."""
+    z = LOCAL_MODEL_BIAS + sum(LOCAL_MODEL_WEIGHTS[name] for name in signals)
+    return 1 / (1 + math.exp(-z))
+
+def test_feature_vectors_fall_on_the_intended_side():
+    """Stacked classic indicators clear the threshold; one or two strong signals leave it to the LLM"""
+    assert LOCAL_MODEL_BIAS == -4.0 and MODEL_THRESHOLD == 0.95
+    assert score(["public_domain", "claims_to_be_company", "account_threats", "verify_account",
+                  "personal_info_request", "click_link"]) >= MODEL_THRESHOLD
+    assert score(["link_display_mismatch", "authentication_failed", "verify_account",
+                  "personal_info_request"]) >= MODEL_THRESHOLD
+
+    assert score([]) < 0.02
+    assert score(["click_link", "urgency", "shortened_link"]) < 0.5  # a typical marketing email
+    assert score(["link_display_mismatch", "authentication_failed"]) < MODEL_THRESHOLD
+    # One signal short of the stack above is still the LLM's call
+    assert score(["public_domain", "claims_to_be_company", "account_threats", "verify_account",
+                  "personal_info_request"]) < MODEL_THRESHOLD
+    print("✅ Local model vectors on the intended side of the threshold")
+
+def test_local_model_stage_on_messages():
+    """A Gmail 'security team' asking for banking details is SCAM; an order update isn't decided"""
+    scam = classifier.MessageFeatures({
+        "sender": "paypal.security.desk@gmail.com",
+        "subject": "Account suspended",
+        "text": "PayPal Security Team: your account is suspended. Verify your account and confirm your "
+                "online banking password and routing number. Click here now.",
+    })
+    result = classifier.local_model_stage(scam)
+    assert result["label"] == "SCAM" and result["confidence"] >= MODEL_THRESHOLD, result
+
+    safe = classifier.MessageFeatures({
+        "sender": "orders@corner-bakery.com",
+        "subject": "Your order has shipped",
+        "text": "Thanks for your order #20931 of $18.50. Track it at https://corner-bakery.com/orders/20931",
+    })
+    assert classifier.local_model_score(safe) < 0.05
+    assert classifier.local_model_stage(safe) is None
+    print("✅ Local model stage decides only overwhelming cases")
@@ -0,0 +1,54 @@
+from local_aws import LocalStack, LocalTable
+from load_test import CORPUS, forwarded_email, run_load
+
+def test_emails_flow_end_to_end():
+    """Every delivered email gets exactly one verdict, queued or not"""
+    stack = LocalStack({"gpt-5-nano": 0, "gpt-5-mini": 0}).install()
+    try:
+        for i, (sender, subject, body) in enumerate(CORPUS):
+            forwarder = f"pipeline{i}@example.com"
+            stack.deliver(forwarded_email(forwarder, sender, subject, body), forwarder)
+        stack.drain()
+    finally:
+        stack.uninstall()
+
+    recipients = sorted(m["Destination"]["ToAddresses"][0] for m in stack.ses.sent)
+    assert recipients == sorted(f"pipeline{i}@example.com" for i in range(len(CORPUS))), recipients
+    assert stack.metrics.values("EndToEndLatency", Service="classifier")
+    assert stack.openai.calls, "unknown senders should reach the LLM stand-in"
+    print("✅ Local pipeline delivers one verdict per email")
+
+def test_table_ttl_and_conditional_add():
+    """The table stand-in expires TTL'd items and enforces ADD limits"""
+    now = [1000.0]
+    table = LocalTable(clock=lambda: now[0])
+    table.put_item(Item={"email": "a@example.com", "ttl": 1010})
+    assert "Item" in table.get_item(Key={"email": "a@example.com"})
+    now[0] = 1011
+    assert table.get_item(Key={"email": "a@example.com"}) == {}
+
+    params = dict(
+        Key={"email": "quota#x"},
+        UpdateExpression="ADD #count :amount SET #type = :type",
+        ExpressionAttributeNames={"#count": "count", "#type": "type"},
+        ExpressionAttributeValues={":amount": 3, ":type": "quota_counter", ":max": 2},
+        ConditionExpression="attribute_not_exists(#count) OR #count <= :max",
+        ReturnValues="UPDATED_NEW",
+    )
+    assert table.update_item(**params)["Attributes"]["count"] == 3
+    try:
+        table.update_item(**params)
+        assert False, "second increment should exceed the limit"
+    except Exception as e:
+        assert e.response["Error"]["Code"] == "ConditionalCheckFailedException"
+    print("✅ Table TTL and conditional ADD")
+
+def test_load_report():
+    """The load generator reports throughput and per-stage percentiles"""
+    report = run_load(emails=10, rate=200, parser_workers=2, classifier_workers=2,
+                      llm_latency={"gpt-5-nano": 0, "gpt-5-mini": 0})
+    assert report["verdicts_sent"] == 10, report
+    assert report["throughput"] > 0
+    for name in ["email_parser.S3FetchLatency", "classifier.ClassificationLatency"]:
+        assert set(report["stages"][name]) == {"count", "p50", "p95", "p99"}, name
+    print("✅ Load report")
@@ -0,0 +1,73 @@
+import io
+
+from shared import metrics
+from shared.metrics import MemorySink, MetricsLogger
+
+def test_emf_record_shape():
+    """A flushed logger produces a valid EMF record with per-dimension sets"""
+    sink = MemorySink()
+    metrics.set_sink(sink)
+    try:
+        logger = MetricsLogger("classifier")
+        logger.put("LLMLatency", 812.345)
+        logger.count("EmailsClassified")
+        logger.set_dimension("Verdict", "SCAM")
+        logger.set_dimension("Tier", None)  # unset dimensions are dropped
+        logger.set_property("message_id", "abc")
+        logger.flush()
+    finally:
+        metrics.set_sink(None)
+
+    record = sink.records[0]
+    directive = record["_aws"]["CloudWatchMetrics"][0]
+    assert directive["Namespace"] == "ScamVanguard"
+    assert directive["Dimensions"] == [[], ["Service"], ["Verdict"]], directive["Dimensions"]
+    assert {"Name": "LLMLatency", "Unit": "Milliseconds"} in directive["Metrics"]
+    assert record["LLMLatency"] == 812.35
+    assert record["EmailsClassified"] == 1
+    assert record["message_id"] == "abc"
+    assert "Tier" not in record
+    print("✅ EMF record shape")
+
+class FakeS3:
+    def get_object(self, Bucket, Key):
+        return {"Body": io.BytesIO(
+            b"From: user@example.com\nSubject: Fwd: check\n\n"
+            b"---------- Forwarded message ---------\n"
+            b"From: billing@unknown-vendor.biz\nSubject: Invoice overdue\n\nPlease pay the attached invoice."
+        )}
+
+class FakeSQS:
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, **kwargs):
+        self.sent.append(kwargs)
+
+class FakeTable:
+    def get_item(self, Key):
+        return {}
+
+    def put_item(self, Item):
+        pass
+
+def test_parser_emits_stage_timings():
+    """email_parser publishes every stage timing for a queued email"""
+    import email_parser
+
+    email_parser.s3 = FakeS3()
+    email_parser.sqs = FakeSQS()
+    email_parser.suppression_table = FakeTable()
+
+    sink = MemorySink()
+    metrics.set_sink(sink)
+    try:
+        email_parser.handler({"Records": [{"ses": {"mail": {"messageId": "metrics-1", "source": "user@example.com"}}}]}, None)
+    finally:
+        metrics.set_sink(None)
+
+    assert len(email_parser.sqs.sent) == 1
+    for name in ["DynamoGateLatency", "S3FetchLatency", "MimeParseLatency", "ExtractionLatency", "SQSSendLatency"]:
+        assert len(sink.values(name, Service="email_parser")) == 1, name
+    assert sink.values("EmailsQueued") == [1]
+    print("✅ Parser stage timings emitted")
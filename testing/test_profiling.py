@@ -0,0 +1,38 @@
+import json
+import os
+import pstats
+import tempfile
+
+from shared import profiling
+
+def busy_handler(event, context):
+    return sum(len(str(i)) for i in range(20_000))
+
+def test_disabled_profiling_is_a_no_op():
+    """With profiling off the handler is returned unwrapped"""
+    profiling.PROFILE_ALWAYS, profiling.PROFILE_SAMPLE_RATE = False, 0.0
+    assert profiling.profiled("classifier")(busy_handler) is busy_handler
+    print("✅ Disabled profiling adds no wrapper")
+
+def test_profile_written_per_message():
+    """An enabled invocation writes a pstats dump and a report keyed by message_id"""
+    saved = profiling.PROFILE_ALWAYS, profiling.PROFILE_BUCKET, profiling.LOCAL_PROFILE_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        profiling.PROFILE_ALWAYS, profiling.PROFILE_BUCKET, profiling.LOCAL_PROFILE_DIR = True, "", tmp
+        try:
+            handler = profiling.profiled("classifier")(busy_handler)
+            event = {"Records": [{"body": json.dumps({"message_id": "prof-1"})}]}
+            assert handler(event, None) == busy_handler(event, None)
+        finally:
+            profiling.PROFILE_ALWAYS, profiling.PROFILE_BUCKET, profiling.LOCAL_PROFILE_DIR = saved
+
+        folder = os.path.join(tmp, "classifier", "prof-1")
+        files = sorted(os.listdir(folder))
+        assert [f.rsplit(".", 1)[1] for f in files] == ["prof", "txt"], files
+
+        stats = pstats.Stats(os.path.join(folder, files[0]))
+        assert any(func[2] == "busy_handler" for func in stats.stats)
+        with open(os.path.join(folder, files[1])) as f:
+            report = f.read()
+        assert "wall time" in report and "top allocations" in report
+    print("✅ Profile artifacts keyed by message_id")
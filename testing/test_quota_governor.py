@@ -0,0 +1,183 @@
+import os
+import json
+
+from quota import QuotaGovernor, LocalCounterStore, QuotaExceeded, load_tier_limits
+
+LIMITS = {
+    "gpt-5-mini": {"rpm": 2, "tpm": 1000, "daily_tokens": 5000},
+    "gpt-5-nano": {"rpm": 10, "tpm": 10000, "daily_tokens": 50000},
+}
+
+class FakeClock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def make_governor(limits=LIMITS):
+    clock = FakeClock()
+    return QuotaGovernor(LocalCounterStore(clock), limits, clock), clock
+
+def test_overflow_routes_to_cheaper_tier():
+    """Requests past the mini RPM limit go to nano instead of failing"""
+    governor, _ = make_governor()
+    tiers = ["gpt-5-mini", "gpt-5-nano"]
+
+    granted = [governor.acquire(tiers, 100).tier for _ in range(4)]
+
+    assert granted == ["gpt-5-mini", "gpt-5-mini", "gpt-5-nano", "gpt-5-nano"], granted
+    print("✅ Overflow routed to cheaper tier")
+
+def test_exhausted_tiers_defer_until_next_minute():
+    """When every tier is full the caller gets a retry delay, then capacity returns"""
+    governor, clock = make_governor({"gpt-5-mini": {"rpm": 1, "tpm": 1000, "daily_tokens": 5000}})
+    clock.now = 60 * 28_333_334 - 20.0  # 20 seconds before the minute rolls over
+
+    governor.acquire(["gpt-5-mini"], 100)
+    try:
+        governor.acquire(["gpt-5-mini"], 100)
+        assert False, "Second request should have been throttled"
+    except QuotaExceeded as e:
+        assert e.retry_after == 20, e.retry_after
+
+    clock.now += 21
+    assert governor.acquire(["gpt-5-mini"], 100).tier == "gpt-5-mini"
+    print("✅ Exhausted tier deferred and recovered next minute")
+
+def test_usage_reconciles_token_estimate():
+    """Actual usage replaces the reservation so the TPM meter tracks real spend"""
+    governor, _ = make_governor()
+
+    grant = governor.acquire(["gpt-5-mini"], 600)
+    total = governor.record_usage(grant, {"input_tokens": 150, "output_tokens": 50, "total_tokens": 200})
+
+    assert total == 200
+    assert governor.store.get(f"gpt-5-mini#tpm#{grant.minute}") == 200
+    assert governor.store.get(f"gpt-5-mini#day#{grant.day}") == 200
+
+    # Room freed by the reconciliation can be reserved again
+    assert governor.acquire(["gpt-5-mini"], 800).tier == "gpt-5-mini"
+    print("✅ Usage reconciled against estimate")
+
+def test_daily_budget_blocks_tier():
+    """A tier over its daily token budget is skipped even with minute capacity left"""
+    governor, _ = make_governor({
+        "gpt-5-mini": {"rpm": 100, "tpm": 100000, "daily_tokens": 1000},
+        "gpt-5-nano": {"rpm": 100, "tpm": 100000, "daily_tokens": 100000},
+    })
+
+    assert governor.acquire(["gpt-5-mini", "gpt-5-nano"], 900).tier == "gpt-5-mini"
+    assert governor.acquire(["gpt-5-mini", "gpt-5-nano"], 900).tier == "gpt-5-nano"
+
+    # The failed mini attempt must not leave a stray request on its RPM meter
+    grant = governor.acquire(["gpt-5-nano"], 1)
+    assert governor.store.get(f"gpt-5-mini#rpm#{grant.minute}") == 1
+    print("✅ Daily budget enforced")
+
+def test_saturate_after_429():
+    """A 429 from OpenAI marks the tier full for the rest of the minute"""
+    governor, _ = make_governor()
+
+    governor.saturate("gpt-5-mini")
+
+    assert governor.acquire(["gpt-5-mini", "gpt-5-nano"], 100).tier == "gpt-5-nano"
+    print("✅ Saturated tier skipped")
+
+def test_namespaced_share_caps_its_caller():
+    """The API's share is a cap inside the shared budget; email keeps the rest"""
+    shared, clock = make_governor({"gpt-5-mini": {"rpm": 5, "tpm": 100000, "daily_tokens": 100000}})
+    api = QuotaGovernor(shared.store, {"gpt-5-mini": {"rpm": 2, "tpm": 100000, "daily_tokens": 100000}}, clock,
+                        namespace="api", parent=shared)
+
+    grants = [api.acquire(["gpt-5-mini"], 100) for _ in range(2)]
+    try:
+        api.acquire(["gpt-5-mini"], 100)
+        assert False, "the API share should be used up"
+    except QuotaExceeded:
+        pass
+    # Email still has the three requests the API couldn't take
+    assert [shared.acquire(["gpt-5-mini"], 100).tier for _ in range(3)] == ["gpt-5-mini"] * 3
+
+    minute = grants[0].minute
+    assert shared.store.get(f"gpt-5-mini#rpm#{minute}") == 5 and shared.store.get(f"api#gpt-5-mini#rpm#{minute}") == 2
+    # Usage and releases reach both meters
+    api.record_usage(grants[0], {"total_tokens": 50})
+    api.release(grants[1])
+    assert shared.store.get(f"api#gpt-5-mini#tpm#{minute}") == 50
+    assert shared.store.get(f"gpt-5-mini#tpm#{minute}") == 350
+
+    # A full shared budget refuses the API without leaving its reservation behind
+    clock.now += 60
+    for _ in range(5):
+        shared.acquire(["gpt-5-mini"], 100)
+    try:
+        api.acquire(["gpt-5-mini"], 100)
+        assert False, "the shared budget is full"
+    except QuotaExceeded:
+        pass
+    assert shared.store.get(f"api#gpt-5-mini#rpm#{int(clock.now // 60)}") == 0
+    print("✅ Namespaced share capped inside the shared budget")
+
+def test_oversized_request_is_clamped_to_the_tier():
+    """An estimate above a tier's TPM still gets through on a fresh minute instead of waiting forever"""
+    governor, clock = make_governor()
+
+    grant = governor.acquire(["gpt-5-mini"], 4000)
+    assert grant.tier == "gpt-5-mini" and grant.estimated_tokens == 1000
+    assert governor.store.get(f"gpt-5-mini#tpm#{grant.minute}") == 1000
+    # The minute is now full, so the next one overflows to nano
+    assert governor.acquire(["gpt-5-mini", "gpt-5-nano"], 4000).tier == "gpt-5-nano"
+
+    # Real usage is still booked in full against the day
+    governor.record_usage(grant, {"total_tokens": 3500})
+    assert governor.store.get(f"gpt-5-mini#day#{grant.day}") == 3500
+    clock.now += 60
+    assert governor.acquire(["gpt-5-mini"], 4000).tier == "gpt-5-mini"
+    print("✅ Oversized estimate clamped to the tier")
+
+def test_limits_must_be_configured():
+    """Missing or malformed OPENAI_QUOTA_LIMITS fails loudly instead of guessing"""
+    try:
+        for value in (None, "not json", "{}", json.dumps({"gpt-5-mini": {"rpm": 500, "tpm": 0, "daily_tokens": 1}})):
+            if value is None:
+                os.environ.pop("TEST_QUOTA_LIMITS", None)
+            else:
+                os.environ["TEST_QUOTA_LIMITS"] = value
+            try:
+                load_tier_limits("TEST_QUOTA_LIMITS")
+                assert False, f"{value!r} should be rejected"
+            except RuntimeError as e:
+                assert "TEST_QUOTA_LIMITS" in str(e)
+
+        os.environ["TEST_QUOTA_LIMITS"] = json.dumps(LIMITS)
+        assert load_tier_limits("TEST_QUOTA_LIMITS") == LIMITS
+    finally:
+        os.environ.pop("TEST_QUOTA_LIMITS", None)
+    print("✅ Quota limits required from the environment")
+
+def test_failed_model_call_returns_its_tokens():
+    """A timeout or 5xx from OpenAI gives the reservation back instead of holding it for the minute"""
+    import classifier
+
+    class FailingClient:
+        class responses:
+            @staticmethod
+            def parse(**kwargs):
+                raise TimeoutError("Request timed out.")
+
+    governor, _ = make_governor({"gpt-5-mini": {"rpm": 100, "tpm": 1000, "daily_tokens": 5000}})
+    previous, classifier.quota_governor = classifier.quota_governor, governor
+    try:
+        for _ in range(5):
+            try:
+                classifier.call_model(FailingClient(), "system prompt", "x" * 2000, ["gpt-5-mini"])
+                assert False, "the timeout should propagate"
+            except TimeoutError:
+                pass
+    finally:
+        classifier.quota_governor = previous
+    grant = governor.acquire(["gpt-5-mini"], 1)
+    assert governor.store.get(f"gpt-5-mini#tpm#{grant.minute}") == 1
+    assert governor.store.get(f"gpt-5-mini#day#{grant.day}") == 1
+    print("✅ Failed model calls release their reservation")
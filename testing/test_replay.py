@@ -0,0 +1,70 @@
+import os
+import tempfile
+from types import SimpleNamespace
+
+from load_test import forwarded_email
+from replay import RecordedOpenAI, load_corpus, score
+from shared import metrics
+from shared.metrics import MemorySink
+
+CORPUS = {
+    "SAFE": [
+        ("receipt", "service@paypal.com", "Your receipt", "You sent $25.00 USD to Jane Doe."),
+        ("lunch", "friend@gmail.com", "Lunch", "Are we still on for lunch tomorrow?"),
+    ],
+    "SCAM": [
+        ("impersonation", "paypalsecurity2024@gmail.com", "Notice", "PayPal Security Team: verify your account now."),
+        ("bank", "alerts@secure-bank-login.top", "URGENT", "Your account is suspended, verify your account password."),
+    ],
+}
+
+class FakeLiveClient:
+    """Plays the real OpenAI client in --record mode: everything is SCAM except lunch."""
+    def __init__(self):
+        self.calls = 0
+        self.responses = SimpleNamespace(parse=self.parse)
+
+    def parse(self, model, input, text_format):
+        self.calls += 1
+        label = "SAFE" if "lunch" in input[-1]["content"].lower() else "SCAM"
+        return SimpleNamespace(
+            output_parsed=text_format(label=label, reason="r", detailed_reason="d", confidence=0.95),
+            usage=SimpleNamespace(total_tokens=321)
+        )
+
+def write_corpus(directory):
+    for label, emails in CORPUS.items():
+        os.makedirs(os.path.join(directory, label))
+        for name, sender, subject, body in emails:
+            with open(os.path.join(directory, label, f"{name}.eml"), "wb") as f:
+                f.write(forwarded_email("replay@example.com", sender, subject, body))
+
+def test_record_then_replay_scoreboard():
+    """Recorded answers replay offline and produce the same scoreboard"""
+    metrics.set_sink(MemorySink())
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            write_corpus(tmp)
+            corpus = load_corpus(tmp)
+            assert len(corpus) == 4
+            recordings = os.path.join(tmp, "llm_recordings.json")
+
+            live = FakeLiveClient()
+            recorder = RecordedOpenAI(recordings, live)
+            recorded = score(corpus, "production", recorder)
+            recorder.save()
+            assert live.calls > 0
+
+            replayer = RecordedOpenAI(recordings)
+            replayed = score(corpus, "production", replayer)
+            llm_only = score(corpus, "llm-only", replayer)
+    finally:
+        metrics.set_sink(None)
+
+    assert replayed["unrecorded_llm_calls"] == 0
+    assert replayed["confusion"] == recorded["confusion"]
+    assert replayed["accuracy"] == 1.0, replayed["confusion"]
+    assert replayed["tiers"]["gpt-5-nano"]["tokens"] == 321 * replayed["tiers"]["gpt-5-nano"]["calls"]
+    # The parser/domain fast paths keep most of this corpus away from the model
+    assert replayed["llm_call_rate"] < llm_only["llm_call_rate"] == 1.0
+    print("✅ Record/replay scoreboard")
@@ -0,0 +1,122 @@
+from local_aws import LocalTable
+from reputation import ReputationStore, MAX_REPORTERS
+
+DAY = 86400
+
+# Receiving server's results for a message really sent by corner-bakery.com
+AUTHENTICATED = {"source": "attachment", "authserv_id": "mx.google.com", "spf": "pass",
+                 "spf_domain": "corner-bakery.com", "dkim": [{"result": "pass", "domain": "corner-bakery.com"}],
+                 "dmarc": "pass", "header_from": "corner-bakery.com", "signing_domains": ["corner-bakery.com"]}
+
+class Clock:
+    def __init__(self, now=1_760_000_000):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def test_counts_decay_and_need_a_broad_consistent_history():
+    """Verdicts halve every half-life; trust needs volume, age, reporters and unanimity"""
+    clock = Clock()
+    table = LocalTable(clock)
+    store = ReputationStore(table, cache_ttl=60, clock=clock)
+
+    for i in range(30):
+        reputation = store.record("corner-bakery.com", "SAFE", f"user{i % 6}@example.com")
+    assert round(reputation.safe, 6) == 30 and reputation.reporters == 6
+    assert reputation.consensus() is None  # too new to trust
+
+    clock.now += 15 * DAY
+    reputation = store.lookup("corner-bakery.com")
+    assert abs(reputation.safe - 30 / 2 ** 0.5) < 1e-6
+    assert reputation.consensus() == "SAFE"
+
+    # One dissenting verdict in ~22 is too many
+    store.record("corner-bakery.com", "SCAM", "user0@example.com")
+    assert store.lookup("corner-bakery.com").consensus() is None
+
+    # History fades: two more half-lives and it's too thin to answer from
+    clock.now += 60 * DAY
+    assert store.lookup("corner-bakery.com").total < 10
+
+    item = table.items["reputation#corner-bakery.com"]
+    assert item["first_seen"] == 1_760_000_000 and item["type"] == "domain_reputation"
+    assert not any("@" in reporter for reporter in item["reporters"])
+
+    # Reporters stop accumulating at the cap
+    for i in range(MAX_REPORTERS + 10):
+        store.record("busy.com", "SAFE", f"r{i}@example.com")
+    assert len(table.items["reputation#busy.com"]["reporters"]) == MAX_REPORTERS
+    print("✅ Reputation decay and consensus")
+
+def test_trusted_domain_skips_the_model():
+    """A domain with a consistent history is answered by the reputation stage"""
+    import classifier
+
+    clock = Clock()
+    previous = classifier.reputation_store
+    classifier.reputation_store = ReputationStore(LocalTable(clock), clock=clock)
+    try:
+        message = {"sender": "Orders <orders@corner-bakery.com>", "text": "Your order of 12 rolls ships Friday.",
+                   "authentication": AUTHENTICATED}
+        llm = {"label": "SAFE", "reason": "Order update", "stage": "llm", "confidence": 0.97}
+        for i in range(40):
+            classifier.record_reputation(message, llm, f"user{i % 5}@example.com")
+        # Lookup verdicts, link rules and low-confidence answers never feed back in
+        classifier.record_reputation(message, {"label": "SAFE", "stage": "reputation"}, "user0@example.com")
+        classifier.record_reputation(message, {"label": "SCAM", "stage": "link_analysis"}, "user0@example.com")
+        classifier.record_reputation(message, {"label": "SAFE", "stage": "llm", "confidence": 0.5}, "user0@example.com")
+        assert round(classifier.reputation_store.lookup("corner-bakery.com").safe, 6) == 40
+
+        clock.now += 20 * DAY
+        result = classifier.DECISION_PIPELINE.run(classifier.MessageFeatures(message))
+        assert result["label"] == "SAFE" and result["stage"] == "reputation"
+
+        # Executables still go to the model
+        risky = {**message, "attachments": "invoice.exe"}
+        assert classifier.reputation_stage(classifier.MessageFeatures(risky)) is None
+        # Public mail domains never build a reputation
+        classifier.record_reputation({"sender": "someone@gmail.com"}, llm, "user0@example.com")
+        assert classifier.reputation_store.lookup("gmail.com").total == 0
+    finally:
+        classifier.reputation_store = previous
+    print("✅ Trusted domains skip the model")
+
+def test_spoofed_sender_neither_borrows_nor_builds_reputation():
+    """Only authenticated From: domains earn or use a history"""
+    import classifier
+
+    clock = Clock()
+    previous = classifier.reputation_store
+    classifier.reputation_store = ReputationStore(LocalTable(clock), clock=clock)
+    try:
+        trusted = {"sender": "Orders <orders@corner-bakery.com>", "text": "Your order ships Friday.",
+                   "authentication": AUTHENTICATED}
+        llm = {"label": "SAFE", "reason": "Order update", "stage": "llm", "confidence": 0.97}
+        for i in range(40):
+            classifier.record_reputation(trusted, llm, f"user{i % 5}@example.com")
+        clock.now += 20 * DAY
+
+        # Same From:, no results or results for another domain: the model decides
+        spoofed = {"sender": "Orders <orders@corner-bakery.com>", "text": "Pay the attached invoice today."}
+        assert classifier.reputation_stage(classifier.MessageFeatures(spoofed)) is None
+        relayed = {**spoofed, "authentication": {**AUTHENTICATED, "dmarc": "fail"}}
+        assert classifier.reputation_stage(classifier.MessageFeatures(relayed)) is None
+        assert classifier.reputation_stage(classifier.MessageFeatures(trusted))["label"] == "SAFE"
+
+        # Colluding forwarders can't build a history for a domain they don't send from
+        for i in range(40):
+            classifier.record_reputation({"sender": "it@payroll-portal.com", "text": "Hi"}, llm, f"ring{i}@example.com")
+        assert classifier.reputation_store.lookup("payroll-portal.com").total == 0
+
+        # Results pasted into forwarded text are the forwarder's (or the scammer's) to write
+        pasted = {**AUTHENTICATED, "source": "forwarded_text", "header_from": "payroll-portal.com"}
+        for i in range(40):
+            classifier.record_reputation({"sender": "it@payroll-portal.com", "text": "Hi", "authentication": pasted},
+                                         llm, f"ring{i}@example.com")
+        assert classifier.reputation_store.lookup("payroll-portal.com").total == 0
+        pasted = {**AUTHENTICATED, "source": "forwarded_text"}
+        assert classifier.reputation_stage(classifier.MessageFeatures({**spoofed, "authentication": pasted})) is None
+    finally:
+        classifier.reputation_store = previous
+    print("✅ Spoofed senders get no reputation")
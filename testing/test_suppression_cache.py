@@ -0,0 +1,64 @@
+from local_aws import LocalStack, LocalTable
+from load_test import forwarded_email
+from shared.suppression import SuppressionCache, suppression_cache
+
+class BrokenTable:
+    def get_item(self, Key):
+        raise RuntimeError("throttled")
+
+def test_cache_ttls_lru_and_errors():
+    """Positive and negative answers expire on their own TTLs; errors aren't cached"""
+    now = [1000.0]
+    table = LocalTable(clock=lambda: now[0])
+    table.put_item(Item={"email": "blocked@example.com", "ttl": 1100})
+    cache = SuppressionCache(max_entries=2, positive_ttl=300, negative_ttl=30, clock=lambda: now[0])
+
+    assert cache.is_suppressed(table, "Blocked@example.com")
+    assert not cache.is_suppressed(table, "clean@example.com")
+    assert cache.is_suppressed(table, "blocked@example.com")
+    assert not cache.is_suppressed(table, "clean@example.com")
+    assert table.get_calls == 2
+
+    # A suppression written elsewhere shows up once the negative entry expires
+    table.put_item(Item={"email": "clean@example.com"})
+    assert not cache.is_suppressed(table, "clean@example.com")
+    now[0] += 31
+    assert cache.is_suppressed(table, "clean@example.com")
+
+    # Positive entries never outlive the item's TTL
+    now[0] = 1101
+    assert not cache.is_suppressed(table, "blocked@example.com")
+
+    # Least recently used entry goes first
+    cache.is_suppressed(table, "third@example.com")
+    assert cache.get("clean@example.com") is None and cache.get("third@example.com") is False
+
+    # Table errors answer with the caller's default and are retried next time
+    assert cache.is_suppressed(BrokenTable(), "new@example.com", on_error=True)
+    assert not cache.is_suppressed(BrokenTable(), "new@example.com", on_error=False)
+    assert cache.get("new@example.com") is None
+    print("✅ Suppression cache TTLs, LRU and error handling")
+
+def test_classifier_reuses_parser_admission():
+    """A queued job carries the parser's answer; writes invalidate the cache"""
+    stack = LocalStack({"gpt-5-nano": 0, "gpt-5-mini": 0}).install()
+    user = "forwarder@example.com"
+    try:
+        stack.deliver(forwarded_email(user, "billing@paypa1-secure.com", "Account locked",
+                                      "Verify your account now at http://paypa1-secure.com/login"), user)
+        gets = stack.table.get_calls
+        stack.drain()
+        assert stack.metrics.values("SuppressionChecksSkipped", Service="classifier") == [1]
+        # The classifier never went back to the table for the user (only for the sender's reputation)
+        assert stack.table.get_keys[gets:] == ["reputation#paypa1-secure.com"]
+        assert len(stack.ses.sent) == 1
+
+        # The parser cached "not suppressed"; its own write drops that entry
+        assert suppression_cache.get(user) is False
+        stack.parser.add_to_suppression_list(user, "bounce", "Permanent")
+        assert suppression_cache.get(user) is None
+        stack.deliver(forwarded_email(user, "a@example.com", "Hi", "Hello"), user)
+        assert stack.metrics.values("EmailsSuppressed", Service="email_parser") == [1]
+    finally:
+        stack.uninstall()
+    print("✅ Classifier skips the lookup the parser already made")
@@ -0,0 +1,110 @@
+import logging
+import os
+import time
+
+# Benchmarks: the regex-heavy text functions over realistic and
+# hostile bodies (the parser ships up to 250 KB of text per job)
+import email_parser
+import classifier
+from shared.canonical import canonicalize
+from shared.domain_rules import deterministic_verdict
+
+logging.getLogger().setLevel(logging.WARNING)
+
+MAX_TEXT = 250_000
+
+# Ceilings in ms; scale with BENCHMARK_CEILING_SCALE on slow machines
+SCALE = float(os.environ.get("BENCHMARK_CEILING_SCALE", "1"))
+REALISTIC_CEILING_MS = 50 * SCALE
+PATHOLOGICAL_CEILING_MS = 2500 * SCALE
+# 4x the input may cost at most this much more time (linear = 4, quadratic = 16)
+MAX_GROWTH = 8
+
+FUNCTIONS = {
+    "extract_original_sender_from_forwarded": lambda t: email_parser.extract_original_sender_from_forwarded(t, "user@example.com"),
+    "extract_forwarded_content": lambda t: email_parser.extract_forwarded_content(None, t),
+    "extract_original_subject": email_parser.extract_original_subject,
+    "trim_forwarded_content": email_parser.trim_forwarded_content,
+    "canonicalize": canonicalize,
+    "analyze_email_content": lambda t: classifier.analyze_email_content({"text": t, "subject": ""}),
+    "extract_urls_from_text": classifier.extract_urls_from_text,
+    "deterministic_verdict": lambda t: deterministic_verdict("someone@gmail.com", t),
+}
+
+REALISTIC = {
+    "gmail_forward": (
+        "---------- Forwarded message ---------\n"
+        "From: PayPal Service <service@paypa1-security.com>\n"
+        "Date: Mon, Jan 13, 2025 at 9:14 AM\nSubject: Your account is limited\nTo: <me@example.com>\n\n"
+        "Dear customer, we noticed unusual activity. Click here to verify your account: "
+        "https://paypa1-security.com/login?id=123\n" * 3
+    ),
+    "outlook_forward": (
+        "From: Amazon <no-reply@amazon.com> Sent: Monday, January 13, 2025 9:14 AM "
+        "To: me@example.com Subject: Your order has shipped\n\nYour package is on the way."
+    ),
+    "html_newsletter": "<html><body>" + "<p>Weekly deals <a href='https://shop.example.com/x'>here</a></p>" * 200 + "</body></html>",
+}
+
+# size -> text generators for inputs designed to trigger backtracking
+PATHOLOGICAL = {
+    "long_line_no_at": lambda n: "From: " + "a" * n,
+    "from_lines_without_address": lambda n: "From: someone without address\n" * (n // 30),
+    "from_repeated_on_one_line": lambda n: "From: x " * (n // 8),
+    "outlook_headers_without_to": lambda n: "From: a Sent: b " * (n // 16),
+    "huge_html": lambda n: "<div>" + "<p>hello <b>world</b></p>" * (n // 27) + "</div>",
+    "dash_run": lambda n: "-" * n,
+    "zero_width_runs": lambda n: "pay\u200bpal \u00a0 " * (n // 11),
+    "quoted_dash_lines": lambda n: ("> " + "-" * 60 + "\n") * (n // 63),
+    "at_signs_without_dot": lambda n: "From: " + "a@" * (n // 2),
+    "repeated_attachment_mentions": lambda n: "attachment " * (n // 11),
+    "url_without_end": lambda n: "http://" + "a" * n,
+    "subject_forward_chain": lambda n: "Subject: " + "Fwd: " * (n // 5),
+}
+
+def timed(fn, text, repeat=1):
+    """Best-of-`repeat` wall time in ms."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(text[:MAX_TEXT])
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def test_realistic_inputs_are_fast():
+    """Everyday forwards stay well under the realistic ceiling"""
+    for corpus_name, text in REALISTIC.items():
+        for fn_name, fn in FUNCTIONS.items():
+            elapsed = timed(fn, text, repeat=3)
+            assert elapsed < REALISTIC_CEILING_MS, f"{fn_name} on {corpus_name}: {elapsed:.0f}ms"
+    print("✅ Realistic inputs under ceiling")
+
+def test_pathological_inputs_under_ceiling():
+    """No 250 KB hostile body exceeds the per-call ceiling"""
+    for corpus_name, make in PATHOLOGICAL.items():
+        text = make(MAX_TEXT)
+        for fn_name, fn in FUNCTIONS.items():
+            elapsed = timed(fn, text)
+            assert elapsed < PATHOLOGICAL_CEILING_MS, f"{fn_name} on {corpus_name}: {elapsed:.0f}ms"
+    print("✅ Pathological inputs under ceiling")
+
+def test_cost_grows_linearly():
+    """Quadrupling a hostile input must not cost quadratically more"""
+    for corpus_name, make in PATHOLOGICAL.items():
+        small, large = make(16_000), make(64_000)
+        for fn_name, fn in FUNCTIONS.items():
+            small_ms, large_ms = timed(fn, small, repeat=3), timed(fn, large, repeat=3)
+            if large_ms < 20:
+                continue  # too fast to measure a meaningful ratio
+            assert large_ms / max(small_ms, 1.0) < MAX_GROWTH, \
+                f"{fn_name} on {corpus_name}: {small_ms:.1f}ms -> {large_ms:.1f}ms"
+    print("✅ Linear growth on hostile inputs")
+
+def report():
+    """Print the time per function for every corpus entry."""
+    corpus = dict(REALISTIC)
+    corpus.update({name: make(MAX_TEXT) for name, make in PATHOLOGICAL.items()})
+    print(f"{'input':<32}" + "".join(f"{name[:14]:>16}" for name in FUNCTIONS))
+    for corpus_name, text in corpus.items():
+        print(f"{corpus_name:<32}" + "".join(f"{timed(fn, text):>14.1f}ms" for fn in FUNCTIONS.values()))
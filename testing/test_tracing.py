@@ -0,0 +1,60 @@
+import json
+
+from shared import metrics
+from shared.metrics import MemorySink
+from shared.tracing import new_trace, stamp, hop_latencies, emit_trace_metrics, parse_ses_timestamp
+from test_metrics import FakeS3, FakeSQS, FakeTable
+
+def test_hop_latencies():
+    """Every hop between two recorded stamps is measured, plus the total"""
+    trace = new_trace("trace-1", "2025-01-15T10:30:00.000Z")
+    received = trace["stamps"]["ses_received"]
+    assert received == parse_ses_timestamp("2025-01-15T10:30:00Z")
+
+    for name, offset in [("parser_started", 400), ("parser_completed", 650), ("sqs_enqueued", 700),
+                         ("classifier_dequeued", 2700), ("classified", 9700), ("verdict_sent", 10000)]:
+        stamp(trace, name, received + offset)
+
+    latencies = hop_latencies(trace)
+    assert latencies == {
+        "HopSesToParserLatency": 400,
+        "HopParserLatency": 250,
+        "HopQueueLatency": 2000,
+        "HopClassificationLatency": 7000,
+        "HopDeliveryLatency": 300,
+        "EndToEndLatency": 10000,
+    }, latencies
+
+    sink = MemorySink()
+    metrics.set_sink(sink)
+    try:
+        emit_trace_metrics(trace, {"Service": "classifier", "Verdict": "SCAM"})
+    finally:
+        metrics.set_sink(None)
+    assert sink.values("EndToEndLatency", Verdict="SCAM") == [10000]
+    assert sink.values("SlaBreaches") == [0]
+    assert sink.records[0]["correlation_id"] == trace["correlation_id"]
+    print("✅ Hop latencies from trace stamps")
+
+def test_parser_starts_trace_in_job():
+    """The queued job carries the correlation id and the parser's stamps"""
+    import email_parser
+
+    email_parser.s3 = FakeS3()
+    email_parser.sqs = FakeSQS()
+    email_parser.suppression_table = FakeTable()
+
+    email_parser.handler({"Records": [{"ses": {"mail": {
+        "messageId": "trace-2",
+        "source": "user@example.com",
+        "timestamp": "2025-01-15T10:30:00.000Z"
+    }}}]}, None)
+
+    trace = json.loads(email_parser.sqs.sent[0]["MessageBody"])["trace"]
+    assert trace["message_id"] == "trace-2"
+    assert trace["correlation_id"]
+    stamps = trace["stamps"]
+    for name in ["ses_received", "parser_started", "parser_completed", "sqs_enqueued"]:
+        assert name in stamps, name
+    assert stamps["ses_received"] <= stamps["parser_started"] <= stamps["parser_completed"] <= stamps["sqs_enqueued"]
+    print("✅ Parser starts the trace")
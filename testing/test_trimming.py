@@ -0,0 +1,61 @@
+# trimmed from forwarded content before classification
+
+from email_parser import extract_email_fields, trim_forwarded_content
+
+FORWARD = """---------- Forwarded message ---------
+From: Accounts <ap@vendor-billing.biz>
+Date: Mon, Jan 13, 2025 at 9:14 AM
+Subject: Updated bank details
+To: <me@example.com>
+
+Please send this week's payment to our new account, details attached.
+
+-- 
+Mark Jones
+Accounts Payable
+Sent from my iPhone
+
+On Fri, Jan 10, 2025 at 4:02 PM Me <me@example.com> wrote:
+> Thanks, invoice received.
+>> Hi, please find the invoice attached.
+
+-----Original Message-----
+From: Accounts <ap@vendor-billing.biz>
+Sent: Friday, January 10, 2025 3:50 PM
+To: me@example.com
+Subject: Invoice 4471
+
+Invoice 4471 attached.
+
+CONFIDENTIALITY NOTICE: This email is intended solely for the named recipient.
+If you are not the intended recipient, please delete it.
+"""
+
+def test_trims_baggage_and_records_cuts():
+    """The message survives; quoted history, headers, signature and footer are cut"""
+    text, cut = trim_forwarded_content(FORWARD)
+    assert text.startswith("---------- Forwarded message ---------\nFrom: Accounts <ap@vendor-billing.biz>")
+    assert "send this week's payment to our new account" in text
+    assert "Invoice 4471 attached." in text  # nested forward bodies are kept
+    for gone in ["Mark Jones", "iPhone", "wrote:", "> Thanks", "Original Message", "Sent: Friday", "CONFIDENTIALITY"]:
+        assert gone not in text, gone
+    assert all(cut[kind] > 0 for kind in ["quoted", "forward_headers", "signature", "footer"]), cut
+    assert len(FORWARD) - len(text) >= sum(cut.values()) - 10, cut
+    print("✅ Forward trimmed with cuts recorded")
+
+def test_keeps_what_it_cannot_trim_safely():
+    """Fully quoted forwards, long '-- ' blocks and HTML are left alone"""
+    quoted = "> From: x@example.com\n> Subject: Prize\n>\n> You won a prize, send a fee to claim it.\n"
+    assert trim_forwarded_content(quoted) == (quoted, {"quoted": 0, "forward_headers": 0, "signature": 0, "footer": 0})
+
+    long_block = "From: a@example.com\n\nHi\n--\n" + "".join(f"step {i}\n" for i in range(15))
+    assert "step 14" in trim_forwarded_content(long_block)[0]
+
+    html = "<html><body><p>Hi</p>\n> not a quote\n</body></html>"
+    assert trim_forwarded_content(html)[0] == html
+
+    raw = ("From: me@example.com\nTo: scan@scamvanguard.com\nSubject: Fwd: Updated bank details\n\n" + FORWARD).encode()
+    fields = extract_email_fields(raw, "me@example.com")
+    assert fields["sender"] == "ap@vendor-billing.biz" and fields["subject"] == "Updated bank details", fields
+    assert fields["trimmed"]["quoted"] > 0 and "> Thanks" not in fields["text"]
+    print("✅ Untrimmable content kept")
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Build the memory-mapped phishing blocklist (see lambda_functions/shared/blocklist.py)
+from plain-text feeds and optionally publish it for the Lambdas to pick up.
+
+    python tools/build_blocklist.py feeds/openphish.txt feeds/urlhaus.txt --output blocklist.bin
+    python tools/build_blocklist.py feeds/*.txt --output blocklist.bin \\
+        --upload s3://scamvanguard-threat-intel-xxxx/blocklist/blocklist.bin
+
+Feeds hold one host, domain or URL per line; blank lines and # comments are
+skipped. Listing a domain also blocks its subdomains. Running containers swap
+in the uploaded file within BLOCKLIST_REFRESH_SECONDS.
+
+The blocklist matches hosts, so URL feed entries (openphish, urlhaus) are
+reduced to their host, except where the host serves many unrelated users'
+files by path (docs.google.com, raw.githubusercontent.com, dropbox.com, ...,
+see SHARED_HOSTING_DOMAINS) or is a recognised company domain
+(check_domain_legitimacy). One phishing page there says nothing about the
+host's other links, so such URLs are left to the link rules and the model
+rather than listed. Hosts and domains given on their own are listed as-is.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda_functions'))
+
+from shared.blocklist import build_blocklist, normalize_host, parent_domains, url_hosts
+from shared.domain_rules import check_domain_legitimacy
+
+# File and page hosts whose content belongs to whoever uploaded it; matched
+# with their subdomains. Hosts that give each user a subdomain
+# (evil.weebly.com) aren't here: that subdomain is the user's own
+SHARED_HOSTING_DOMAINS = {
+    'googleusercontent.com', 'storage.googleapis.com', 'forms.gle', 'githubusercontent.com', 'github.com',
+    'gitlab.com', 'dropbox.com', 'dropboxusercontent.com', 'db.tt', '1drv.ms', 'onedrive.live.com',
+    'sharepoint.com', 'box.com', 'wetransfer.com', 'we.tl', 's3.amazonaws.com', 'blob.core.windows.net',
+    'ipfs.io', 'notion.site', 'canva.com', 'pastebin.com', 'discord.com', 'cdn.discordapp.com',
+}
+
+
+def listable_url_host(host):
+    """Whether a host taken from a feed URL may be listed whole."""
+    host = normalize_host(host)
+    if any(parent in SHARED_HOSTING_DOMAINS for parent in parent_domains(host)):
+        return False
+    return not check_domain_legitimacy(host)
+
+
+def feed_hosts(paths):
+    """
+    Hosts from every feed line. URLs are reduced to their host unless it's
+    shared hosting or a recognised company domain, in which case the URL is
+    skipped.
+    """
+    for path in paths:
+        with open(path, encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                line = line.split("#", 1)[0].strip()
+                if not line:
+                    continue
+                if "://" in line:
+                    yield from (host for host in url_hosts(line) if listable_url_host(host))
+                else:
+                    yield line.split("/", 1)[0]
+
+
+def upload(path, s3_uri):
+    import boto3
+
+    bucket, _, key = s3_uri[len("s3://"):].partition("/")
+    boto3.client("s3").upload_file(path, bucket, key)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the phishing host/domain blocklist file")
+    parser.add_argument("feeds", nargs="+", help="text files with one host, domain or URL per line")
+    parser.add_argument("--output", required=True, help="blocklist file to write")
+    parser.add_argument("--fp-rate", type=float, default=0.001, help="Bloom filter false-positive rate")
+    parser.add_argument("--upload", metavar="S3_URI", help="publish to s3://bucket/key after building")
+    args = parser.parse_args()
+
+    count = build_blocklist(feed_hosts(args.feeds), args.output, args.fp_rate)
+    print(f"Wrote {count} entries to {args.output} ({os.path.getsize(args.output)} bytes)")
+    if args.upload:
+        upload(args.output, args.upload)
+        print(f"Uploaded to {args.upload}")
+
+
+if __name__ == "__main__":
+    main()
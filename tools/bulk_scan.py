@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Bulk mailbox scan: classify every message in an mbox file, a Maildir or an
+S3 prefix of raw emails, without going through SES.
+
+    python tools/bulk_scan.py abuse.mbox --output results.jsonl
+    python tools/bulk_scan.py ~/Maildir/.Abuse --output results.csv --workers 8
+    python tools/bulk_scan.py s3://my-bucket/emails/ --output results.jsonl --originals
+
+Messages are read lazily and sent to a process pool in batches. Each worker
+runs the email_parser extraction and the cheap decision stages for the whole
+batch, then sends the batch's undecided emails to the OpenAI cascade
+concurrently. Results are appended to the output as they arrive. Re-running
+with the same output skips messages already scanned, so an interrupted scan
+resumes where it stopped.
+
+OpenAI credentials come from OPENAI_API_KEY (or OPENAI_SECRET_NAME, like the
+classifier Lambda) and the account's limits from OPENAI_QUOTA_LIMITS, which
+the workers split between them. --rules-only skips the model and reports
+undecided messages as UNSURE.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import mailbox
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from email import policy
+from email.parser import BytesParser
+
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda_functions')
+
+FIELDS = ["id", "sender", "subject", "label", "reason", "stage", "tier", "confidence", "elapsed_ms", "error"]
+FORWARDING_USER = "bulk-scan@localhost"
+MAX_QUOTA_WAITS = 3
+
+
+# ---------- SOURCES ----------
+
+def message_id(raw_email):
+    """Stable id for resuming: the Message-ID header, else a hash of the bytes."""
+    headers = BytesParser(policy=policy.default).parsebytes(raw_email, headersonly=True)
+    header = headers.get("Message-ID")
+    return header.strip() if header else "sha256:" + hashlib.sha256(raw_email).hexdigest()
+
+
+def iter_mbox(path):
+    for message in mailbox.mbox(path, create=False):
+        yield message.as_bytes()
+
+
+def iter_maildir(path):
+    for message in mailbox.Maildir(path, factory=None, create=False):
+        yield message.as_bytes()
+
+
+def iter_s3(url):
+    import boto3
+    bucket, _, prefix = url[len("s3://"):].partition("/")
+    s3 = boto3.client("s3")
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix):
+        for item in page.get("Contents", []):
+            yield item["Key"], s3.get_object(Bucket=bucket, Key=item["Key"])["Body"].read()
+
+
+def iter_source(source):
+    """Yield (id, raw_bytes) for every message in an mbox, Maildir or s3:// prefix."""
+    if source.startswith("s3://"):
+        yield from iter_s3(source)
+        return
+    if os.path.isdir(source):
+        messages = iter_maildir(source)
+    elif os.path.isfile(source):
+        messages = iter_mbox(source)
+    else:
+        raise SystemExit(f"No such mailbox: {source}")
+    for raw_email in messages:
+        yield message_id(raw_email), raw_email
+
+
+# ---------- WORKERS ----------
+
+_worker = {}
+
+
+def init_worker(rules_only, llm_concurrency, workers):
+    """Import the Lambda code once per process and give it a local quota share."""
+    for path in [LAMBDA_DIR, os.path.join(LAMBDA_DIR, 'email_parser'), os.path.join(LAMBDA_DIR, 'classifier')]:
+        sys.path.insert(0, path)
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    os.environ.setdefault("ATTACHMENT_BUCKET", "bulk-scan")
+    os.environ.setdefault("PROCESSING_QUEUE_URL", "")
+
+    import logging
+    import email_parser
+    import classifier
+    from pipeline import DecisionPipeline
+    from quota import QuotaGovernor, LocalCounterStore, load_tier_limits
+    logging.getLogger().setLevel(logging.WARNING)
+
+    if os.environ.get("OPENAI_API_KEY"):
+        classifier._openai_key_cache = os.environ["OPENAI_API_KEY"]
+
+    # Each process gets an equal share of the account's OpenAI limits
+    limits = {
+        tier: {name: max(1, value // workers) for name, value in values.items()}
+        for tier, values in load_tier_limits().items()
+    }
+    classifier.quota_governor = QuotaGovernor(LocalCounterStore(), limits)
+
+    _worker.update(
+        parser=email_parser,
+        classifier=classifier,
+        cheap_pipeline=DecisionPipeline([s for s in classifier.DECISION_PIPELINE.stages if s.name != "llm"]),
+        llm_pool=None if rules_only else ThreadPoolExecutor(max_workers=llm_concurrency),
+    )
+
+
+def run_llm(features):
+    """One model-cascade call, waiting out quota exhaustion a few times before giving up."""
+    classifier = _worker["classifier"]
+    for attempt in range(MAX_QUOTA_WAITS + 1):
+        try:
+            return {**classifier.llm_stage(features), "stage": "llm"}
+        except classifier.QuotaExceeded as e:
+            if attempt == MAX_QUOTA_WAITS:
+                break
+            time.sleep(min(60, e.retry_after))
+    return {"label": "UNSURE", "reason": "OpenAI quota exhausted", "stage": "llm"}
+
+
+def scan_batch(batch, originals):
+    """Classify a batch of (id, raw_bytes); returns one result row per message."""
+    classifier = _worker["classifier"]
+    rows, pending = [], []
+
+    # Cheap work for the whole batch first
+    for scan_id, raw_email in batch:
+        started = time.perf_counter()
+        row = {"id": scan_id}
+        try:
+            fields = _worker["parser"].extract_email_fields(raw_email, FORWARDING_USER, forwarded=not originals)
+            job = {**fields, "text": fields["text"][:250_000], "forwarding_user": FORWARDING_USER}
+            row.update(sender=job["sender"], subject=job["subject"])
+            features = classifier.MessageFeatures(job)
+            verdict = _worker["cheap_pipeline"].run(features)
+        except Exception as e:
+            row.update(label="UNSURE", stage="error", error=str(e))
+            verdict = None
+        if verdict is not None:
+            row.update(verdict)
+        elif "error" not in row:
+            pending.append((row, features, started))
+            continue
+        row["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        rows.append(row)
+
+    # Then the batch's model calls, concurrently
+    if pending and _worker["llm_pool"] is None:
+        for row, _, started in pending:
+            row.update(label="UNSURE", reason="Not decided by rules (--rules-only)", stage="skipped",
+                       elapsed_ms=round((time.perf_counter() - started) * 1000, 1))
+            rows.append(row)
+    elif pending:
+        futures = [(row, started, _worker["llm_pool"].submit(run_llm, features)) for row, features, started in pending]
+        for row, started, future in futures:
+            try:
+                row.update(future.result())
+            except Exception as e:
+                row.update(label="UNSURE", stage="error", error=str(e))
+            row["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            rows.append(row)
+
+    for row in rows:
+        row.pop("detailed_reason", None)
+    return rows
+
+
+# ---------- OUTPUT ----------
+
+class ResultWriter:
+    """Appends result rows to JSONL or CSV and remembers which ids are done."""
+
+    def __init__(self, path):
+        self.path = path
+        self.is_csv = path.endswith(".csv")
+        self.done = self._load_done()
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "a", newline="")
+        if self.is_csv:
+            self.csv = csv.DictWriter(self.file, fieldnames=FIELDS, extrasaction="ignore")
+            if new_file:
+                self.csv.writeheader()
+
+    def _load_done(self):
+        if not os.path.exists(self.path):
+            return set()
+        with open(self.path, newline="") as f:
+            if self.path.endswith(".csv"):
+                return {row["id"] for row in csv.DictReader(f)}
+            done = set()
+            for line in f:
+                try:
+                    done.add(json.loads(line)["id"])
+                except (ValueError, KeyError):
+                    pass  # a line cut short by an interrupted run
+            return done
+
+    def write(self, rows):
+        for row in rows:
+            if self.is_csv:
+                self.csv.writerow(row)
+            else:
+                self.file.write(json.dumps({k: row.get(k) for k in FIELDS if row.get(k) is not None}) + "\n")
+            self.done.add(row["id"])
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+# ---------- DRIVER ----------
+
+def batches(messages, done, batch_size, stats):
+    batch = []
+    for scan_id, raw_email in messages:
+        if scan_id in done:
+            stats["skipped"] += 1
+            continue
+        done.add(scan_id)  # duplicates within one mailbox are scanned once
+        batch.append((scan_id, raw_email))
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def scan(source, output, workers=4, batch_size=20, llm_concurrency=4, rules_only=False, originals=False,
+         progress_every=10.0, log=sys.stderr):
+    """Scan a mailbox into `output`; returns the run statistics."""
+    writer = ResultWriter(output)
+    stats = {"scanned": 0, "skipped": 0, "llm": 0, "labels": {}}
+    started = last_report = time.perf_counter()
+
+    def record(rows):
+        writer.write(rows)
+        stats["scanned"] += len(rows)
+        for row in rows:
+            stats["labels"][row["label"]] = stats["labels"].get(row["label"], 0) + 1
+            stats["llm"] += int(row.get("stage") == "llm")
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                 initargs=(rules_only, llm_concurrency, workers)) as pool:
+            in_flight = set()
+            for batch in batches(iter_source(source), set(writer.done), batch_size, stats):
+                in_flight.add(pool.submit(scan_batch, batch, originals))
+                # Bound memory: never read far ahead of the workers
+                while len(in_flight) >= workers * 2:
+                    finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        record(future.result())
+                if time.perf_counter() - last_report >= progress_every:
+                    last_report = time.perf_counter()
+                    rate = stats["scanned"] / (last_report - started)
+                    print(f"{stats['scanned']} scanned, {rate:.1f} msg/s, {stats['llm']} sent to the model", file=log)
+            for future in in_flight:
+                record(future.result())
+    finally:
+        writer.close()
+
+    stats["elapsed_s"] = round(time.perf_counter() - started, 2)
+    stats["throughput"] = round(stats["scanned"] / stats["elapsed_s"], 2) if stats["elapsed_s"] else 0.0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify every message in an mbox, Maildir or S3 prefix")
+    parser.add_argument("source", help="mbox file, Maildir directory or s3://bucket/prefix")
+    parser.add_argument("--output", required=True, help="results file (.jsonl or .csv); appended to and resumed")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="worker processes")
+    parser.add_argument("--batch-size", type=int, default=20, help="messages per worker batch")
+    parser.add_argument("--llm-concurrency", type=int, default=4, help="concurrent model calls per worker")
+    parser.add_argument("--rules-only", action="store_true", help="don't call the model; undecided → UNSURE")
+    parser.add_argument("--originals", action="store_true",
+                        help="messages are the suspicious emails themselves, not forwarded reports")
+    args = parser.parse_args()
+
+    stats = scan(args.source, args.output, args.workers, args.batch_size, args.llm_concurrency,
+                 args.rules_only, args.originals)
+    print(f"Scanned {stats['scanned']} messages in {stats['elapsed_s']}s ({stats['throughput']} msg/s), "
+          f"skipped {stats['skipped']} already in {args.output}")
+    print(f"Verdicts: {stats['labels']}  Model calls: {stats['llm']}")
+
+
+if __name__ == "__main__":
+    main()
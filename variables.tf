@@ -54,7 +54,91 @@ variable "per_sender_daily_limit" {
   default     = 10
 }
 
+variable "openai_quota_limits" {
+  description = "Per-model OpenAI limits shared by all classifier containers (rpm, tpm, daily_tokens)"
+  type        = map(map(number))
+  default = {
+    "gpt-5-mini" = { rpm = 500, tpm = 200000, daily_tokens = 2000000 }
+    "gpt-5-nano" = { rpm = 500, tpm = 200000, daily_tokens = 4000000 }
+  }
+}
+
+variable "api_quota_limits" {
+  description = "The classify API's share of openai_quota_limits; API calls count against both, so email keeps the rest"
+  type        = map(map(number))
+  default = {
+    "gpt-5-mini" = { rpm = 100, tpm = 40000, daily_tokens = 400000 }
+    "gpt-5-nano" = { rpm = 100, tpm = 40000, daily_tokens = 800000 }
+  }
+}
+
+variable "classify_api_keys" {
+  description = "Keys accepted by the classify API (x-api-key header), by client name"
+  type        = map(string)
+  sensitive   = true
+  default     = {}
+}
+
+variable "cascade_confidence_threshold" {
+  description = "Minimum gpt-5-nano confidence to skip escalation to gpt-5-mini"
+  type        = number
+  default     = 0.8
+}
+
+variable "profile_sample_rate" {
+  description = "Share of parser/classifier invocations profiled to s3://<attachments>/profiles/ (0 disables)"
+  type        = number
+  default     = 0
+}
+
+variable "api_rate_limit" {
+  description = "Steady-state requests per second allowed on the classify API"
+  type        = number
+  default     = 5
+}
+
+variable "api_burst_limit" {
+  description = "Burst of requests allowed on the classify API"
+  type        = number
+  default     = 20
+}
+
+variable "feedback_via_queue" {
+  description = "Buffer SES bounce/complaint feedback through SQS and process it in batches (false: SNS invokes the processor directly)"
+  type        = bool
+  default     = true
+}
+
+variable "soft_bounce_threshold" {
+  description = "Transient bounces within the window before an address is suppressed"
+  type        = number
+  default     = 3
+}
+
+variable "soft_bounce_window_days" {
+  description = "Days a soft-bounce counter lives after an address's last transient bounce"
+  type        = number
+  default     = 7
+}
+
+variable "soft_bounce_suppression_days" {
+  description = "How long an address that keeps soft-bouncing stays suppressed"
+  type        = number
+  default     = 30
+}
+
 variable "forward_email" {
   description = "email to foward to from contact@scamvanguard.com"
   type = string
-}
\ No newline at end of file
+}
+variable "forward_mode" {
+  description = "How contact@ mail is forwarded: raw (rewrite headers, stream the original body) or rebuild (re-assemble bodies and attachments)"
+  type        = string
+  default     = "raw"
+}
+
+variable "blocklist_refresh_seconds" {
+  description = "How often warm Lambdas check S3 for a new phishing blocklist"
+  type        = number
+  default     = 300
+}